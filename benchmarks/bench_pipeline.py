@@ -0,0 +1,299 @@
+"""
+Benchmark of the classification, splitting and search hot paths, run entirely on local fixtures.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 100 10000 100000] [--stages process_single_url ...]
+                                        [--workers 8] [--baseline benchmarks/baseline.json]
+                                        [--save-baseline benchmarks/baseline.json] [--fail-on-regression]
+
+Pages are the recorded HTML files in benchmarks/fixtures, served by a local HTTP server; searches
+return fake results built from fixtures/domains.txt; translations go through a stub translator
+(--translate-latency simulates the round trip) and guess_words uses the small lexicon of
+fixtures/words.txt. Nothing leaves the machine, and the result, translation and search caches are
+disabled so every call does the full work.
+
+For every stage and list size it prints the throughput, the p50/p99 latency of one call and the peak
+Python memory. The memory is measured with tracemalloc in a second run of the stage, since tracing
+slows allocation-heavy code down several times; --no-memory skips it. With --baseline, every result is compared with a saved run: a throughput or p99 more than
+--tolerance worse is flagged, and --fail-on-regression then exits with 1.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit.config
+import config
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGE_FIXTURES = ["en_community.html", "he_school.html", "es_museum.html", "fr_shop.html", "en_heavy_head.html"]
+STAGES = ["count_keywords", "detect_language", "guess_words", "process_single_url", "search_and_filter_urls"]
+BLOCK_LIST = ["facebook.com", "*.wikipedia.org", "jewishnewsweekly.com"]
+RESULTS_PER_QUERY = 100
+
+
+def read_fixture(name, mode="r"):
+    with open(os.path.join(FIXTURES, name), mode, **({} if "b" in mode else {"encoding": "utf-8"})) as file:
+        return file.read()
+
+
+# Local stand-in for the sites we fetch: /<fixture name>/<n> serves that fixture, anything else a 404
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like real sites, so the pooled client reuses connections
+    disable_nagle_algorithm = True  # Headers and body are separate writes; Nagle would delay every response
+    pages = {}
+
+    def do_GET(self):
+        name = self.path.strip("/").split("/")[0]
+        body = self.pages.get(name)
+        status = 200 if body is not None else 404
+        body = body if body is not None else b"Not found"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_fixtures(ports):
+    FixtureHandler.pages = {name: read_fixture(name, "rb") for name in PAGE_FIXTURES}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+# Function to start the fixture server in its own process, so it neither competes for our GIL nor counts in our memory
+def start_fixture_server():
+    ports = multiprocessing.Queue()
+    multiprocessing.Process(target=serve_fixtures, args=(ports,), daemon=True).start()
+    return f"http://127.0.0.1:{ports.get(timeout=30)}"
+
+
+# Fake search engine: the same query always gets the same results (www., m. and deep-link variants included)
+def make_fake_search_engine(domains, latency):
+    def fake_search_engine(query, num_results=100, language="en", engine="API", on_page=None):
+        if latency:
+            time.sleep(latency)
+        rng = random.Random(query)
+        results = []
+        for i in range(num_results):
+            prefix = rng.choice(["https://", "https://www.", "http://", "https://m."])
+            path = rng.choice(["", "/", "/about", f"/news/{i}", "/?lang=en"])
+            results.append(prefix + rng.choice(domains) + path)
+        if on_page:
+            on_page(results)
+        return results
+
+    return fake_search_engine
+
+
+# Helper function to get the latency at a percentile (nearest rank) of sorted latencies
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+# Function to time every call of a stage over a list of items
+def run_stage(call, items, workers, measure_memory):
+    """
+    Runs the stage once for the timings and, with `measure_memory`, once more under tracemalloc for
+    the peak memory, so its overhead never shows in the latencies.
+    """
+    from workers import map_concurrently
+
+    def timed_call(item):
+        start = time.perf_counter()
+        call(item)
+        return time.perf_counter() - start
+
+    def run_all():
+        if workers > 1:
+            return [latency for _, latency in map_concurrently(timed_call, items, max_workers=workers,
+                                                                 per_host=workers, host_of=lambda item: None)]
+        return [timed_call(item) for item in items]
+
+    start = time.perf_counter()
+    latencies = sorted(run_all())
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        run_all()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "calls": len(latencies),
+        "seconds": round(seconds, 4),
+        "throughput": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "peak_mib": round(peak / 2 ** 20, 2) if peak is not None else None,
+    }
+
+
+# Function to fetch, detect the language of and score a single URL the way the classification pipeline does
+def process_single_url(url, source, good_keywords, bad_keywords):
+    """Runs one URL through the fetch, language and score stages and returns its scored item."""
+    import searching
+
+    item = searching.fetch_stage(searching.new_url_item(url, source))
+    return searching.score_stage(searching.language_stage(item), good_keywords, bad_keywords)
+
+
+# Function to search a query and keep the new URLs that are not blocked, the way run_searches does
+def search_and_filter_urls(query, block_list, num_results=100):
+    """Returns (url, sources) pairs of the search results, deduplicated by canonical URL."""
+    import searching
+    from blocklist import compile_block_list
+    from canonical_urls import UrlIndex
+
+    # Called through the module, so the fake search engine main() installs is used
+    search_results = searching.run_search_engine(query, num_results)
+    url_index = UrlIndex()
+    urls = [url for url, source in filter(None, (searching.classify_search_result(result, query) for result in search_results))
+            if url_index.add(url, source)]
+    blocked = compile_block_list(block_list)
+    return [(url, "; ".join(url_index.sources(url))) for url in urls if not blocked.is_blocked(url)]
+
+
+# Function to build the calls and inputs of every stage
+def build_stages(base_url, workers):
+    """Returns a dict of stage name -> (function making the items for a size, call, number of workers)."""
+    from searching import count_keywords, detect_language, extract_domain_from_url, fetch_page_metadata, guess_words
+
+    keywords = json.loads(read_fixture("keywords.json"))
+    good_keywords, bad_keywords = keywords["good"], keywords["bad"]
+    domains = [line.strip() for line in read_fixture("domains.txt").splitlines() if line.strip()]
+    # Titles and descriptions as the fetch stage extracts them from the fixtures
+    texts = [(metadata["title"], metadata["description"])
+             for metadata in (fetch_page_metadata(f"{base_url}/{name}/0") for name in PAGE_FIXTURES)]
+
+    def cycle(values, size):
+        return [values[i % len(values)] for i in range(size)]
+
+    return {
+        "count_keywords": (lambda size: cycle(texts, size),
+                           lambda text: count_keywords(text[0], text[1], good_keywords, bad_keywords), 1),
+        "detect_language": (lambda size: cycle(texts, size),
+                            lambda text: detect_language(text[0], text[1]), 1),
+        "guess_words": (lambda size: cycle([extract_domain_from_url("https://" + domain) for domain in domains], size),
+                        guess_words, 1),
+        "process_single_url": (lambda size: [f"{base_url}/{PAGE_FIXTURES[i % len(PAGE_FIXTURES)]}/{i}" for i in range(size)],
+                               lambda url: process_single_url(url, "benchmark", good_keywords, bad_keywords), workers),
+        "search_and_filter_urls": (lambda size: [f"benchmark query {i}" for i in range(max(size // RESULTS_PER_QUERY, 1))],
+                                   lambda query: search_and_filter_urls(query, BLOCK_LIST, RESULTS_PER_QUERY), 1),
+    }
+
+
+# Function to compare results with a baseline run
+def compare(results, baseline, tolerance):
+    """Prints the changes and returns the keys of the results that regressed."""
+    regressions = []
+    print()
+    print(f"Compared with the baseline of {baseline.get('created', '?')} (tolerance {tolerance:.0%}):")
+    print(f"{'stage':24} {'size':>7} {'throughput':>12} {'p50':>9} {'p99':>9}")
+    for key, result in results.items():
+        old = baseline["results"].get(key)
+        if not old:
+            continue
+        stage, size = key.rsplit("@", 1)
+        throughput = result["throughput"] / old["throughput"] - 1 if old["throughput"] else 0.0
+        p50 = result["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        p99 = result["p99_ms"] / old["p99_ms"] - 1 if old["p99_ms"] else 0.0
+        regressed = throughput < -tolerance or p99 > tolerance
+        if regressed:
+            regressions.append(key)
+        print(f"{stage:24} {size:>7} {throughput:+12.1%} {p50:+9.1%} {p99:+9.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000], help="List sizes to run every stage on")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run")
+    parser.add_argument("--workers", type=int, default=config.MAX_WORKERS, help="Concurrent process_single_url calls")
+    parser.add_argument("--translate-latency", type=float, default=0.0, help="Seconds the stub translator waits per batch")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Seconds the fake search engine waits per query")
+    parser.add_argument("--no-memory", action="store_true", help="Do not measure peak memory (skips the second run of every stage)")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    parser.add_argument("--save-baseline", help="Save the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before a result counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with 1 when a result regressed")
+    args = parser.parse_args()
+
+    # Every call does the full work: no result store, no caches, no progress output
+    config.RESULT_STORE_PATH = None
+    config.TRANSLATION_CACHE_PATH = None
+    config.HTTP_CACHE_SECONDS = 0
+    config.HEADLESS_REPORTER = None
+    config.PER_HOST_LIMIT = args.workers  # Every fixture page is on the same local host
+    streamlit.config.set_option("global.showWarningOnDirectExecution", False)
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+
+    import searching
+    from translation import IdentityTranslator, set_translator
+    from vocabulary import Lexicon, set_lexicon
+
+    # Stub translator: texts come back unchanged, after the simulated round trip
+    class StubTranslator(IdentityTranslator):
+        def translate_batch(self, texts, src="auto", dest="en"):
+            if args.translate_latency:
+                time.sleep(args.translate_latency)
+            return super().translate_batch(texts, src, dest)
+
+    set_translator(StubTranslator())
+    set_lexicon(Lexicon({"English": {line.strip() for line in read_fixture("words.txt").splitlines() if line.strip()}}))
+    domains = [line.strip() for line in read_fixture("domains.txt").splitlines() if line.strip()]
+    searching.run_search_engine = make_fake_search_engine(domains, args.search_latency)
+
+    stages = build_stages(start_fixture_server(), args.workers)
+    results = {}
+    print(f"{'stage':24} {'size':>7} {'calls':>7} {'seconds':>9} {'calls/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak MiB':>9}")
+    for stage in args.stages:
+        make_items, call, workers = stages[stage]
+        for size in args.sizes:
+            result = run_stage(call, make_items(size), workers, not args.no_memory)
+            results[f"{stage}@{size}"] = result
+            peak = f"{result['peak_mib']:9.2f}" if result["peak_mib"] is not None else f"{'-':>9}"
+            print(f"{stage:24} {size:7} {result['calls']:7} {result['seconds']:9.3f} {result['throughput']:10.1f} "
+                  f"{result['p50_ms']:9.3f} {result['p99_ms']:9.3f} {peak}", flush=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "workers": args.workers,
+                "memory": not args.no_memory,
+                "results": results,
+            }, file, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
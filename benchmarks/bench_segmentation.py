@@ -0,0 +1,107 @@
+"""
+Benchmark of domain word segmentation: the old recursive find_all_splits against segmentation.segment.
+
+Usage:
+    python benchmarks/bench_segmentation.py [domains.txt] [--words words.txt] [--legacy-max-length 28]
+
+The domains file holds one URL or domain per line (e.g., an export of the Split URL sheet). Without
+--words the lexicon is compiled from the spaCy models, exactly as domain_split uses it.
+The recursive approach is exponential, so it only runs on domains up to --legacy-max-length characters.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmentation import segment
+from vocabulary import Lexicon, get_lexicon
+
+# Used when no domains file is given
+SAMPLE_DOMAINS = [
+    "colegiohebreounion",
+    "colegiohebreounionmontevideo",
+    "jewishmuseum",
+    "hebrewschool",
+    "comunidadjudia",
+    "synagogueoftoronto",
+    "judaismeetculture",
+    "centroculturalhebraico",
+    "museojudiodebuenosaires",
+    "israelnationallibrary",
+]
+
+
+# The recursive approach guess_words used before, kept here for comparison
+def legacy_valid_words(sentence, lexicon):
+    def find_all_splits(sentence):
+        if not sentence:
+            return [[]]
+        all_splits = []
+        for i in range(1, len(sentence) + 1):
+            word_candidate = sentence[:i]
+            if len(word_candidate) > 3:
+                for split in find_all_splits(sentence[i:]):
+                    all_splits.append([word_candidate] + split)
+        return all_splits
+
+    word_candidates = [word for split in find_all_splits(sentence) for word in split]
+    return {word for word in word_candidates if word in lexicon}
+
+
+def load_domains(path):
+    from searching import extract_domain_from_url
+    with open(path, encoding="utf-8") as file:
+        lines = [line.strip() for line in file if line.strip()]
+    return [extract_domain_from_url(line) if "://" in line else line.split(".")[0] for line in lines]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("domains", nargs="?", help="File with one URL or domain per line")
+    parser.add_argument("--words", help="File with one word per line to use instead of the spaCy lexicon")
+    parser.add_argument("--legacy-max-length", type=int, default=28, help="Longest domain to run the recursive approach on")
+    args = parser.parse_args()
+
+    domains = load_domains(args.domains) if args.domains else SAMPLE_DOMAINS
+    if args.words:
+        with open(args.words, encoding="utf-8") as file:
+            lexicon = Lexicon({"Words": {line.strip() for line in file if line.strip()}})
+    else:
+        lexicon, load_time = timed(get_lexicon)
+        print(f"Lexicon: {len(lexicon)} words, loaded in {load_time:.2f}s")
+
+    new_total = legacy_total = 0.0
+    compared = legacy_found = new_found = 0
+    print(f"{'domain':40} {'len':>4} {'legacy (s)':>11} {'legacy words':>13} {'dp (s)':>9} {'dp words':>9}")
+    for domain in domains:
+        (_, words), new_time = timed(segment, domain, lexicon)
+        new_total += new_time
+        if len(domain) <= args.legacy_max_length:
+            legacy_words, legacy_time = timed(legacy_valid_words, domain, lexicon)
+            legacy_total += legacy_time
+            compared += 1
+            legacy_found += len(legacy_words)
+            new_found += len(legacy_words & words)
+            legacy_column = f"{legacy_time:11.4f} {len(legacy_words):13}"
+        else:
+            legacy_column = f"{'skipped':>11} {'-':>13}"
+        print(f"{domain[:40]:40} {len(domain):4} {legacy_column} {new_time:9.5f} {len(words):9}")
+
+    print()
+    print(f"Domains: {len(domains)} (compared with legacy: {compared})")
+    print(f"DP total: {new_total:.4f}s, mean {new_total / max(len(domains), 1) * 1000:.3f}ms per domain")
+    if compared:
+        print(f"Legacy total: {legacy_total:.4f}s on the compared domains")
+        print(f"Recall of legacy words: {new_found}/{legacy_found}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from functools import lru_cache
+from canonical_urls import canonical_host, parse_url
+
+# Wildcard labels: "*" matches exactly one label; a leading "*." or a trailing ".*" matches one or more
+ANY_LABEL = "*"
+ANY_LABELS = "**"
+
+
+class _Node:
+    __slots__ = ("children", "host_and_subdomains", "host_only", "subdomains_only")
+
+    def __init__(self):
+        self.children = {}
+        self.host_and_subdomains = False
+        self.host_only = False
+        self.subdomains_only = False
+
+
+class BlockList:
+    """
+    A compiled block list: host entries are stored in a trie of reversed domain labels
+    (com -> facebook -> www), so checking a URL costs one step per label of its host.
+
+    Entries (one per Block sheet row):
+      - "facebook.com", "https://www.facebook.com": the domain and all its subdomains (host aliases such
+        as "www." are ignored, see canonical_urls.canonical_host)
+      - "=facebook.com": that host only (and its alias forms)
+      - "*.facebook.com": subdomains only, not facebook.com itself
+      - "facebook.*": any suffix (facebook.com, facebook.co.il); "ads.*.example.com": exactly one label
+      - "https://example.com/some/page": that exact page, with any query (compared by
+        canonical URL, like the result store); an entry with a query blocks only that query
+    """
+
+    def __init__(self, entries=()):
+        self._root = _Node()
+        self._pages = set()
+        self.entries = []
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        entry = str(entry or "").strip()
+        if not entry:
+            return
+        self.entries.append(entry)
+        host_only = entry.startswith("=")
+        entry = entry.lstrip("=")
+
+        # Entries with a path block a single page
+        parsed = parse_url(entry)
+        if parsed.path.strip("/") and ANY_LABEL not in entry:
+            self._pages.add(parsed.key)
+            return
+
+        labels = canonical_host(parsed.hostname).split(".")
+        if not all(labels):
+            return
+        subdomains_only = labels[0] == ANY_LABEL
+        if subdomains_only:
+            labels = labels[1:]
+        if labels and labels[-1] == ANY_LABEL:
+            labels[-1] = ANY_LABELS
+
+        node = self._root
+        for label in reversed(labels):
+            node = node.children.setdefault(label, _Node())
+        if subdomains_only:
+            node.subdomains_only = True
+        elif host_only:
+            node.host_only = True
+        else:
+            node.host_and_subdomains = True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _match(self, node, labels, index):
+        if node.host_and_subdomains and index > 0:
+            return True
+        remaining = len(labels) - index
+        if index > 0 and ((node.host_only and remaining == 0) or (node.subdomains_only and remaining > 0)):
+            return True
+        if remaining == 0:
+            return False
+        child = node.children.get(labels[index])
+        if child is not None and self._match(child, labels, index + 1):
+            return True
+        child = node.children.get(ANY_LABEL)
+        if child is not None and self._match(child, labels, index + 1):
+            return True
+        child = node.children.get(ANY_LABELS)
+        if child is not None:
+            return any(self._match(child, labels, index + count) for count in range(1, remaining + 1))
+        return False
+
+    def is_blocked(self, url):
+        parsed = parse_url(url)
+        if not parsed.hostname:
+            return False
+        if self._pages and (parsed.key in self._pages or parsed.key.split("?", 1)[0] in self._pages):
+            return True
+        return self._match(self._root, canonical_host(parsed.hostname).split(".")[::-1], 0)
+
+    def __contains__(self, url):
+        return self.is_blocked(url)
+
+
+@lru_cache(maxsize=8)
+def _compile_block_list(entries):
+    return BlockList(entries)
+
+
+# Function to get the compiled block list of a list of entries (built once per distinct list)
+def compile_block_list(entries):
+    return _compile_block_list(tuple(entries))
@@ -0,0 +1,124 @@
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import urlsplit
+import config
+
+# Ports that are dropped from canonical URLs, by scheme
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# A URL split once: its scheme and netloc as written, its host name (see normalize_host), its port
+# (None when it is the scheme's default), its path, query and fragment as written, and its canonical key
+ParsedUrl = namedtuple("ParsedUrl", ["scheme", "netloc", "hostname", "port", "path", "query", "fragment", "key"])
+
+
+# Function to normalize a host name: lowercase, no trailing dot, international names as IDNA (punycode)
+@lru_cache(maxsize=65536)
+def normalize_host(host):
+    host = (host or "").strip().rstrip(".").lower()
+    if not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:  # Labels too long or empty: keep the host as written
+            pass
+    return host
+
+
+# Function to get the canonical form of a host name
+@lru_cache(maxsize=65536)
+def canonical_host(host):
+    """
+    Normalizes the host (see normalize_host) and strips one alias prefix of config.URL_HOST_ALIASES
+    (e.g., "www." or "m."), so all the spellings of a site match.
+    """
+    host = normalize_host(host)
+    for alias in config.URL_HOST_ALIASES:
+        # Keep aliases that are the registered name itself (e.g., "m.com")
+        if host.startswith(alias) and "." in host[len(alias):]:
+            return host[len(alias):]
+    return host
+
+
+# Function to split a URL and compute its canonical key
+@lru_cache(maxsize=65536)
+def parse_url(url):
+    """
+    Parses a URL once (the scheme is added if missing) and returns a ParsedUrl. Its key is the canonical
+    host (see canonical_host), a non-default port, the path without trailing slashes and the query:
+    "https://WWW.Example.com:443/a/" and "example.com/a" have the same key. The scheme and fragment
+    are not part of the key.
+    """
+    url = str(url).strip()
+    if not re.match(r'^https?://', url, re.IGNORECASE):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    try:
+        port = parts.port
+    except ValueError:  # Invalid port: leave it out of the key
+        port = None
+    if port == DEFAULT_PORTS.get(scheme):
+        port = None
+    hostname = normalize_host(parts.hostname)
+    host = canonical_host(hostname)
+    if port is not None:
+        host = f"{host}:{port}"
+    key = host + parts.path.rstrip("/") + (f"?{parts.query}" if parts.query else "")
+    return ParsedUrl(scheme, parts.netloc, hostname, port, parts.path, parts.query, parts.fragment, key)
+
+
+# Function to get the canonical key of a URL
+def canonical_url(url):
+    return parse_url(url).key
+
+
+# Function to get the host a URL points to: its host name and non-default port (used as the concurrency key)
+def host_of_url(url):
+    parsed = parse_url(url)
+    return parsed.hostname if parsed.port is None else f"{parsed.hostname}:{parsed.port}"
+
+
+class UrlIndex:
+    """
+    A dedup index of URLs by canonical key (see parse_url), shared by the threads of a run.
+
+    Whichever spelling of a URL comes first is the one kept (and fetched); every later spelling is a
+    duplicate, whatever the order, and the sources of all of them are kept together.
+    """
+
+    def __init__(self, urls=()):
+        self._entries = {}  # canonical key -> its sources (a dict used as an ordered set)
+        self._lock = threading.Lock()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url, source=None):
+        """Records a URL (and its source). Returns True if its canonical URL was not in the index yet."""
+        key = canonical_url(url)
+        with self._lock:
+            sources = self._entries.get(key)
+            is_new = sources is None
+            if is_new:
+                sources = self._entries[key] = {}
+            if source is not None:
+                sources[source] = None
+        return is_new
+
+    def sources(self, url):
+        """The sources of every spelling of the URL, in the order they were added."""
+        with self._lock:
+            return list(self._entries.get(canonical_url(url), ()))
+
+    def __contains__(self, url):
+        return canonical_url(url) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Function to drop the repeated URLs of a list
+def unique_urls(urls):
+    """Returns the URLs whose canonical URL did not appear earlier in the list, in their order."""
+    index = UrlIndex()
+    return [url for url in urls if index.add(url)]
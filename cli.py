@@ -0,0 +1,221 @@
+"""
+Command-line entry point for running the filter, split and keywords pipelines without Streamlit
+(e.g., from cron for nightly runs over large URL lists).
+
+Examples:
+    python cli.py filter urls.xlsx --name "Nightly list" --credentials creds.json --output csv --resume
+    python cli.py split domains.txt --name "Domains" --credentials creds.json --output sheets
+    python cli.py keywords --keywords "kibbutz, moshav" --lang he --engine api --credentials creds.json
+    python cli.py rescore --credentials creds.json --output sheets --sheet-id <spreadsheet ID>
+
+The keywords and block lists are always read from the keywords spreadsheet (`keywords_id` in
+.streamlit/secrets.toml). Results go to the same spreadsheets as the Streamlit tools with
+--output sheets, or to one CSV (or Parquet) file per worksheet under --output-dir.
+
+The exit status is 1 when the run fails or logs more than --max-errors errors (0 by default), so cron
+and CI can tell a failed night from a good one.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import pandas as pd
+import streamlit as st
+import streamlit.config
+import config
+from sheets import LocalClient
+
+# Spreadsheet secrets and output worksheets of each command
+COMMANDS = {
+    "filter": ("filter_id", ["Sure", "Not Sure"]),
+    "split": ("split_id", ["Results"]),
+    "keywords": ("google_id", ["Sure", "Not Sure"]),
+    "rescore": ("filter_id", ["Sure", "Not Sure"]),
+}
+
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+
+# Function to authenticate with Google Sheets from a service account file
+def authorize(credentials_path):
+    from google.oauth2 import service_account
+    import gspread
+    with open(credentials_path, encoding="utf-8") as file:
+        credentials = service_account.Credentials.from_service_account_info(json.load(file), scopes=SCOPES)
+    return gspread.authorize(credentials)
+
+
+# Helper function to read a secret, or None when there is no secrets file or no such secret
+def get_secret(name):
+    try:
+        return st.secrets.get(name)
+    except Exception:
+        return None
+
+
+# Function to read URLs (or keywords) from a file, the same way the Streamlit uploaders do
+def read_input_file(path):
+    """CSV and TXT files are read line by line; Excel files from their first column."""
+    file_type = path.rsplit(".", 1)[-1].lower()
+    if file_type in ("csv", "txt"):
+        with open(path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    elif file_type == "xlsx":
+        lines = pd.read_excel(path, engine="openpyxl").iloc[:, 0].dropna().tolist()
+    else:
+        raise ValueError(f"Unsupported file type '{file_type}'. Please use a CSV, TXT, or Excel file.")
+    return [str(line).strip() for line in lines if str(line).strip()]
+
+
+# Function to get the URLs already written to the output worksheets (used to resume a run)
+def read_done_urls(client, sheet_id, worksheet_names):
+    spreadsheet = client.open_by_key(sheet_id)
+    done = set()
+    for name in worksheet_names:
+        done.update(spreadsheet.worksheet(name).col_values(1)[1:])
+    return done
+
+
+# Function to convert the local CSV worksheets to Parquet files
+def export_parquet(directory, worksheet_names):
+    for name in worksheet_names:
+        path = os.path.join(directory, f"{name}.csv")
+        if os.path.exists(path):
+            pd.read_csv(path, dtype=str, keep_default_na=False).to_parquet(os.path.join(directory, f"{name}.parquet"), index=False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the Israeli Internet Archive tools without Streamlit.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--credentials", help="Google service account JSON file.")
+    common.add_argument("--output", choices=["sheets", "csv", "parquet"], default="csv", help="Where to write the results.")
+    common.add_argument("--output-dir", default="output", help="Directory for CSV/Parquet output (one file per worksheet).")
+    common.add_argument("--sheet-id", help="Output spreadsheet ID (defaults to the tool's spreadsheet in secrets.toml).")
+    common.add_argument("--workers", type=int, default=config.MAX_WORKERS, help="URLs processed at the same time.")
+    common.add_argument("--per-host", type=int, default=config.PER_HOST_LIMIT, help="Max concurrent requests to one host.")
+    common.add_argument("--resume", action="store_true", help="Skip URLs already in the output.")
+    common.add_argument("--log-level", default="INFO", help="Logging level of the progress and error messages.")
+    common.add_argument("--metrics", help="Write the run's stage timings and counters to this file (.prom for Prometheus text, otherwise JSON).")
+    common.add_argument("--max-errors", type=int, default=0,
+                        help="Exit with status 1 if the run logs more errors than this (it always does if it fails).")
+    common.add_argument("--host-stats", help="Write the per-host fetch statistics of the politeness scheduler to this JSON file.")
+
+    for command, help_text in (("filter", "Classify a list of URLs."), ("split", "Split a list of domains into words.")):
+        subparser = subparsers.add_parser(command, parents=[common], help=help_text)
+        subparser.add_argument("input", nargs="+", help="CSV / TXT / Excel files of URLs.")
+        subparser.add_argument("--name", required=True, help="List name (written to the Source column).")
+
+    subparser = subparsers.add_parser("keywords", parents=[common], help="Search keywords and classify the results.")
+    subparser.add_argument("--keywords", help="Comma or line separated keywords.")
+    subparser.add_argument("--input", nargs="*", default=[], help="CSV / TXT / Excel files of keywords.")
+    subparser.add_argument("--lang", default="en", help="Search language code.")
+    subparser.add_argument("--limit", type=int, default=100, help="Max results per query.")
+    subparser.add_argument("--inurl", action="store_true", help="Also search with 'inurl:'.")
+    subparser.add_argument("--homepage", action="store_true", help="Keep only homepage results.")
+    subparser.add_argument("--engine", action="append", choices=["api", "library", "duckduckgo", "homemade", "selenium"],
+                           help="Search engine (may be given several times, defaults to api).")
+    subparser.add_argument("--search-workers", type=int, default=config.SEARCH_WORKERS, help="Searches run at the same time.")
+
+    subparsers.add_parser("rescore", parents=[common], help="Re-score the rows already in the output with the current keywords (no fetching).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(message)s")
+
+    # Imported here so --help works without loading the search stack
+    from searching import process_urls, domain_split, process_keywords, rescore_sheets
+    import events
+    import metrics
+    from politeness import get_scheduler
+    from canonical_urls import UrlIndex
+    # No browser session: Streamlit would warn about running bare and about the missing ScriptRunContext on every st.* call
+    streamlit.config.set_option("global.showWarningOnDirectExecution", False)
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+
+    secret_name, worksheet_names = COMMANDS[args.command]
+    sheet_id = args.sheet_id or get_secret(secret_name)
+    if args.output == "sheets" and not sheet_id:
+        sys.exit(f"No output spreadsheet: pass --sheet-id or set '{secret_name}' in .streamlit/secrets.toml")
+    sheet_id = sheet_id or f"local-{args.command}"
+
+    remote = authorize(args.credentials) if args.credentials else None
+    client = remote if args.output == "sheets" else LocalClient(remote, [sheet_id], args.output_dir)
+    if client is None:
+        sys.exit("Writing to Google Sheets needs --credentials")
+
+    config.MAX_WORKERS = args.workers
+    config.PER_HOST_LIMIT = args.per_host
+    if args.command == "keywords":
+        config.SEARCH_WORKERS = args.search_workers
+
+    done = read_done_urls(client, sheet_id, worksheet_names) if args.resume else set()
+
+    # The processing functions report their errors instead of raising, so the exit status comes from the run's reporter
+    raised = False
+    try:
+        if args.command == "rescore":
+            rescore_sheets(client, sheet_id)
+        elif args.command == "keywords":
+            keywords = re.split(r"[,\n]", args.keywords or "")
+            for path in args.input:
+                keywords.extend(read_input_file(path))
+            keywords = [keyword.strip() for keyword in keywords if keyword.strip()]
+            if not keywords:
+                sys.exit("Please provide at least one keyword (--keywords or --input).")
+            engines = args.engine or ["api"]
+            process_keywords(client, sheet_id, keywords, lang=args.lang, inurl=args.inurl, limit=args.limit,
+                             homepage=args.homepage, engine=engines, max_workers=args.workers, skip_urls=done)
+        else:
+            urls = [url for path in args.input for url in read_input_file(path)]
+            # Drop repeated URLs and the ones already done, in any spelling (see canonical_urls.py)
+            url_index = UrlIndex(done)
+            remaining = [url for url in urls if url_index.add(url)]
+            logging.info(f"{len(urls)} URLs read, {len(urls) - len(remaining)} already done, {len(remaining)} to process")
+            if args.command == "filter":
+                process_urls(client, sheet_id, remaining, args.name, max_workers=args.workers)
+            else:
+                domain_split(client, sheet_id, remaining, args.name, max_workers=args.workers)
+    except Exception:
+        logging.exception(f"The {args.command} run failed")
+        raised = True
+
+    run_metrics = metrics.last_run()
+    if args.metrics and run_metrics is not None:
+        with open(args.metrics, "w", encoding="utf-8") as file:
+            file.write(run_metrics.to_prometheus() if args.metrics.endswith(".prom") else run_metrics.to_json())
+        logging.info(f"Run metrics written to {args.metrics}")
+
+    scheduler = get_scheduler()
+    if args.host_stats and scheduler is not None:
+        with open(args.host_stats, "w", encoding="utf-8") as file:
+            json.dump(scheduler.stats(), file, indent=2)
+        logging.info(f"Per-host statistics written to {args.host_stats}")
+
+    if args.output == "parquet":
+        export_parquet(args.output_dir, worksheet_names)
+    if args.output != "sheets":
+        for name in worksheet_names:
+            rows = len(client.open_by_key(sheet_id).worksheet(name).col_values(1))
+            logging.info(f"{name}: {max(rows - 1, 0)} rows in {os.path.join(args.output_dir, name)}.{'parquet' if args.output == 'parquet' else 'csv'}")
+
+    reporter = events.last_reporter()
+    failed = raised or reporter is None or reporter.failed
+    errors = reporter.error_count() if reporter is not None else 0
+    if failed or errors > args.max_errors:
+        logging.error(f"The {args.command} run {'failed' if failed else 'finished'} with {errors} errors")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,129 @@
+# Number of URLs fetched and classified at the same time
+MAX_WORKERS = 8
 
+# Max number of concurrent requests to the same host
+PER_HOST_LIMIT = 2
+
+# Host prefixes that are aliases of the bare domain when deduplicating URLs (see canonical_urls.py)
+URL_HOST_ALIASES = ("www.", "m.", "mobile.")
+
+# Where the compiled word lexicon of the spaCy models is cached (None to disable)
+LEXICON_PATH = "lexicon.pickle"
+
+# Translator backend: "google" (googletrans) or "identity" (offline stand-in that returns texts unchanged)
+TRANSLATOR = "google"
+
+# Persistent translation cache (None to disable), entry lifetime in seconds and max number of entries
+TRANSLATION_CACHE_PATH = "translations.sqlite"
+TRANSLATION_CACHE_TTL = 30 * 24 * 60 * 60
+TRANSLATION_CACHE_MAX_ENTRIES = 200000
+
+# Rows are appended to Google Sheets once a worksheet has this many pending rows, or the oldest is this old
+SHEET_FLUSH_ROWS = 20
+SHEET_FLUSH_SECONDS = 15
+
+# How many times a Sheets API call is retried on quota (429) and server errors
+SHEET_RETRIES = 5
+
+# Persistent store of classified URLs (None to disable) and how long a classification stays fresh, in seconds
+RESULT_STORE_PATH = "results.sqlite"
+RESULT_STORE_MAX_AGE = 7 * 24 * 60 * 60
+
+# What to do with URLs that are fresh in the store: "answer" re-scores them from the stored
+# metadata without fetching, "skip" leaves them out of the run, None disables the store
+RESULT_STORE_MODE = "answer"
+
+# Number of searches run at the same time
+SEARCH_WORKERS = 4
+
+# Requests per second and burst size allowed for each search engine
+ENGINE_RATE_LIMITS = {
+    "api": (1.0, 5),
+    "homemade": (0.15, 1),
+    "library": (0.15, 1),
+    "selenium": (0.15, 1),
+    "duckduckgo": (0.25, 1),
+    "default": (0.2, 1)
+}
+
+# Random extra wait between search requests, as a fraction of the refill interval
+ENGINE_RATE_JITTER = 0.5
+
+# Max number of items waiting between two pipeline stages
+PIPELINE_QUEUE_SIZE = 100
+
+# HTTP client: connect/read timeouts in seconds, retries (with exponential backoff) on connection
+# errors and these statuses, number of hosts whose connections are kept alive, and optional HTTP/2
+# (needs httpx with h2 installed)
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 20
+HTTP_RETRIES = 2
+HTTP_RETRY_BACKOFF = 1
+HTTP_RETRY_STATUSES = {502, 503, 504}
+HTTP_HOST_POOLS = 200
+HTTP2 = False
+
+# How long search engine responses are cached, in seconds (0 to disable)
+HTTP_CACHE_SECONDS = 300
+
+# Page fetches stop reading after the </head>, or after this many bytes, in chunks of this size
+HEAD_MAX_BYTES = 256 * 1024
+HEAD_CHUNK_SIZE = 16 * 1024
+
+# Progress display: the UI is refreshed at most this often (seconds), with up to this many recent messages;
+# headless runs log a progress line every LOG_PROGRESS_SECONDS with HEADLESS_REPORTER = "logging" (None for silence)
+PROGRESS_REFRESH_SECONDS = 0.5
+PROGRESS_MAX_MESSAGES = 5
+LOG_PROGRESS_SECONDS = 30
+HEADLESS_REPORTER = "logging"
+
+# Job checkpoints used to resume interrupted runs (None to disable), and how long finished jobs are kept, in seconds
+JOB_STORE_PATH = "jobs.sqlite"
+JOB_MAX_AGE = 30 * 24 * 60 * 60
+
+# Wikidata: SPARQL endpoint (a local stub can be used for testing), User-Agent (required by the public endpoint),
+# max concurrent queries, read timeout in seconds, IDs/labels resolved per VALUES query, and the label cache
+WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+WIKIDATA_USER_AGENT = "IIA-Tools/1.0 (https://iia-tools.streamlit.app/)"
+WIKIDATA_MAX_CONCURRENT = 3
+WIKIDATA_TIMEOUT = 65
+WIKIDATA_BATCH_SIZE = 200
+WIKIDATA_CACHE_PATH = "wikidata.sqlite"
+WIKIDATA_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Wikidata item queries are fetched in pages of the items of this many classes of the value's subclass
+# closure (halved when a page times out, down to the minimum)
+WIKIDATA_PAGE_SIZE = 200
+WIKIDATA_MIN_PAGE_SIZE = 1
+
+# Run metrics (stage timers and counters, see metrics.py): collected when enabled, and shown at the end of
+# every run in the Streamlit UI when METRICS_SHOW_IN_UI is set
+METRICS_ENABLED = True
+METRICS_SHOW_IN_UI = True
+
+# Adaptive per-host politeness of page fetches (see politeness.py; False to use the fixed PER_HOST_LIMIT):
+# a host starts at PER_HOST_LIMIT concurrent requests and earns more, up to POLITENESS_MAX_PER_HOST, while
+# it answers quickly; a 429/503 halves them and doubles its delay between requests (starting at
+# POLITENESS_BACKOFF_SECONDS, at most POLITENESS_MAX_DELAY, or longer if its Retry-After asks); hosts
+# slower than POLITENESS_SLOW_SECONDS on average get one request at a time
+POLITENESS = True
+POLITENESS_MAX_PER_HOST = 6
+POLITENESS_BACKOFF_SECONDS = 1
+POLITENESS_MAX_DELAY = 60
+POLITENESS_SLOW_SECONDS = 5
+
+# DNS answers are cached for all the fetch workers (see dns_cache.py; False to resolve every connection):
+# addresses for DNS_CACHE_SECONDS and names that do not exist for DNS_NEGATIVE_CACHE_SECONDS. URLs are
+# resolved DNS_PREFLIGHT_WORKERS at a time ahead of the fetch stage, and those on dead domains get their
+# Error row there without being fetched
+DNS_CACHE = True
+DNS_CACHE_SECONDS = 10 * 60
+DNS_NEGATIVE_CACHE_SECONDS = 60 * 60
+DNS_CACHE_MAX_ENTRIES = 100000
+DNS_PREFLIGHT_WORKERS = 32
+
+# robots.txt files are fetched once per host and kept for ROBOTS_CACHE_SECONDS (see robots.py); with
+# RESPECT_ROBOTS_TXT, pages whose robots.txt disallows our User-Agent are not fetched, and a host's
+# Crawl-delay (up to POLITENESS_MAX_DELAY) is the least delay the scheduler keeps between its requests
+RESPECT_ROBOTS_TXT = False
+ROBOTS_CACHE_SECONDS = 24 * 60 * 60
@@ -0,0 +1,96 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    A small persistent key/value cache backed by SQLite, shared by all threads of the process.
+
+    Values are stored as JSON. Entries older than `ttl` seconds are treated as missing, and when the
+    cache grows beyond `max_entries` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, table="cache", ttl=None, max_entries=None):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, created REAL, last_used REAL)"
+            )
+            self._connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+
+    def _is_fresh(self, created, now):
+        return self.ttl is None or now - created <= self.ttl
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        """Returns a dict of the fresh cached values for the given keys (missing keys are left out)."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT key, value, created FROM {self.table} WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, value, created in rows:
+                    if self._is_fresh(created, now):
+                        found[key] = json.loads(value)
+            if found:
+                with self._connection:
+                    self._connection.executemany(
+                        f"UPDATE {self.table} SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                    )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                    [(key, json.dumps(value), now, now) for key, value in items.items()]
+                )
+            self._writes_since_eviction += len(items)
+            if self.max_entries and self._writes_since_eviction >= max(self.max_entries // 100, 1):
+                self._evict()
+
+    def delete(self, key):
+        with self._lock, self._connection:
+            self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def _evict(self):
+        """Drops expired entries, then the least recently used ones beyond max_entries (lock must be held)."""
+        self._writes_since_eviction = 0
+        with self._connection:
+            if self.ttl is not None:
+                self._connection.execute(f"DELETE FROM {self.table} WHERE created < ?", (time.time() - self.ttl,))
+            if self.max_entries:
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
@@ -0,0 +1,149 @@
+import socket
+import threading
+import time
+import urllib3.util.connection
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+import config
+import metrics
+from canonical_urls import parse_url
+
+_resolver = None
+_lock = threading.Lock()
+
+# getaddrinfo errors that mean the name does not exist (NXDOMAIN or no address records), as opposed
+# to temporary failures - only these are cached as negative answers
+NOT_FOUND_ERRORS = {error for error in (getattr(socket, "EAI_NONAME", None), getattr(socket, "EAI_NODATA", None)) if error is not None}
+
+
+class DnsCache:
+    """
+    A process-wide cache of DNS answers shared by all the fetch workers.
+
+    Addresses are kept for `ttl` seconds and names that do not exist for `negative_ttl` seconds, so
+    a host is resolved once per run however many of its URLs are fetched, and a dead domain fails at
+    once instead of going through the resolver (and the HTTP client's retries) again. Concurrent
+    lookups of the same name wait for a single getaddrinfo call.
+
+    Only the connections of the page-fetch client use it (see cached_dns_connection_class); Sheets,
+    Google auth, search and Wikidata traffic resolve as usual.
+    """
+
+    def __init__(self, ttl=None, negative_ttl=None, max_entries=None):
+        self.ttl = ttl or config.DNS_CACHE_SECONDS
+        self.negative_ttl = negative_ttl or config.DNS_NEGATIVE_CACHE_SECONDS
+        self.max_entries = max_entries or config.DNS_CACHE_MAX_ENTRIES
+        self._entries = {}  # host -> (expiry time, list of addresses or the socket.gaierror)
+        self._pending = {}  # host -> Event set when its lookup in progress finishes
+        self._lock = threading.Lock()
+
+    def _cached(self, host):
+        entry = self._entries.get(host)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    def _store(self, host, answer, ttl):
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+            # Still full: drop the oldest tenth
+            for key in list(self._entries)[:max(len(self._entries) - self.max_entries + 1, self.max_entries // 10)]:
+                del self._entries[key]
+        self._entries[host] = (time.monotonic() + ttl, answer)
+
+    def resolve(self, host):
+        """Returns the addresses of a host, in resolver order. Raises socket.gaierror."""
+        host = host.lower()
+        while True:
+            with self._lock:
+                entry = self._cached(host)
+                if entry is None:
+                    pending = self._pending.get(host)
+                    if pending is None:
+                        pending = self._pending[host] = threading.Event()
+                        break
+            if entry is not None:
+                metrics.count("dns.hits")
+                if isinstance(entry[1], Exception):
+                    raise socket.gaierror(entry[1].errno, entry[1].strerror)
+                return entry[1]
+            pending.wait()
+
+        metrics.count("dns.lookups")
+        try:
+            with metrics.timer("dns"):
+                infos = socket.getaddrinfo(host, None, urllib3.util.connection.allowed_gai_family(), socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            with self._lock:
+                self._store(host, addresses, self.ttl)
+            return addresses
+        except socket.gaierror as e:
+            if e.errno in NOT_FOUND_ERRORS:
+                metrics.count("dns.not_found")
+                with self._lock:
+                    self._store(host, e, self.negative_ttl)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(host, None)
+            pending.set()
+
+    def is_resolvable(self, host):
+        """Resolves a host (or takes its cached answer) and tells whether it exists."""
+        try:
+            self.resolve(host)
+            return True
+        except socket.gaierror as e:
+            return e.errno not in NOT_FOUND_ERRORS
+        except UnicodeError:
+            return False
+
+    def is_known_dead(self, host):
+        """Whether the host is cached as not existing (never starts a lookup)."""
+        with self._lock:
+            entry = self._cached(host.lower())
+        return entry is not None and isinstance(entry[1], Exception)
+
+
+# Helper function to make a urllib3 connection class that resolves its host through a DnsCache
+def cached_dns_connection_class(base, resolver):
+    class CachedDnsConnection(base):
+        def _new_conn(self):
+            host = self._dns_host
+            if host.startswith("["):  # IPv6 literals need no lookup
+                return super()._new_conn()
+            try:
+                addresses = resolver.resolve(host)
+            except socket.gaierror as e:
+                raise NameResolutionError(self.host, self, e) from e
+            # Connect to each address in turn; the host name itself (Host header, TLS SNI and
+            # certificate check) is restored before the connection is used
+            error = None
+            try:
+                for address in addresses:
+                    self._dns_host = address
+                    try:
+                        return super()._new_conn()
+                    except (NewConnectionError, ConnectTimeoutError) as e:
+                        error = e
+            finally:
+                self._dns_host = host
+            raise error or NewConnectionError(self, f"No address for {host}")
+
+    return CachedDnsConnection
+
+
+# Function to get the process-wide DNS cache (None when disabled in config)
+def get_resolver():
+    global _resolver
+    if _resolver is None and config.DNS_CACHE:
+        with _lock:
+            if _resolver is None:
+                _resolver = DnsCache()
+    return _resolver
+
+
+# Function to tell whether a URL's host is known not to exist (without resolving it)
+def is_dead_url(url):
+    resolver = get_resolver()
+    return resolver is not None and resolver.is_known_dead(parse_url(url).hostname)
@@ -0,0 +1,254 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import config
+
+logger = logging.getLogger("iia")
+
+_reporters = {}  # Streamlit session id (None when headless) -> the reporter of the run in progress
+_last_reporters = {}  # Streamlit session id -> the reporter of the last finished run
+_lock = threading.Lock()
+
+
+class Reporter:
+    """
+    Receives the progress and events of a run (URLs done, searches finished, errors) from any thread.
+
+    Events are only recorded here, which is cheap; a subclass renders them from `render()`, which is
+    called at most once every config.PROGRESS_REFRESH_SECONDS, so the per-item cost stays constant no
+    matter how the events are displayed. Errors are aggregated by source and error type.
+    This base class renders nothing and works as the no-op reporter.
+    """
+
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = config.PROGRESS_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.label = ""
+        self.total = None
+        self.done = 0
+        self.last_item = None
+        self.counts = {}
+        self.errors = {}  # (source, kind) -> {"count", "item", "message"}
+        self.messages = []
+        self.failed = False  # Set when the run finishes with ok=False or raises
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._rendered = 0.0
+
+    def start(self, label, total=None):
+        self.label = label
+        self.total = total
+        self._refresh(force=True)
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+
+    def advance(self, amount=1, item=None):
+        """Marks items as done."""
+        with self._lock:
+            self.done += amount
+            if item is not None:
+                self.last_item = item
+        self._refresh()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+        self._refresh()
+
+    def info(self, message):
+        with self._lock:
+            self.messages.append(message)
+        self._refresh()
+
+    def error(self, source, item, error):
+        kind = type(error).__name__ if isinstance(error, BaseException) else str(error)[:80]
+        with self._lock:
+            entry = self.errors.setdefault((source, kind), {"count": 0, "item": None, "message": None})
+            entry["count"] += 1
+            entry["item"] = item
+            entry["message"] = str(error)
+        self._refresh()
+
+    def debug(self, title, text=None):
+        # Debug output (e.g., raw search HTML) is only ever logged, never sent to the UI
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s\n%s", title, text or "")
+
+    def finish(self, message=None, ok=True):
+        if not ok:
+            self.failed = True
+        self._refresh(force=True, final=True, message=message, ok=ok)
+
+    def error_rows(self):
+        with self._lock:
+            return [{"Source": source, "Error": kind, "Count": entry["count"], "Last Item": str(entry["item"]), "Last Message": entry["message"]}
+                    for (source, kind), entry in sorted(self.errors.items(), key=lambda pair: -pair[1]["count"])]
+
+    def error_count(self):
+        with self._lock:
+            return sum(entry["count"] for entry in self.errors.values())
+
+    def progress_text(self):
+        with self._lock:
+            done, total, counts = self.done, self.total, dict(self.counts)
+        text = f"{self.label}: {done}" + (f" / {total}" if total else "")
+        extra = [f"{name}: {value}" for name, value in counts.items()]
+        errors = self.error_count()
+        if errors:
+            extra.append(f"errors: {errors}")
+        return text + (f" ({', '.join(extra)})" if extra else "")
+
+    def _refresh(self, force=False, final=False, message=None, ok=True):
+        now = time.monotonic()
+        if not force and now - self._rendered < self.refresh_seconds:
+            return
+        # Only one thread renders at a time; the others skip instead of waiting
+        if not self._render_lock.acquire(blocking=force):
+            return
+        try:
+            self._rendered = now
+            with self._lock:
+                messages, self.messages = self.messages, []
+            self.render(messages, final=final, message=message, ok=ok)
+        finally:
+            self._render_lock.release()
+
+    def render(self, messages, final=False, message=None, ok=True):
+        pass
+
+
+class LoggingReporter(Reporter):
+    """Logs progress lines (throttled), messages and an error summary at the end (for headless runs)."""
+
+    def __init__(self, refresh_seconds=None):
+        super().__init__(config.LOG_PROGRESS_SECONDS if refresh_seconds is None else refresh_seconds)
+
+    def error(self, source, item, error):
+        super().error(source, item, error)
+        logger.warning("Error processing %s for '%s': %s", source, item, error)
+
+    def render(self, messages, final=False, message=None, ok=True):
+        for text in messages:
+            logger.info(text)
+        logger.info(self.progress_text())
+        if final:
+            for row in self.error_rows():
+                logger.warning("%s x%d: %s (last: '%s': %s)", row["Source"], row["Count"], row["Error"], row["Last Item"], row["Last Message"])
+            if message:
+                (logger.info if ok else logger.error)(message)
+
+
+class StreamlitReporter(Reporter):
+    """
+    Shows a run as a single progress bar, the latest messages and one aggregated error table, updated
+    at most every config.PROGRESS_REFRESH_SECONDS. Must be created from the Streamlit script thread.
+    """
+
+    def __init__(self, refresh_seconds=None):
+        super().__init__(refresh_seconds)
+        self._progress = st.progress(0.0)
+        self._messages = st.empty()
+        self._errors = st.empty()
+        self._recent = []
+
+    def render(self, messages, final=False, message=None, ok=True):
+        if self.total:
+            fraction = min(self.done / self.total, 1.0)
+        else:
+            fraction = 1.0 if final else 0.0
+        text = self.progress_text()
+        if self.last_item is not None and not final:
+            text += f" - last: {self.last_item}"
+        self._progress.progress(fraction, text=text)
+
+        if messages:
+            self._recent = (self._recent + messages)[-config.PROGRESS_MAX_MESSAGES:]
+            self._messages.caption("  \n".join(self._recent))
+
+        rows = self.error_rows()
+        if rows:
+            self._errors.dataframe(rows)
+
+        if final and message:
+            (st.success if ok else st.error)(message)
+
+
+# Helper function to get the key of the current Streamlit session (None outside Streamlit)
+def session_key():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return getattr(ctx, "session_id", None) if ctx is not None else None
+
+
+# Function to create the reporter for a new run
+def new_reporter():
+    """A StreamlitReporter inside a Streamlit session, otherwise config.HEADLESS_REPORTER ("logging" or None)."""
+    if session_key() is not None:
+        return StreamlitReporter()
+    if config.HEADLESS_REPORTER == "logging":
+        return LoggingReporter()
+    return Reporter()
+
+
+# Function to get the reporter of the run in progress (in this session), or one that only logs
+def get_reporter():
+    return _reporters.get(session_key()) or _fallback_reporter
+
+
+# Context manager that makes a reporter receive the events of a run
+@contextmanager
+def reporting(label, total=None, reporter=None):
+    """
+    Starts a reporter (new_reporter() by default) and registers it for the current session, so the
+    module-level functions below (called from any worker thread of the run) report to it.
+    """
+    reporter = reporter or new_reporter()
+    key = session_key()
+    with _lock:
+        previous = _reporters.get(key)
+        _reporters[key] = reporter
+    reporter.start(label, total)
+    try:
+        yield reporter
+    except BaseException:
+        reporter.failed = True
+        raise
+    finally:
+        with _lock:
+            if previous is None:
+                _reporters.pop(key, None)
+            else:
+                _reporters[key] = previous
+            _last_reporters[key] = reporter
+
+
+# Function to get the reporter of the last finished run in this session (None before the first run)
+def last_reporter():
+    return _last_reporters.get(session_key())
+
+
+# Functions to report to the reporter of the run in progress
+def info(message):
+    get_reporter().info(message)
+
+
+def error(source, item, error_message):
+    get_reporter().error(source, item, error_message)
+
+
+def debug(title, text=None):
+    get_reporter().debug(title, text)
+
+
+def advance(amount=1, item=None):
+    get_reporter().advance(amount, item)
+
+
+def count(name, amount=1):
+    get_reporter().count(name, amount)
+
+
+_fallback_reporter = LoggingReporter()
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from searching import process_urls
+from searching import process_urls, rescore_sheets
 
 def run(client):
     # Main interface for URL filtering
@@ -59,3 +59,9 @@ def run(client):
             sheet_id = st.secrets["filter_id"]
             st.success(f"The URLs from '{source_name}' are being processed...")
             process_urls(client, sheet_id, urls, source_name)
+
+    # Re-score the rows already in the sheets (e.g., after the Keywords sheet was edited)
+    with st.expander("Re-score existing rows"):
+        st.write("Applies the current keywords to the rows already in the Sure / Not Sure sheets, without fetching the pages again. Only the Tier, Details and keyword counts are updated.")
+        if st.button("Re-score"):
+            rescore_sheets(client, st.secrets["filter_id"])
@@ -0,0 +1,93 @@
+import codecs
+from html.parser import HTMLParser
+import config
+
+# Content types we parse; anything else is skipped without downloading the body
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+
+class HeadParser(HTMLParser):
+    """
+    An incremental parser that only collects what we need from a page's <head>: the title, the meta
+    description, og:description and the <html lang> attribute. `done` becomes True at </head> (or at
+    <body> for pages without a closing head tag), after which the rest of the page can be ignored.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.description = None
+        self.og_description = None
+        self.lang = None
+        self.done = False
+        self._title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        if tag == "html" and self.lang is None:
+            self.lang = attrs.get("lang") or ""
+        elif tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "meta":
+            if (attrs.get("name") or "").lower() == "description" and self.description is None:
+                self.description = attrs.get("content") or ""
+            elif (attrs.get("property") or "").lower() == "og:description" and self.og_description is None:
+                self.og_description = attrs.get("content") or ""
+        elif tag == "body":
+            self.finish_title()
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.finish_title()
+        elif tag == "head":
+            self.finish_title()
+            self.done = True
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def finish_title(self):
+        if self._title_parts is not None:
+            self.title = "".join(self._title_parts)
+            self._title_parts = None
+
+
+# Helper function to check a Content-Type header
+def is_html_content_type(content_type):
+    """Pages without a Content-Type are assumed to be HTML."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return not content_type or content_type in HTML_CONTENT_TYPES
+
+
+# Function to read a response's <head> without downloading the whole page
+def read_head(response, max_bytes=None, chunk_size=None):
+    """
+    Reads a streamed response in chunks and feeds them to a HeadParser, stopping at the end of the
+    <head> or after `max_bytes` bytes. The response is closed afterwards.
+
+    :param response: A response opened with stream=True.
+    :return: A tuple (parser, bytes_read). The parser is None when the content type is not HTML.
+    """
+    max_bytes = max_bytes or config.HEAD_MAX_BYTES
+    bytes_read = 0
+    try:
+        if not is_html_content_type(response.headers.get("Content-Type")):
+            return None, 0
+        parser = HeadParser()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for chunk in response.iter_content(chunk_size=chunk_size or config.HEAD_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if parser.done or bytes_read >= max_bytes:
+                break
+        else:
+            parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+        parser.finish_title()
+        return parser, bytes_read
+    finally:
+        response.close()
@@ -0,0 +1,221 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import config
+import metrics
+from dns_cache import cached_dns_connection_class, get_resolver, is_dead_url
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 is optional
+    httpx = None
+
+_clients = {}
+_lock = threading.Lock()
+
+
+# Helper function to read a Retry-After header (seconds or an HTTP date) as a number of seconds
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# Helper function to make connection pool classes that count checkouts and new connections in the run metrics
+# (and, with a resolver, open their connections through that DNS cache)
+def counting_pool_class(base, resolver=None):
+    class CountingConnectionPool(base):
+        if resolver is not None:
+            ConnectionCls = cached_dns_connection_class(base.ConnectionCls, resolver)
+
+        def _get_conn(self, timeout=None):
+            metrics.count("http.connection_checkouts")
+            return super()._get_conn(timeout)
+
+        def _new_conn(self):
+            metrics.count("http.new_connections")
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    A requests adapter whose connection pools count how often a kept-alive connection is reused
+    (checkouts minus new connections, in the run metrics). With a `resolver` (a dns_cache.DnsCache),
+    its connections resolve their hosts through that cache.
+    """
+
+    def __init__(self, resolver=None, **kwargs):
+        self.resolver = resolver
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": counting_pool_class(HTTPConnectionPool, self.resolver),
+            "https": counting_pool_class(HTTPSConnectionPool, self.resolver),
+        }
+
+
+class Http2Response:
+    """Wraps an httpx response with the parts of the requests.Response interface we use."""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.encoding = None
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    @property
+    def text(self):
+        content = self.content
+        return content.decode(self.encoding or self._response.encoding or "utf-8", errors="replace")
+
+    def iter_content(self, chunk_size=None):
+        return self._response.iter_bytes()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def close(self):
+        self._response.close()
+
+
+# Helper function to build an httpx timeout from connect/read seconds
+def httpx_timeout(connect_timeout, read_timeout):
+    try:
+        return httpx.Timeout(read_timeout, connect=connect_timeout)
+    except TypeError:  # Older httpx versions
+        return httpx.Timeout(connect_timeout=connect_timeout, read_timeout=read_timeout)
+
+
+class Http2Session:
+    """A minimal requests-like session on top of httpx, used when HTTP/2 is enabled."""
+
+    def __init__(self, connect_timeout, read_timeout):
+        self._client = httpx.Client(http2=True, timeout=httpx_timeout(connect_timeout, read_timeout))
+        self.headers = {}
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False, allow_redirects=True):
+        """`timeout` is a number of seconds or a (connect, read) tuple, as in requests."""
+        headers = {**self.headers, **(headers or {})}
+        options = {}
+        if timeout is not None:
+            options["timeout"] = httpx_timeout(*timeout) if isinstance(timeout, tuple) else httpx_timeout(timeout, timeout)
+        try:
+            try:
+                request = self._client.build_request("GET", url, params=params, headers=headers, **options)
+                response = self._client.send(request, stream=stream, follow_redirects=allow_redirects)
+            except TypeError:  # Older httpx versions take the timeout and redirects in send()
+                request = self._client.build_request("GET", url, params=params, headers=headers)
+                response = self._client.send(request, stream=stream, allow_redirects=allow_redirects, **options)
+        except Exception as e:  # httpx (and httpcore) transport errors
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        return Http2Response(response)
+
+
+class HttpClient:
+    """
+    A shared HTTP client: one pooled session with per-host keep-alive, connect/read timeouts and retries.
+
+    Connection pools are kept for up to `host_pools` hosts with up to `pool_size` connections each,
+    so repeated requests to a host reuse a kept-alive connection instead of a new TCP/TLS handshake.
+    Connection errors and the statuses in config.HTTP_RETRY_STATUSES are retried with exponential backoff.
+    With `http2=True` (and httpx with h2 installed) requests go through an HTTP/2 client instead.
+    `cache_name` enables a requests_cache response cache for `cache_expire` seconds, and `resolver`
+    (a dns_cache.DnsCache) resolves the hosts of its HTTP/1.1 connections through that cache.
+    """
+
+    def __init__(self, pool_size=None, host_pools=None, connect_timeout=None, read_timeout=None, retries=None,
+                 http2=None, cache_name=None, cache_expire=None, resolver=None):
+        self.connect_timeout = connect_timeout or config.HTTP_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or config.HTTP_READ_TIMEOUT
+        self.retries = config.HTTP_RETRIES if retries is None else retries
+        http2 = config.HTTP2 if http2 is None else http2
+
+        if http2 and httpx is not None:
+            self.session = Http2Session(self.connect_timeout, self.read_timeout)
+            self.http_version = "HTTP/2"
+        else:
+            if cache_name:
+                self.session = requests_cache.CachedSession(cache_name, expire_after=cache_expire)
+            else:
+                self.session = requests.Session()
+            adapter = CountingHTTPAdapter(
+                resolver=resolver,
+                pool_connections=host_pools or config.HTTP_HOST_POOLS,
+                pool_maxsize=pool_size or max(config.MAX_WORKERS, config.SEARCH_WORKERS)
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            self.http_version = "HTTP/1.1"
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        """Sends a GET request, retrying connection errors and retryable statuses."""
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            metrics.count("http.requests")
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                metrics.count("http.errors")
+                # A host that does not exist will not exist on the next attempt either
+                if attempt == self.retries or is_dead_url(url):
+                    raise
+            else:
+                metrics.count(f"http.status.{response.status_code}")
+                if getattr(response, "from_cache", False):
+                    metrics.count("http.cache_hits")
+                if response.status_code not in config.HTTP_RETRY_STATUSES or attempt == self.retries:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.close()
+            metrics.count("http.retries")
+            # Wait as long as the server asks (within reason), or back off exponentially
+            if retry_after is not None:
+                metrics.sleep(min(retry_after, config.POLITENESS_MAX_DELAY), "http_retry")
+            else:
+                metrics.sleep(config.HTTP_RETRY_BACKOFF * 2 ** attempt + random.uniform(0, 0.5), "http_retry")
+
+
+# Function to get a shared HTTP client
+def get_client(name="pages"):
+    """
+    Returns the process-wide client for a kind of traffic: "pages" for fetching the pages we classify,
+    "search" for search engine requests (which keep the short response cache of config.HTTP_CACHE_SECONDS).
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                if name == "search" and config.HTTP_CACHE_SECONDS:
+                    client = HttpClient(cache_name="http_cache", cache_expire=config.HTTP_CACHE_SECONDS, http2=False)
+                elif name == "pages":
+                    # Page fetches resolve their hosts through the shared DNS cache (see dns_cache.py), and
+                    # are retried by fetch_page_metadata under the host scheduler instead of in here
+                    client = HttpClient(resolver=get_resolver(), retries=0)
+                else:
+                    client = HttpClient()
+                _clients[name] = client
+    return client
+
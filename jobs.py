@@ -0,0 +1,187 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import config
+
+_store = None
+_lock = threading.Lock()
+
+# Status of a job's items: a row was computed ("done"), then written to the sheet ("flushed");
+# searches whose result pages are saved are "searched"; paged queries keep their cursor as "paged".
+# Items without a status are still pending.
+DONE = "done"
+FLUSHED = "flushed"
+SEARCHED = "searched"
+PAGED = "paged"
+
+
+# Helper function to get the ID of a job from its kind, destination and inputs
+def make_job_id(kind, sheet_id, name, inputs):
+    """The same submission (e.g., the same list re-uploaded after a reload) always gets the same ID."""
+    payload = json.dumps([kind, sheet_id, name, list(inputs)], ensure_ascii=False, default=str)
+    return f"{kind}-{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+
+class Job:
+    """
+    The persistent state of one run: the status of every item (URL or search) and the rows computed
+    for it, and how many sheet batches were flushed. Used to resume an interrupted run.
+    """
+
+    def __init__(self, store, job_id, kind, name, resumed):
+        self.store = store
+        self.job_id = job_id
+        self.kind = kind
+        self.name = name
+        self.resumed = resumed
+
+    def keys(self, *statuses):
+        """Returns the set of item keys having one of the statuses."""
+        return self.store.item_keys(self.job_id, statuses)
+
+    def unflushed_rows(self):
+        """Returns (worksheet title, row) for every row computed but not written to the sheet yet."""
+        return [tuple(data) for data in self.store.item_data(self.job_id, DONE)]
+
+    def searched_pages(self):
+        """Returns a dict of search key -> saved result pages."""
+        return dict(self.store.item_data(self.job_id, SEARCHED, with_keys=True))
+
+    def page_cursors(self):
+        """Returns a dict of query key -> (cursor after the last written page, whether the query is complete)."""
+        return {key: tuple(data) for key, data in self.store.item_data(self.job_id, PAGED, with_keys=True)}
+
+    def mark_done(self, key, worksheet_title, row):
+        self.store.set_items(self.job_id, [(str(key), DONE, [worksheet_title, row])])
+
+    def mark_searched(self, key, pages):
+        self.store.set_items(self.job_id, [(key, SEARCHED, pages)])
+
+    def mark_page(self, key, cursor, complete=False):
+        """Saves the cursor of a paged query once the rows of its page are written."""
+        self.store.set_items(self.job_id, [(key, PAGED, [cursor, complete])])
+
+    def mark_flushed(self, batches):
+        """SheetSink on_flush callback: marks the rows of the written batches (keyed by their first cell) as flushed."""
+        keys = [str(row[0]) for _, rows in batches for row in rows]
+        self.store.mark_flushed(self.job_id, keys)
+
+    def finish(self, status="finished"):
+        self.store.set_job_status(self.job_id, status)
+
+
+class JobStore:
+    """
+    Persistent job checkpoints in SQLite: one row per job (kind, name, status, flushed batches) and
+    one row per item. Finished jobs older than `max_age` seconds are removed.
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, kind TEXT, name TEXT, sheet_id TEXT, "
+                "status TEXT, flushed_batches INTEGER, flushed_rows INTEGER, created REAL, updated REAL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS items (job_id TEXT, key TEXT, status TEXT, data TEXT, updated REAL, "
+                "PRIMARY KEY (job_id, key))"
+            )
+            if max_age is not None:
+                old = [row[0] for row in self._connection.execute(
+                    "SELECT job_id FROM jobs WHERE status != 'running' AND updated < ?", (time.time() - max_age,))]
+                self._connection.executemany("DELETE FROM items WHERE job_id = ?", [(job_id,) for job_id in old])
+                self._connection.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in old])
+
+    def start_job(self, kind, sheet_id, name, inputs):
+        """
+        Returns the Job for a submission. An interrupted ("running") job with the same ID is resumed;
+        a finished one is started over, since submitting the same list again is a request to redo it.
+        """
+        job_id = make_job_id(kind, sheet_id, name, inputs)
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            resumed = row is not None and row[0] == "running"
+            if not resumed:
+                self._connection.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, 'running', 0, 0, ?, ?)",
+                    (job_id, kind, name, sheet_id, now, now)
+                )
+        return Job(self, job_id, kind, name, resumed)
+
+    def item_keys(self, job_id, statuses):
+        placeholders = ",".join("?" * len(statuses))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key FROM items WHERE job_id = ? AND status IN ({placeholders})", (job_id, *statuses)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def item_data(self, job_id, status, with_keys=False):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, data FROM items WHERE job_id = ? AND status = ?", (job_id, status)
+            ).fetchall()
+        return [(key, json.loads(data)) if with_keys else json.loads(data) for key, data in rows]
+
+    def set_items(self, job_id, items):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?)",
+                [(job_id, key, status, json.dumps(data, ensure_ascii=False), now) for key, status, data in items]
+            )
+
+    def mark_flushed(self, job_id, keys):
+        now = time.time()
+        with self._lock, self._connection:
+            # The row itself is no longer needed once it is in the sheet
+            self._connection.executemany(
+                "UPDATE items SET status = ?, data = 'null', updated = ? WHERE job_id = ? AND key = ?",
+                [(FLUSHED, now, job_id, key) for key in keys]
+            )
+            self._connection.execute(
+                "UPDATE jobs SET flushed_batches = flushed_batches + 1, flushed_rows = flushed_rows + ?, updated = ? "
+                "WHERE job_id = ?", (len(keys), now, job_id)
+            )
+
+    def set_job_status(self, job_id, status):
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE jobs SET status = ?, updated = ? WHERE job_id = ?", (status, time.time(), job_id))
+
+
+# Function to get the process-wide job store (None when disabled in config)
+def get_job_store():
+    global _store
+    if _store is None and config.JOB_STORE_PATH:
+        with _lock:
+            if _store is None:
+                _store = JobStore(config.JOB_STORE_PATH, config.JOB_MAX_AGE)
+    return _store
+
+
+# Function to start (or resume) the job of a run
+def start_job(kind, sheet_id, name, inputs):
+    """Returns a Job, or None when job checkpoints are disabled."""
+    store = get_job_store()
+    return store.start_job(kind, sheet_id, name, inputs) if store else None
+
+
+# Function to put the rows an interrupted run computed but never wrote back in the sink
+def requeue_unflushed(job, sink, worksheets):
+    """
+    :param worksheets: A dict of worksheet title -> worksheet.
+    :return: The keys of the items that need no more work (their rows are flushed or re-queued).
+    """
+    for title, row in job.unflushed_rows():
+        sink.add(worksheets[title], [row])
+    return job.keys(DONE, FLUSHED)
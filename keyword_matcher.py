@@ -0,0 +1,100 @@
+import re
+import string
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+# Dashes and hyphens are word separators
+DASH_TABLE = str.maketrans({dash: " " for dash in ["-", "–", "—", "−"]})
+
+# Punctuation is removed
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+
+# Function to normalize a text the same way for keywords and for page text
+def normalize_for_matching(text):
+    """Lowercases, splits dashes, strips accents/special characters and punctuation, and collapses whitespace."""
+    text = (text or "").lower().translate(DASH_TABLE)
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    text = text.translate(PUNCTUATION_TABLE)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class KeywordMatcher:
+    """
+    Counts good and bad keywords in a text in a single pass.
+
+    Keywords are normalized like the text and may be phrases of several words. They are compiled into
+    an Aho-Corasick automaton over words, so every occurrence of every keyword (including overlapping
+    phrases) is found in one linear scan of the text's words.
+    """
+
+    def __init__(self, good_keywords, bad_keywords):
+        self.good_keywords = frozenset(filter(None, (normalize_for_matching(keyword) for keyword in good_keywords)))
+        self.bad_keywords = frozenset(filter(None, (normalize_for_matching(keyword) for keyword in bad_keywords)))
+
+        # The automaton: transitions per state, failure links, and the (good, bad) keyword counts
+        # ending at each state (including those reached through failure links)
+        self._transitions = [{}]
+        self._fail = [0]
+        self._good = [0]
+        self._bad = [0]
+        for keyword in self.good_keywords:
+            self._good[self._add(keyword.split())] += 1
+        for keyword in self.bad_keywords:
+            self._bad[self._add(keyword.split())] += 1
+        self._link()
+
+    def _add(self, words):
+        state = 0
+        for word in words:
+            next_state = self._transitions[state].get(word)
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions.append({})
+                self._fail.append(0)
+                self._good.append(0)
+                self._bad.append(0)
+                self._transitions[state][word] = next_state
+            state = next_state
+        return state
+
+    def _link(self):
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._transitions[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and word not in self._transitions[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._transitions[fail].get(word, 0)
+                self._good[next_state] += self._good[self._fail[next_state]]
+                self._bad[next_state] += self._bad[self._fail[next_state]]
+
+    def count_text(self, text):
+        """Returns (good_count, bad_count) for an already normalized text."""
+        transitions, fail, good, bad = self._transitions, self._fail, self._good, self._bad
+        good_count = bad_count = state = 0
+        for word in text.split():
+            while state and word not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(word, 0)
+            good_count += good[state]
+            bad_count += bad[state]
+        return good_count, bad_count
+
+    def count(self, title, description):
+        """Returns (good_count, bad_count) for a page's title and description."""
+        return self.count_text(normalize_for_matching(f"{title or ''} {description or ''}"))
+
+
+# Function to get a compiled matcher for keyword lists, built once per distinct lists
+@lru_cache(maxsize=8)
+def _compile_keywords(good_keywords, bad_keywords):
+    return KeywordMatcher(good_keywords, bad_keywords)
+
+
+def compile_keywords(good_keywords, bad_keywords):
+    return _compile_keywords(tuple(good_keywords), tuple(bad_keywords))
@@ -0,0 +1,216 @@
+import functools
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+import streamlit as st
+import config
+import events
+
+_runs = {}  # Streamlit session id (None when headless) -> the metrics of the run in progress
+_last_runs = {}  # Streamlit session id -> the metrics of the last finished run
+_lock = threading.Lock()
+_no_timer = nullcontext()
+
+
+class Metrics:
+    """
+    The timers and counters of one run, updated from any thread.
+
+    A timer accumulates the calls, total and longest seconds of a stage (e.g., "fetch" or
+    "sleep.rate_limit"); totals are summed over the threads, so stages that run concurrently can add
+    up to more than the run's duration. A counter is a plain number (HTTP statuses, cache hits, ...).
+    """
+
+    def __init__(self, label=""):
+        self.label = label
+        self.started = time.time()
+        self.finished = None
+        self.timers = {}  # name -> [calls, total seconds, max seconds]
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish(self):
+        self.finished = time.time()
+
+    def summary(self):
+        with self._lock:
+            timers = {name: list(values) for name, values in self.timers.items()}
+            counters = dict(self.counters)
+        return {
+            "label": self.label,
+            "started": self.started,
+            "duration_seconds": round((self.finished or time.time()) - self.started, 3),
+            "timers": {
+                name: {"calls": calls, "total_seconds": round(total, 4), "mean_seconds": round(total / calls, 6),
+                       "max_seconds": round(longest, 4)}
+                for name, (calls, total, longest) in sorted(timers.items(), key=lambda pair: -pair[1][1])
+            },
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self, prefix="iia"):
+        """The summary in the Prometheus text exposition format (e.g., for a node_exporter textfile)."""
+        summary = self.summary()
+        run = prometheus_label(summary["label"])
+        lines = [
+            f"# HELP {prefix}_run_duration_seconds Wall-clock duration of the run.",
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f'{prefix}_run_duration_seconds{{run="{run}"}} {summary["duration_seconds"]}',
+        ]
+        for metric, field, kind, text in [
+            ("stage_calls_total", "calls", "counter", "Number of times each stage ran."),
+            ("stage_seconds_total", "total_seconds", "counter", "Seconds spent in each stage, summed over threads."),
+            ("stage_max_seconds", "max_seconds", "gauge", "Longest single call of each stage."),
+        ]:
+            lines += [f"# HELP {prefix}_{metric} {text}", f"# TYPE {prefix}_{metric} {kind}"]
+            lines += [f'{prefix}_{metric}{{run="{run}",stage="{prometheus_label(name)}"}} {timer[field]}'
+                      for name, timer in summary["timers"].items()]
+        lines += [f"# HELP {prefix}_events_total Counted events (HTTP statuses, cache hits, translation calls, ...).",
+                  f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{run="{run}",event="{prometheus_label(name)}"}} {value}'
+                  for name, value in summary["counters"].items()]
+        return "\n".join(lines) + "\n"
+
+
+# Helper function to escape a Prometheus label value
+def prometheus_label(value):
+    return re.sub(r'["\\\n]', lambda match: {'"': '\\"', "\\": "\\\\", "\n": "\\n"}[match.group()], str(value))
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        current().observe(self.name, time.perf_counter() - self.start)
+
+
+# Function to get the metrics of the run in progress (in this session), or the process-wide ones
+def current():
+    return _runs.get(events.session_key()) or _process_metrics
+
+
+# Function to get the metrics of the last finished run in this session (None before the first run)
+def last_run():
+    return _last_runs.get(events.session_key())
+
+
+# Context manager that times a block as a stage
+def timer(name):
+    """Costs a single config lookup when config.METRICS_ENABLED is off."""
+    if not config.METRICS_ENABLED:
+        return _no_timer
+    return _Timer(name)
+
+
+# Decorator that times every call of a function as a stage
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not config.METRICS_ENABLED:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds):
+    if config.METRICS_ENABLED:
+        current().observe(name, seconds)
+
+
+def count(name, amount=1):
+    if config.METRICS_ENABLED:
+        current().count(name, amount)
+
+
+# Function to sleep, recording the time as the "sleep.<reason>" stage
+def sleep(seconds, reason):
+    time.sleep(seconds)
+    observe(f"sleep.{reason}", seconds)
+
+
+# Context manager that collects the metrics of a run
+@contextmanager
+def collecting(label):
+    """
+    Registers new Metrics for the current session, so timers and counters used from any worker
+    thread of the run go to them. In a Streamlit session the summary is shown when the run ends
+    (see show_metrics).
+    """
+    run = Metrics(label)
+    key = events.session_key()
+    with _lock:
+        previous = _runs.get(key)
+        _runs[key] = run
+    try:
+        yield run
+    finally:
+        run.finish()
+        with _lock:
+            if previous is None:
+                _runs.pop(key, None)
+            else:
+                _runs[key] = previous
+            _last_runs[key] = run
+        if key is not None and config.METRICS_ENABLED and config.METRICS_SHOW_IN_UI:
+            show_metrics(run)
+
+
+# Function to show the summary of a run in the Streamlit UI
+def show_metrics(run):
+    summary = run.summary()
+    duration = summary["duration_seconds"]
+    with st.expander(f"Run metrics: {summary['label']} ({duration:.1f}s)"):
+        if summary["timers"]:
+            st.dataframe([{
+                "Stage": name,
+                "Calls": timer["calls"],
+                "Total (s)": timer["total_seconds"],
+                "Mean (ms)": round(timer["mean_seconds"] * 1000, 2),
+                "Max (s)": timer["max_seconds"],
+                "% of run": round(100 * timer["total_seconds"] / duration, 1) if duration else None,
+            } for name, timer in summary["timers"].items()])
+        if summary["counters"]:
+            st.dataframe([{"Counter": name, "Value": value} for name, value in summary["counters"].items()])
+        # Per-host politeness (process-wide, so it covers every run of this process)
+        from politeness import get_scheduler
+        scheduler = get_scheduler()
+        host_stats = scheduler.stats() if scheduler is not None else []
+        if host_stats:
+            st.dataframe(host_stats)
+        json_column, prometheus_column = st.columns(2)
+        json_column.download_button("Download JSON", run.to_json(), file_name="run-metrics.json",
+                                    mime="application/json", on_click="ignore")
+        prometheus_column.download_button("Download Prometheus", run.to_prometheus(), file_name="run-metrics.prom",
+                                          mime="text/plain", on_click="ignore")
+
+
+_process_metrics = Metrics("process")
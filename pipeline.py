@@ -0,0 +1,121 @@
+import queue
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import config
+from workers import map_concurrently
+
+# Marks the end of a stage's output
+END = object()
+
+
+class StageError:
+    """Carries an exception raised in a stage thread to the consumer of the pipeline."""
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+class Pipeline:
+    """
+    A chain of stages connected by bounded queues, each stage running in its own thread.
+
+    Every stage is a transform: a function that takes an iterator of items and yields items. Items
+    flow through as soon as they are produced, and a full queue blocks the stage feeding it, so a slow
+    stage (e.g., the sheet writer) applies backpressure instead of letting memory grow.
+
+    Iterating over the pipeline runs it and yields the items coming out of the last stage.
+    `counts` holds the number of items each stage has produced so far.
+    """
+
+    def __init__(self, source, queue_size=None):
+        self.source = source
+        self.queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+        self.stages = []
+        self.counts = {}
+        self._stop = threading.Event()
+
+    def stage(self, name, transform):
+        """Adds a stage from a transform (iterator of items -> iterator of items)."""
+        self.stages.append((name, transform))
+        self.counts[name] = 0
+        return self
+
+    def map(self, name, function, workers=1, per_host=None, host_of=None, scheduler=None):
+        """
+        Adds a stage applying a function to every item, with `workers` threads (order is not kept when > 1).
+        `per_host`, `host_of` and `scheduler` are passed on to map_concurrently.
+        """
+        if workers > 1:
+            return self.stage(name, lambda items: (result for _, result in map_concurrently(
+                function, items, max_workers=workers, per_host=per_host or workers, host_of=host_of or (lambda item: None),
+                scheduler=scheduler)))
+        return self.stage(name, lambda items: (function(item) for item in items))
+
+    def filter(self, name, predicate):
+        """Adds a stage keeping only the items for which the predicate is true."""
+        return self.stage(name, lambda items: (item for item in items if predicate(item)))
+
+    def flat_map(self, name, function):
+        """Adds a stage replacing every item with the items of the iterable the function returns."""
+        return self.stage(name, lambda items: (result for item in items for result in function(item)))
+
+    def _put(self, output, item):
+        # Waits for room in the queue, unless the pipeline is being stopped
+        while not self._stop.is_set():
+            try:
+                output.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, input_queue):
+        while True:
+            try:
+                item = input_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is END or isinstance(item, StageError):
+                if isinstance(item, StageError):
+                    self._pending_error = item
+                return
+            yield item
+
+    def _run_stage(self, name, transform, items, output):
+        try:
+            for item in transform(items):
+                self.counts[name] += 1
+                if not self._put(output, item):
+                    return
+            error = getattr(self, "_pending_error", None)
+            self._put(output, error if error is not None else END)
+        except Exception as e:
+            self._put(output, StageError(name, e))
+
+    def __iter__(self):
+        ctx = get_script_run_ctx()
+        self._stop.clear()
+        self._pending_error = None
+        items = iter(self.source)
+        threads = []
+        for name, transform in self.stages:
+            output = queue.Queue(maxsize=self.queue_size)
+            thread = threading.Thread(target=self._run_stage, args=(name, transform, items, output), daemon=True)
+            if ctx is not None:
+                add_script_run_ctx(thread, ctx)
+            threads.append(thread)
+            items = self._read(output)
+
+        for thread in threads:
+            thread.start()
+        try:
+            for item in items:
+                yield item
+            if self._pending_error is not None:
+                raise RuntimeError(f"Pipeline stage '{self._pending_error.stage}' failed: {self._pending_error.error}") from self._pending_error.error
+        finally:
+            # Stops the stages if the consumer stops early
+            self._stop.set()
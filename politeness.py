@@ -0,0 +1,222 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+import requests
+import config
+import metrics
+from http_client import parse_retry_after
+from canonical_urls import host_of_url
+
+_scheduler = None
+_lock = threading.Lock()
+
+# Statuses a host sends when we go too fast
+THROTTLE_STATUSES = {429, 503}
+
+# Weight of the newest latency in a host's moving average
+LATENCY_WEIGHT = 0.3
+
+
+class HostState:
+    __slots__ = ("limit", "delay", "min_delay", "next_time", "in_flight", "successes", "latency",
+                 "requests", "ok", "throttled", "errors", "waited")
+
+    def __init__(self, limit):
+        self.limit = limit  # Concurrent requests allowed
+        self.delay = 0.0  # Seconds between the starts of two requests
+        self.min_delay = 0.0  # The host's robots.txt Crawl-delay, below which the delay never goes
+        self.next_time = 0.0  # Monotonic time before which no request may start
+        self.in_flight = 0
+        self.successes = 0  # Successes since the limit last changed
+        self.latency = None  # Moving average, in seconds
+        self.requests = 0
+        self.ok = 0
+        self.throttled = 0
+        self.errors = 0
+        self.waited = 0.0
+
+
+class HostScheduler:
+    """
+    Adaptive per-host politeness for page fetches.
+
+    Every host starts at `initial_limit` concurrent requests. A host that answers quickly earns one
+    more slot after each `limit` successes in a row (up to `max_limit`); a 429/503 or a connection
+    error halves its slots, and a 429/503 also doubles the delay between its requests (from
+    `backoff` up to `max_delay` seconds) and pauses it for as long as its Retry-After asks (at most
+    `max_delay` seconds). A host whose average latency is over `slow_seconds` gets one request at a time,
+    and a host whose robots.txt sets a Crawl-delay never gets requests closer together (see set_crawl_delay).
+
+    map_concurrently(scheduler=...) takes a host's slot before it starts an item, so the items of
+    slow or throttling hosts wait in its queue without holding worker threads; request() is the
+    gate around the fetch itself, which also makes direct calls (e.g., get_title) polite.
+    """
+
+    def __init__(self, initial_limit=None, max_limit=None, backoff=None, max_delay=None, slow_seconds=None):
+        self.initial_limit = initial_limit or config.PER_HOST_LIMIT
+        self.max_limit = max(max_limit or config.POLITENESS_MAX_PER_HOST, self.initial_limit)
+        self.backoff = backoff or config.POLITENESS_BACKOFF_SECONDS
+        self.max_delay = max_delay or config.POLITENESS_MAX_DELAY
+        self.slow_seconds = slow_seconds or config.POLITENESS_SLOW_SECONDS
+        self._hosts = {}
+        self._condition = threading.Condition()
+        self._local = threading.local()  # The host whose slot the current thread's call already holds
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.initial_limit)
+        return state
+
+    def set_crawl_delay(self, host, seconds):
+        """Keeps the host's delay between requests at or above its robots.txt Crawl-delay (at most `max_delay`)."""
+        with self._condition:
+            state = self._state(host)
+            state.min_delay = min(float(seconds or 0), self.max_delay)
+            state.delay = max(state.delay, state.min_delay)
+
+    def ready_at(self, host):
+        """The monotonic time from which the host may get its next request (None while all its slots are taken)."""
+        with self._condition:
+            state = self._state(host)
+            return state.next_time if state.in_flight < state.limit else None
+
+    def acquire(self, host, blocking=True):
+        """Takes a request slot on the host, waiting for a free slot and the host's delay if `blocking`."""
+        start = time.monotonic()
+        with self._condition:
+            state = self._state(host)
+            while True:
+                now = time.monotonic()
+                if state.in_flight < state.limit and now >= state.next_time:
+                    state.in_flight += 1
+                    state.next_time = now + state.delay
+                    state.waited += now - start
+                    return True
+                if not blocking:
+                    return False
+                timeout = state.next_time - now if state.in_flight < state.limit else 1.0
+                self._condition.wait(timeout=max(timeout, 0.01))
+
+    def release(self, host, status=None, latency=None, retry_after=None, error=None):
+        """Gives a slot back and adapts the host's limit and delay to how the request went."""
+        with self._condition:
+            state = self._state(host)
+            state.in_flight = max(state.in_flight - 1, 0)
+            state.requests += 1
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES:
+                state.throttled += 1
+                state.successes = 0
+                state.limit = max(state.limit // 2, 1)
+                state.delay = min(max(state.delay * 2, self.backoff), self.max_delay)
+                pause = min(retry_after, self.max_delay) if retry_after is not None else state.delay
+                state.next_time = max(state.next_time, now + pause)
+                metrics.count("politeness.throttled")
+            elif error is not None:
+                state.errors += 1
+                state.successes = 0
+                state.limit = max(state.limit // 2, 1)
+            else:
+                state.ok += 1
+                if latency is not None:
+                    state.latency = latency if state.latency is None else (
+                        LATENCY_WEIGHT * latency + (1 - LATENCY_WEIGHT) * state.latency)
+                if state.latency is not None and state.latency > self.slow_seconds:
+                    state.limit = 1
+                    state.successes = 0
+                else:
+                    state.successes += 1
+                    if state.successes >= state.limit:
+                        state.successes = 0
+                        state.limit = min(state.limit + 1, self.max_limit)
+                        state.delay = max(state.delay / 2 if state.delay > 0.05 else 0.0, state.min_delay)
+            self._condition.notify_all()
+
+    def cancel(self, host):
+        """Gives back a slot that was not used for a request."""
+        with self._condition:
+            state = self._state(host)
+            state.in_flight = max(state.in_flight - 1, 0)
+            self._condition.notify_all()
+
+    def run_reserved(self, host, function, item):
+        """
+        Calls function(item) holding a slot on the host taken beforehand with acquire(host, blocking=False):
+        the call's request() uses it instead of waiting again, and it is given back if no request is made
+        (e.g., when the page comes from the result store).
+        """
+        self._local.reserved = host
+        try:
+            return function(item)
+        finally:
+            if self._local.reserved is not None:
+                self.cancel(host)
+            self._local.reserved = None
+
+    @contextmanager
+    def request(self, url):
+        """
+        Gate around one request to the URL's host. Call `record(response)` on the yielded object so
+        the status and Retry-After header are taken into account; request errors are recorded on their own.
+        """
+        host = host_of_url(url)
+        if getattr(self._local, "reserved", None) == host:
+            self._local.reserved = None
+        else:
+            self.acquire(host)
+        outcome = RequestOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except requests.exceptions.RequestException as e:
+            self.release(host, error=e)
+            raise
+        except BaseException:
+            self.release(host)
+            raise
+        self.release(host, status=outcome.status, latency=time.monotonic() - start, retry_after=outcome.retry_after)
+
+    def stats(self):
+        """Returns one dict per host, the most throttled and slowest first."""
+        with self._condition:
+            rows = [{
+                "Host": host,
+                "Requests": state.requests,
+                "OK": state.ok,
+                "Throttled": state.throttled,
+                "Errors": state.errors,
+                "Latency (s)": round(state.latency, 3) if state.latency is not None else None,
+                "Limit": state.limit,
+                "Delay (s)": round(state.delay, 3),
+                "Waited (s)": round(state.waited, 3),
+            } for host, state in self._hosts.items()]
+        return sorted(rows, key=lambda row: (-row["Throttled"], -(row["Latency (s)"] or 0)))
+
+
+class RequestOutcome:
+    __slots__ = ("status", "retry_after")
+
+    def __init__(self):
+        self.status = None
+        self.retry_after = None
+
+    def record(self, response):
+        self.status = response.status_code
+        self.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+
+# Function to get the process-wide scheduler of page fetches (None when disabled in config)
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None and config.POLITENESS:
+        with _lock:
+            if _scheduler is None:
+                _scheduler = HostScheduler()
+    return _scheduler
+
+
+# Function to wrap a page request in the scheduler's gate (or in nothing when the scheduler is disabled)
+def polite_request(url):
+    scheduler = get_scheduler()
+    return scheduler.request(url) if scheduler is not None else nullcontext(RequestOutcome())
@@ -0,0 +1,57 @@
+import random
+import threading
+import time
+import config
+import metrics
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket: allows `rate` calls per second on average, with bursts of up to `capacity`.
+
+    acquire() blocks until a token is available. `jitter` adds a random extra wait of up to that
+    fraction of the refill interval, so requests do not arrive at a perfectly regular pace.
+    """
+
+    def __init__(self, rate, capacity=1, jitter=0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.jitter = jitter
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Waits for a token and takes it. Returns the number of seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            wait += random.uniform(0, self.jitter / self.rate)
+            metrics.sleep(wait, "rate_limit")
+            waited += wait
+
+
+# Function to get the rate limiter shared by all requests to one search engine
+def get_rate_limiter(engine):
+    limiter = _limiters.get(engine)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(engine)
+            if limiter is None:
+                rate, capacity = config.ENGINE_RATE_LIMITS.get(engine, config.ENGINE_RATE_LIMITS["default"])
+                limiter = TokenBucket(rate, capacity, jitter=config.ENGINE_RATE_JITTER)
+                _limiters[engine] = limiter
+    return limiter
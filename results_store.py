@@ -0,0 +1,74 @@
+import json
+import sqlite3
+import threading
+import time
+import config
+from canonical_urls import canonical_url
+
+_store = None
+_lock = threading.Lock()
+
+
+class ResultStore:
+    """
+    A persistent store of URL classifications, shared across runs.
+
+    Keeps the title, description, languages, tier, details and keyword counts of every classified URL,
+    keyed by canonical URL (see canonical_urls.parse_url). Records older than `max_age` seconds are considered stale and ignored.
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, url TEXT, title TEXT, description TEXT, "
+                "languages TEXT, tier TEXT, details TEXT, good_count INTEGER, bad_count INTEGER, updated REAL)"
+            )
+
+    def _is_fresh(self, updated):
+        return self.max_age is None or time.time() - updated <= self.max_age
+
+    def get(self, url):
+        """Returns the fresh record for a URL as a dict, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, title, description, languages, tier, details, good_count, bad_count, updated "
+                "FROM results WHERE key = ?", (canonical_url(url),)
+            ).fetchone()
+        if not row or not self._is_fresh(row[8]):
+            return None
+        return {
+            "url": row[0],
+            "title": row[1],
+            "description": row[2],
+            "languages": json.loads(row[3]),
+            "tier": row[4],
+            "details": row[5],
+            "good_count": row[6],
+            "bad_count": row[7],
+            "updated": row[8]
+        }
+
+    def is_fresh(self, url):
+        return self.get(url) is not None
+
+    def put(self, url, title, description, languages, tier, details, good_count, bad_count):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (canonical_url(url), url, title, description, json.dumps(languages), tier, details,
+                 good_count, bad_count, time.time())
+            )
+
+
+# Function to get the process-wide result store (None when disabled in config)
+def get_result_store():
+    global _store
+    if _store is None and config.RESULT_STORE_PATH and config.RESULT_STORE_MODE:
+        with _lock:
+            if _store is None:
+                _store = ResultStore(config.RESULT_STORE_PATH, config.RESULT_STORE_MAX_AGE)
+    return _store
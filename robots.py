@@ -0,0 +1,93 @@
+import threading
+import time
+from urllib.robotparser import RobotFileParser
+import config
+import metrics
+from dns_cache import is_dead_url
+from http_client import get_client
+from canonical_urls import host_of_url, parse_url
+
+_robots = None
+_lock = threading.Lock()
+
+# Longest robots.txt we read, in bytes (Google reads 500 KiB)
+MAX_ROBOTS_BYTES = 500 * 1024
+
+
+class RobotsCache:
+    """
+    robots.txt rules fetched once per host (scheme + host + port) and kept for `ttl` seconds.
+
+    Concurrent checks of the same host wait for a single fetch. As with urllib.robotparser, a 401/403
+    disallows the whole host and any other missing or unreachable robots.txt allows it.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or config.ROBOTS_CACHE_SECONDS
+        self._parsers = {}  # "scheme://host" -> (expiry time, RobotFileParser)
+        self._pending = {}  # "scheme://host" -> Event set when its fetch in progress finishes
+        self._lock = threading.Lock()
+
+    def _fetch(self, site, user_agent):
+        parser = RobotFileParser(f"{site}/robots.txt")
+        metrics.count("robots.fetches")
+        try:
+            if is_dead_url(site):
+                raise OSError("Host does not exist")
+            with metrics.timer("robots"):
+                response = get_client().get(f"{site}/robots.txt", headers={"User-Agent": user_agent})
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.content[:MAX_ROBOTS_BYTES].decode("utf-8", errors="replace").splitlines())
+        except Exception:
+            parser.allow_all = True
+        return parser
+
+    def parser(self, url, user_agent):
+        """Returns the RobotFileParser of the URL's site, fetching its robots.txt if it is not cached."""
+        if "://" not in url:
+            url = "https://" + url
+        site = f"{parse_url(url).scheme}://{host_of_url(url)}"
+        while True:
+            with self._lock:
+                entry = self._parsers.get(site)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+                pending = self._pending.get(site)
+                if pending is None:
+                    pending = self._pending[site] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            parser = self._fetch(site, user_agent)
+            with self._lock:
+                self._parsers[site] = (time.monotonic() + self.ttl, parser)
+            return parser
+        finally:
+            with self._lock:
+                self._pending.pop(site, None)
+            pending.set()
+
+    def allowed(self, url, user_agent):
+        """Whether the URL's robots.txt lets `user_agent` fetch it."""
+        if "://" not in url:
+            url = "https://" + url
+        return self.parser(url, user_agent).can_fetch(user_agent, url)
+
+    def crawl_delay(self, url, user_agent):
+        """The Crawl-delay the URL's robots.txt asks of `user_agent`, in seconds (None if it sets none)."""
+        return self.parser(url, user_agent).crawl_delay(user_agent)
+
+
+# Function to get the process-wide robots.txt cache
+def get_robots_cache():
+    global _robots
+    if _robots is None:
+        with _lock:
+            if _robots is None:
+                _robots = RobotsCache()
+    return _robots
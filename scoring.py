@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pycld2 as cld2
+from keyword_matcher import compile_keywords, normalize_for_matching
+from translation import translate_many
+
+# Hebrew letters (the same range detect_language checks; a plain string so the Arrow regex engine accepts it)
+HEBREW_PATTERN = "[\u0590-\u05FF]"
+
+# Columns added by score_dataframe, in sheet order
+SCORE_COLUMNS = ["Tier", "Details", "Languages", "Good Keywords", "Bad Keywords"]
+
+
+# Helper function to detect the languages of one text with CLD2
+def cld2_languages(text):
+    try:
+        is_reliable, _, details = cld2.detect(text)
+    except Exception:
+        return []
+    if not is_reliable:
+        return []
+    return [detail[0].lower() for detail in details if detail[0] != "Unknown"]
+
+
+# Function to detect the languages of many titles and descriptions at once
+def detect_languages(titles, descriptions):
+    """
+    The batch version of searching.detect_language: returns a Series of language lists.
+
+    The Hebrew check is one vectorized regex over the column; CLD2 runs once per distinct non-empty
+    text, in a plain loop, since it has no batch interface.
+    """
+    combined = (titles.fillna("").astype(str).str.strip().str.lower() + " "
+                + descriptions.fillna("").astype(str).str.strip().str.lower()).str.strip()
+    hebrew = combined.str.contains(HEBREW_PATTERN, regex=True)
+
+    detected = {text: cld2_languages(text) for text in combined.unique() if text}
+    languages = []
+    for text, is_hebrew in zip(combined, hebrew):
+        found = (["hebrew"] if is_hebrew else []) + detected.get(text, [])
+        languages.append(list(dict.fromkeys(found)) or ["unknown"])
+    return pd.Series(languages, index=titles.index)
+
+
+# Helper function to parse the Languages column of a sheet ("hebrew, english")
+def parse_languages(values):
+    return values.fillna("").astype(str).map(
+        lambda text: [lang.strip().lower() for lang in text.split(",") if lang.strip()] or ["unknown"])
+
+
+# Helper function to count keywords in many (title, description) pairs, once per distinct pair
+def count_keywords_batch(titles, descriptions, good_keywords, bad_keywords):
+    matcher = compile_keywords(good_keywords, bad_keywords)
+    texts = (titles.fillna("").astype(str) + " " + descriptions.fillna("").astype(str))
+    counts = {text: matcher.count_text(normalize_for_matching(text)) for text in texts.unique()}
+    pairs = texts.map(counts)
+    return pairs.str[0].astype(int), pairs.str[1].astype(int)
+
+
+# Function to score a whole DataFrame of pages in one pass
+def score_dataframe(df, good_keywords, bad_keywords, url_column="URL", title_column="Title",
+                    description_column="Description", languages_column="Languages", translate=True):
+    """
+    Scores every row like calculate_score, with column operations instead of a call per row.
+
+    Languages are taken from `languages_column` when the frame has it (e.g., rows read back from a
+    sheet) and detected otherwise. Titles and descriptions of non-English rows are translated in one
+    translate_many batch (served from the translation cache when possible).
+
+    :return: A new DataFrame with the columns of SCORE_COLUMNS, indexed like `df`.
+    """
+    index = df.index
+    df = df.reset_index(drop=True)  # Positional index, so duplicate labels in `df` cannot misalign the columns
+    urls = df[url_column].fillna("").astype(str)
+    titles = df[title_column].fillna("").astype(str)
+    descriptions = df[description_column].fillna("").astype(str)
+    if languages_column in df.columns:
+        languages = parse_languages(df[languages_column])
+    else:
+        languages = detect_languages(titles, descriptions)
+
+    good_count, bad_count = count_keywords_batch(titles, descriptions, good_keywords, bad_keywords)
+
+    # Non-English rows are also counted in English
+    non_english = languages.map(lambda langs: any(lang != "english" for lang in langs))
+    if translate and non_english.any():
+        to_translate = non_english[non_english].index
+        texts = list(titles[to_translate]) + list(descriptions[to_translate])
+        translated = translate_many(texts)
+        translated_titles = pd.Series(translated[:len(to_translate)], index=to_translate)
+        translated_descriptions = pd.Series(translated[len(to_translate):], index=to_translate)
+        translated_good, translated_bad = count_keywords_batch(translated_titles, translated_descriptions, good_keywords, bad_keywords)
+        good_count = good_count.add(translated_good, fill_value=0).astype(int)
+        bad_count = bad_count.add(translated_bad, fill_value=0).astype(int)
+
+    # Tiers, in the order calculate_score checks them
+    israeli = urls.str.endswith(".il") | urls.str.endswith(".il/") | languages.map(lambda langs: "hebrew" in langs)
+    conditions = [bad_count > 1, israeli, good_count > 0]
+    tiers = np.select(conditions, ["C", "A", "B"], default="C")
+    details = np.select(conditions, ["Bad keywords", "Hebrew / .il", "Good keywords"], default="No good keywords")
+
+    return pd.DataFrame({
+        "Tier": tiers,
+        "Details": details,
+        "Languages": languages.map(", ".join),
+        "Good Keywords": good_count,
+        "Bad Keywords": bad_count,
+    }).set_index(index)
@@ -1,36 +1,48 @@
-from googletrans import Translator
-import asyncio
 import requests
 from bs4 import BeautifulSoup
 import pycld2 as cld2
 import re
-from collections import Counter
 from datetime import datetime
 import pytz
+import pandas as pd
 import streamlit as st
-from urllib.parse import urlparse, urlunparse
-import random
-import requests_cache
-import spacy
+from urllib.parse import urlparse
 from googlesearch import search
 from googleapiclient.discovery import build
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-import time
 import tempfile
-import string
-import unicodedata
-
-# Install cache for HTTP requests
-requests_cache.install_cache('http_cache', expire_after=300)
+import config
+import events
+import metrics
+from workers import map_concurrently, stream_concurrently
+from pipeline import Pipeline
+from http_client import get_client
+from head_parser import read_head
+from vocabulary import get_lexicon
+from segmentation import segment
+from translation import translate_many
+from keyword_matcher import compile_keywords
+from sheets import SheetSink, ensure_headers, update_cells, with_backoff
+from results_store import get_result_store
+from jobs import start_job, requeue_unflushed
+from blocklist import compile_block_list
+from scoring import score_dataframe
+from rate_limit import get_rate_limiter
+from politeness import THROTTLE_STATUSES, get_scheduler, polite_request
+from dns_cache import get_resolver, is_dead_url
+from robots import get_robots_cache
+from canonical_urls import UrlIndex, host_of_url, parse_url, unique_urls
 
 #headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.183 Safari/537.36"}
 headers = {"User-Agent": "AdsBot-Google (+http://www.google.com/adsbot.html)"}
 
+# Page fetch statuses that are tried again: throttling (which the scheduler paces) and temporary server errors
+RETRY_STATUSES = THROTTLE_STATUSES | config.HTTP_RETRY_STATUSES
+
 # Error handler function to streamline error handling
 def error_handler(function, item, error_message):
-    st.error(f"Error processing {function} for '{item}': {error_message}")
+    events.error(function, item, error_message)
     return "Error", "Error"
 
 def extract_domain_from_url(url):
@@ -45,6 +57,7 @@ def extract_domain_from_url(url):
         error_handler("extract domain", url, e)
         return url
 
+@metrics.timed("guess_words")
 def guess_words(concatenated_sentence):
     """
     Splits a concatenated sentence into all possible valid words using all available spaCy language models.
@@ -53,67 +66,24 @@ def guess_words(concatenated_sentence):
     :param concatenated_sentence: A string with no spaces (e.g., 'colegiohebreounion').
     :return: A list of unique valid words.
     """
-    def is_valid_word(nlp, word):
-        """Checks if a word is valid using spaCy's lexeme and word probabilities."""
-        try:
-            lexeme = nlp.vocab[word]
-            return lexeme.is_alpha and len(word) > 3 and (not lexeme.is_oov or lexeme.prob > -20)
-        except Exception as e:
-            error_handler("is valid word", word, e)
-            return False
-
-    def find_all_splits(sentence):
-        """Recursively finds all valid word splits for a given sentence."""
-        if not sentence:
-            return [[]]  # Return a list with an empty list when sentence is empty
-
-        all_splits = []
-        for i in range(1, len(sentence) + 1):
-            word_candidate = sentence[:i]
-            # Only consider splits where the word is longer than 3 letters
-            if len(word_candidate) > 3:
-                remaining_sentence = sentence[i:]
-                remaining_splits = find_all_splits(remaining_sentence)
-                for split in remaining_splits:
-                    all_splits.append([word_candidate] + split)
-        return all_splits
-
     try:
-        # Load all the language models
-        models = {
-            "English": spacy.load("en_core_web_md"),
-            "Spanish": spacy.load("es_core_news_md"),
-            "French": spacy.load("fr_core_news_md"),
-            "Portuguese": spacy.load("pt_core_news_md"),
-            "Italian": spacy.load("it_core_news_md")
-        }
+        # The combined lexicon of all the language models, compiled once per process
+        lexicon = get_lexicon()
         
-        # First, split the concatenated sentence once
-        splits = find_all_splits(concatenated_sentence)
-    
-        # Flatten the list of splits into a list of word candidates
-        word_candidates = [word for split in splits for word in split]
-    
-        # Set to collect all valid words
-        all_valid_words = set()
-    
-        # Check each word_candidate in all languages
-        for word_candidate in word_candidates:
-            for language, nlp in models.items():
-                if is_valid_word(nlp, word_candidate):
-                    all_valid_words.add(word_candidate)
-                    break  # If valid in any language, add and stop checking further languages
+        # Find every valid word in the sentence (in any language)
+        _, valid_words = segment(concatenated_sentence, lexicon)
+        all_valid_words = set(valid_words)
         
-        # Translate each word to English and check validity
-        for word in list(all_valid_words):
-            translated_word = translate_to_english(word).lower()
-            if is_valid_word(models["English"], translated_word):
+        # Translate the words to English (in one batch) and check validity
+        for translated_word in translate_many(sorted(valid_words), src='auto', dest='en'):
+            translated_word = translated_word.lower()
+            if lexicon.is_word_in(translated_word, "English"):
                 all_valid_words.add(translated_word)
     
         # Convert set to a list and return it
         return list(all_valid_words)
     except Exception as e:
-        error_handler("guess words", url, e)
+        error_handler("guess words", concatenated_sentence, e)
         return "Error"
 
 # Function to calculate score based on keyword matching
@@ -126,7 +96,7 @@ def count_j_in_domain(url):
     return domain.count('j')
 
 
-def duckduckgo_search(query, num_results=100, language="en"):
+def duckduckgo_search(query, num_results=100, language="en", on_page=None):
     """
     Scrape DuckDuckGo (HTML endpoint) for result links.
 
@@ -137,6 +107,7 @@ def duckduckgo_search(query, num_results=100, language="en"):
                         DuckDuckGo's region/language param is 'kl' (e.g., "us-en", "de-de").
                         This function maps "en" -> "us-en" by default and "xx" -> "xx-xx".
         headers (dict): Optional requests headers. If None, a reasonable default is used.
+        on_page (callable): Optional function called with the list of result URLs of each page, as soon as it is parsed.
 
     Returns:
         list[str]: List of result URLs.
@@ -164,21 +135,26 @@ def duckduckgo_search(query, num_results=100, language="en"):
         }
 
         try:
-            response = requests.get(BASE_URL, params=params, headers=DDG_HEADERS, timeout=30)
+            # Be polite: wait for the engine's rate limiter
+            get_rate_limiter("duckduckgo").acquire()
+            response = get_client("search").get(BASE_URL, params=params, headers=DDG_HEADERS)
             response.raise_for_status()
 
-            st.write(f"### DuckDuckGo HTML (offset {start})")
-            st.code(response.text[:2000], language="html")  # preview first ~2k chars for debugging
+            events.debug(f"DuckDuckGo HTML (offset {start})", response.text[:2000])  # preview first ~2k chars for debugging
 
             soup = BeautifulSoup(response.text, "html.parser")
 
             # Each result is typically in a div.result with an anchor 'a.result__a'
+            page_results = []
             for a in soup.select("div.result a.result__a"):
                 href = a.get("href")
                 if href:
-                    results.append(href)
-                    if len(results) >= num_results:
+                    page_results.append(href)
+                    if len(results) + len(page_results) >= num_results:
                         break
+            results.extend(page_results)
+            if on_page and page_results:
+                on_page(page_results)
 
             # If we didn't find any new results on this page, stop.
             # (Covers end-of-results or layout changes)
@@ -195,9 +171,6 @@ def duckduckgo_search(query, num_results=100, language="en"):
             # Move to the next page
             start += page_size_guess
 
-            # Be polite: random delay between requests
-            time.sleep(random.uniform(2, 6))
-
         except Exception as e:
             # Keep your existing error handler interface
             error_handler("duckduckgo search", query, e)
@@ -207,39 +180,43 @@ def duckduckgo_search(query, num_results=100, language="en"):
     results = results[:num_results]
 
     if results:
-        st.info(f"Fetched {len(results)} DuckDuckGo results for '{query}'")
+        events.info(f"Fetched {len(results)} DuckDuckGo results for '{query}'")
         return results
     else:
-        st.error(f"No DuckDuckGo results found for the query '{query}'")
+        events.info(f"No DuckDuckGo results found for the query '{query}'")
         return []
 
 
 
-def google_search_homemade(query, num_results=100, language="en"):
+def google_search_homemade(query, num_results=100, language="en", on_page=None):
     results = []
     start = 0  # Google uses `start` parameter for pagination
 
     while len(results) < num_results:
         search_url = f"https://www.google.com/search?q={query}&hl={language}&lr=lang_{language}&num=10&start={start}"
         try:
-            # Make the HTTP request
-            response = requests.get(search_url, headers=headers)
+            # Make the HTTP request (pausing as needed by the engine's rate limiter)
+            get_rate_limiter("homemade").acquire()
+            response = get_client("search").get(search_url, headers=headers)
             response.raise_for_status()
             
-            st.write("### Raw HTML Response")
-            st.code(response.text[:2000], language="html")  # Limit to the first 2000 characters for readability
+            events.debug("Raw HTML Response", response.text[:2000])  # Limit to the first 2000 characters for readability
 
             # Parse the response with BeautifulSoup
             soup = BeautifulSoup(response.text, "html.parser")
             
             # Extract links from search results
             result_divs = soup.find_all("div", class_="tF2Cxc")
+            page_results = []
             for div in result_divs:
                 link_tag = div.find("a")
                 if link_tag and link_tag["href"]:
-                    results.append(link_tag["href"])
-                    if len(results) >= num_results:  # Stop if we've reached the desired number
+                    page_results.append(link_tag["href"])
+                    if len(results) + len(page_results) >= num_results:  # Stop if we've reached the desired number
                         break
+            results.extend(page_results)
+            if on_page and page_results:
+                on_page(page_results)
 
             # Update `start` for the next page
             start += 10  # Google paginates by increments of 10
@@ -248,21 +225,17 @@ def google_search_homemade(query, num_results=100, language="en"):
             if not result_divs:
                 break
 
-            # Pause before the next request
-            delay = random.uniform(2, 10) 
-            time.sleep(delay)
-
         except Exception as e:
             error_handler("google search", query, e)
             break  # Stop the loop if there's an error
 
     if results:
-        st.info(f"Fetched {len(results)} results for '{query}'")
+        events.info(f"Fetched {len(results)} results for '{query}'")
     else:
-        st.error(f"No results found for the query '{query}'")
+        events.info(f"No results found for the query '{query}'")
     return results
 
-def google_search_selenium(query, num_results=10, language="en"):
+def google_search_selenium(query, num_results=10, language="en", on_page=None):
     try:
         temp_dir = tempfile.mkdtemp()
 
@@ -276,9 +249,10 @@ def google_search_selenium(query, num_results=10, language="en"):
         driver = webdriver.Chrome(options=chrome_options)
         
         search_url = f"https://www.google.com/search?q={query}&hl={language}&num=10"
+        get_rate_limiter("selenium").acquire()
         driver.get(search_url)
     
-        time.sleep(2)  # Allow time for JavaScript to load
+        metrics.sleep(2, "selenium_render")  # Allow time for JavaScript to load
     
         # Get page source after JavaScript has rendered the results
         html = driver.page_source
@@ -297,17 +271,20 @@ def google_search_selenium(query, num_results=10, language="en"):
                     break
     
         driver.quit()  # Quit the browser session
-        
+
+        if on_page and results:
+            on_page(results)
         return results
     except Exception as e:
         error_handler("google search", query, e)
 
 
 
-def google_search(query, num_results=100, language="en"):
+def google_search(query, num_results=100, language="en", on_page=None):
     """
     Fetch up to `num_results` results (Google CSE exposes at most 100 organic results).
     Handles paging with start indices in [1..91] and fixes language parameters.
+    If given, `on_page` is called with the list of result URLs of each page as soon as it arrives.
     """
     api_key = st.secrets["cse_key"]
     cse_id = st.secrets["cse_id"]
@@ -342,18 +319,23 @@ def google_search(query, num_results=100, language="en"):
             if lr_param:
                 req["lr"] = lr_param
 
+            get_rate_limiter("api").acquire()
             results = service.cse().list(**req).execute()
 
             items = results.get("items", [])
             if not items:
                 break  # no more items available
 
+            page_results = []
             for item in items:
                 link = item.get("link")
                 if link:
-                    all_results.append(link)
-                    if len(all_results) >= target:
+                    page_results.append(link)
+                    if len(all_results) + len(page_results) >= target:
                         break
+            all_results.extend(page_results)
+            if on_page and page_results:
+                on_page(page_results)
 
             # Advance to the next page. With num<=10, the next valid start is +10.
             start_index += 10
@@ -367,55 +349,113 @@ def google_search(query, num_results=100, language="en"):
             except ValueError:
                 pass  # if Google doesn’t return a parseable number, just keep paging
 
-        st.info(f"Fetched {len(all_results)} results for '{query}'")
+        events.info(f"Fetched {len(all_results)} results for '{query}'")
         return all_results
 
     except Exception as e:
-        st.error(f"An error occurred during the search: {e}")
+        error_handler("google search", query, e)
         return []
 
 
-# Function to fetch title from a URL
-def get_title(url):
-    title = ""
+# Function to fetch a page once and extract all the metadata we use from it
+@metrics.timed("fetch")
+def fetch_page_metadata(url):
+    """
+    Fetch a URL with a single request and extract its metadata from the page's <head>.
+
+    :param url: The URL to fetch (the scheme is added if missing).
+    :return: A dict with 'title', 'description' (meta description, falling back to og:description),
+             'og_description', 'lang' (the <html lang> attribute) and 'final_url' (after redirects).
+             On a request error or a non-2xx response 'title' and 'description' are set to "Error";
+             throttled (429/503) and other retryable responses (config.HTTP_RETRY_STATUSES) and connection
+             errors are first retried, up to config.HTTP_RETRIES times.
+    """
+    metadata = {"title": "", "description": "", "og_description": "", "lang": "", "final_url": url}
     try:
         # Add scheme if missing
         if not re.match(r'^https?://', url):
             url = 'https://' + url
-        response = requests.get(url, timeout=30, headers=headers)
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Try to get the title
-        title = soup.title.string if soup.title else ""
-        title = re.sub(r'[\r\n]+', ' ', title.strip()) if title else ""
-        if title is not str:
-            title = str(title)
-        return title
+        # Domains the DNS cache knows do not exist are not requested at all
+        if is_dead_url(url):
+            raise requests.exceptions.ConnectionError(f"Host does not exist: {parse_url(url).hostname}")
+        if config.RESPECT_ROBOTS_TXT:
+            robots = get_robots_cache()
+            if not robots.allowed(url, headers["User-Agent"]):
+                error_handler("fetch page metadata", url, "Disallowed by robots.txt")
+                metadata["title"] = "Error"
+                metadata["description"] = "Error"
+                return metadata
+            # The host's Crawl-delay paces its requests in the scheduler
+            crawl_delay = robots.crawl_delay(url, headers["User-Agent"])
+            if crawl_delay and get_scheduler() is not None:
+                get_scheduler().set_crawl_delay(host_of_url(url), crawl_delay)
+        # Stream the response and parse only its <head> (non-HTML content is never downloaded), when
+        # the host's turn comes (see politeness.py); the response status adapts the host's pace. The
+        # pages client does not retry on its own, so every attempt goes through the scheduler
+        for attempt in range(config.HTTP_RETRIES + 1):
+            try:
+                with polite_request(url) as outcome:
+                    response = get_client().get(url, headers=headers, stream=True)
+                    outcome.record(response)
+                    succeeded = 200 <= response.status_code < 300
+                    if succeeded:
+                        metadata["final_url"] = response.url or url
+                        head, bytes_read = read_head(response)
+                    else:
+                        response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                # A host that does not exist will not exist on the next attempt either
+                if attempt == config.HTTP_RETRIES or is_dead_url(url):
+                    raise
+                metrics.count("http.retries")
+                metrics.sleep(config.HTTP_RETRY_BACKOFF * 2 ** attempt, "http_retry")
+                continue
+            if succeeded:
+                break
+            # Error pages are never parsed (nor scored and stored); throttled requests are tried again
+            if response.status_code not in RETRY_STATUSES or attempt == config.HTTP_RETRIES:
+                raise requests.exceptions.HTTPError(f"{response.status_code} Error for url: {url}", response=response)
+            metrics.count("http.retries")
+            # The scheduler holds the next request until the host's Retry-After has passed; without it, wait here
+            if get_scheduler() is None or response.status_code not in THROTTLE_STATUSES:
+                wait = outcome.retry_after if outcome.retry_after is not None else config.HTTP_RETRY_BACKOFF * 2 ** attempt
+                metrics.sleep(min(wait, config.POLITENESS_MAX_DELAY), "http_retry")
+        metrics.count("http.body_bytes", bytes_read)
+        if head is None:
+            return metadata
+
+        # Title
+        metadata["title"] = clean_metadata_text(head.title)
+
+        # Description, falling back to og:description
+        metadata["og_description"] = clean_metadata_text(head.og_description)
+        metadata["description"] = clean_metadata_text(head.description) or metadata["og_description"]
+
+        # Declared page language
+        metadata["lang"] = clean_metadata_text(head.lang).lower()
+        return metadata
     except requests.exceptions.RequestException as e:
-        error_handler("get title", url, e)
-        return "Error"
+        error_handler("fetch page metadata", url, e)
+        metadata["title"] = "Error"
+        metadata["description"] = "Error"
+        return metadata
+
+
+# Helper function to flatten a metadata value into a single-line string
+def clean_metadata_text(value):
+    if not value:
+        return ""
+    return re.sub(r'[\r\n]+', ' ', str(value).strip())
+
+
+# Function to fetch title from a URL
+def get_title(url):
+    return fetch_page_metadata(url)["title"]
 
 
 # Function to fetch description from a URL
 def get_description(url):
-    description = ""
-    try:
-        # Add scheme if missing
-        if not re.match(r'^https?://', url):
-            url = 'https://' + url
-        response = requests.get(url, timeout=30, headers=headers)
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Try to get the description
-        description_tag = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', attrs={'property': 'og:description'})
-        description = description_tag['content'] if description_tag else ""
-        description = re.sub(r'[\r\n]+', ' ', description.strip()) if description else ""
-        if description is not str:
-            description = str(description)
-        return description
-    except requests.exceptions.RequestException as e:
-        error_handler("get description", url, e)
-        return "Error"
+    return fetch_page_metadata(url)["description"]
 
 # Helper function to combine title and description text
 def combine_text(title, description):
@@ -434,6 +474,7 @@ def combine_text(title, description):
 
 
 # Function to detect language using CLD2
+@metrics.timed("detect_language")
 def detect_language(title, description):
     combined_text = combine_text(title, description)
     try:
@@ -453,49 +494,18 @@ def detect_language(title, description):
         error_handler("detecting language", title, e)
         return ["unknown"]
 
-def translate_to_english(input):
-    if not input.strip():
-        return ""
-    if not isinstance(input, str):
-        input = str(input)
-    translator = Translator()
-    try:
-        translation = translator.translate(input, src='auto', dest='en')
-        return translation.text
-    except Exception as e:
-        error_handler("translating", input, e)
-        return input
-
-
 def count_keywords(title, description, good_keywords, bad_keywords):
-    """Count occurrences of good and bad keywords in the title and description."""
+    """Count occurrences of good and bad keywords (single words or phrases) in the title and description."""
     try:
-        combined_text = combine_text(title, description)
-        # Normalize dashes and hyphens to spaces
-        for dash in ["-", "–", "—", "−"]:
-            combined_text = combined_text.replace(dash, " ")
-        # Unicode normalization to strip accents/special chars
-        combined_text = unicodedata.normalize("NFKD", combined_text).encode("ascii", "ignore").decode()
-        # Convert to lowercase for case-insensitive matching
-        combined_text = combined_text.lower()
-        # Remove punctuation
-        combined_text = combined_text.translate(str.maketrans("", "", string.punctuation))
-        # Normalize whitespace
-        combined_text = re.sub(r'\s+', ' ', combined_text).strip()
-        # Prepare keyword lists (also lowercased)
-        good_keywords = [word.lower() for word in good_keywords]
-        bad_keywords = [word.lower() for word in bad_keywords]
-        # Count keywords
-        word_counts = Counter(combined_text.split())
-        good_count = sum(word_counts[word] for word in good_keywords if word in word_counts)
-        bad_count = sum(word_counts[word] for word in bad_keywords if word in word_counts)
-        return good_count, bad_count
+        # The compiled matcher is built once per distinct keyword lists and reused for every URL
+        return compile_keywords(good_keywords, bad_keywords).count(title, description)
     except Exception as e:
         error_handler("counting keywords", title, e)
         return 0, 0
 
     
 # Function to calculate score
+@metrics.timed("score")
 def calculate_score(url, title, description, languages, good_keywords, bad_keywords):
     try:
         # Count keywords in the original text
@@ -503,8 +513,7 @@ def calculate_score(url, title, description, languages, good_keywords, bad_keywo
 
         # Translate if any language is not English
         if languages and any(lang.lower() != 'english' for lang in languages):
-            trans_title = translate_to_english(title)
-            trans_description = translate_to_english(description)
+            trans_title, trans_description = translate_many([title, description], src='auto', dest='en')
             # Count keywords in the translated text
             translated_good_count, translated_bad_count = count_keywords(trans_title, trans_description, good_keywords, bad_keywords)
         else:
@@ -527,97 +536,58 @@ def calculate_score(url, title, description, languages, good_keywords, bad_keywo
         return "C", "No good keywords", total_good_count, total_bad_count
 
     except Exception as e:
-        st.error(f"Error processing calculate score for {url}: {e}")
+        error_handler("calculate score", url, e)
         return "C", "Error", 0, 0
 
 
 
-# Function to filter out ignored URLs
-def filter_ignored_urls(block_list, classified_urls):
-    ignored_set = set(block_list)  # Convert to set for faster lookups
-    filtered_urls = [(url, source) for url, source in classified_urls if url not in ignored_set]
-    return filtered_urls
-    
-
-# Function to search and filter URLs based on query
-def search_and_filter_urls(query, block_list, num_results=100, language="en", homepage_only=False, engine="API"):
+# Function to run a search on the selected engine
+def run_search_engine(query, num_results=100, language="en", engine="API", on_page=None):
+    """Returns the raw result URLs of a search, calling `on_page` with each page of results as it arrives."""
     search_results = []
     try:
-        if engine == "api":
-            search_results = google_search(query, num_results, language) or []
-        elif engine == "homemade":
-            search_results = google_search_homemade(query, num_results, language) or []
-        elif engine == "library":
-            search_results = google_search_library(query, num_results, language) or []
-        elif engine == "selenium":
-            search_results = google_search_selenium(query, num_results, language) or []
-        elif engine == "duckduckgo":
-            search_results = duckduckgo_search(query, num_results, language) or []
-        else:
-            st.error(f"Unknown engine '{engine}'. Falling back to API.")
-            search_results = google_search(query, num_results, language) or []  
+        with metrics.timer(f"search.{engine}"):
+            if engine == "api":
+                search_results = google_search(query, num_results, language, on_page=on_page) or []
+            elif engine == "homemade":
+                search_results = google_search_homemade(query, num_results, language, on_page=on_page) or []
+            elif engine == "library":
+                search_results = google_search_library(query, num_results, language) or []
+                if on_page and search_results:
+                    on_page(search_results)
+            elif engine == "selenium":
+                search_results = google_search_selenium(query, num_results, language, on_page=on_page) or []
+            elif engine == "duckduckgo":
+                search_results = duckduckgo_search(query, num_results, language, on_page=on_page) or []
+            else:
+                events.info(f"Unknown engine '{engine}'. Falling back to API.")
+                search_results = google_search(query, num_results, language, on_page=on_page) or []  
     except Exception as e:
-        st.error(f"Search engine '{engine}' failed: {e}")
+        error_handler(f"search engine '{engine}'", query, e)
         search_results = []
-    st.write(f"Engine resolved to: '{engine}'")   
-    classified_urls = []
-    
-    for result in search_results:
-        parsed_url = urlparse(result)
-        if homepage_only:
-            if parsed_url.path not in ("", "/") or parsed_url.query or parsed_url.fragment:
-                continue
-            source = f"search for '{query}' (d)"
-        else:
-            # Strip URL to domain or subdomain
-            stripped_url = urlunparse((parsed_url.scheme, parsed_url.netloc, "", "", "", ""))
-            source = f"search for '{query}' (d)" if parsed_url.path in ("", "/") and not parsed_url.query and not parsed_url.fragment else f"search for '{query}' (p)"
-            result = stripped_url  # Replace result with stripped URL
-        classified_urls.append((result, source))
-
-    # Deduplicate, excluding www if root domain is present
-    seen_domains = set()
-    deduplicated_urls = []
-
-    for url, source in classified_urls:
-        parsed_url = urlparse(url)
-        netloc = parsed_url.netloc
-
-        # Check if it's a www domain
-        if netloc.startswith("www."):
-            root_domain = netloc[4:]  # Strip 'www.'
-        else:
-            root_domain = netloc
-
-        # Skip www.x.com if x.com is already seen
-        if netloc.startswith("www.") and root_domain in seen_domains:
-            continue
-
-        # Add both the full domain and root domain to the seen set
-        seen_domains.add(root_domain)
-        deduplicated_urls.append((url, source))
-
-    # Filter out ignored URLs if provided
-    deduplicated_urls = filter_ignored_urls(block_list, deduplicated_urls)
-    
-    return deduplicated_urls
-
+    metrics.count("search.results", len(search_results))
+    events.debug(f"Engine resolved to: '{engine}'")
+    return search_results
 
 
-# Function to update Google Sheets after processing each keyword
-def update_google_sheets(rows_to_sure, rows_to_not_sure, sure_sheet, not_sure_sheet):
-    if rows_to_sure:
-        sure_sheet.append_rows(rows_to_sure, value_input_option='RAW')
-    if rows_to_not_sure:
-        not_sure_sheet.append_rows(rows_to_not_sure, value_input_option='RAW')
+# Function to turn a search result into a (url, source) pair
+def classify_search_result(result, query, homepage_only=False):
+    """Returns (url, source), or None if the result is dropped (not a homepage when homepage_only is set)."""
+    parsed_url = parse_url(result)
+    is_homepage = parsed_url.path in ("", "/") and not parsed_url.query and not parsed_url.fragment
+    if homepage_only:
+        if not is_homepage:
+            return None
+        return result, f"search for '{query}' (d)"
+    # Strip URL to domain or subdomain
+    return f"{parsed_url.scheme}://{parsed_url.netloc}", f"search for '{query}' ({'d' if is_homepage else 'p'})"
 
 
 # Function to add headers to sheets
 def check_and_add_headers(sheet):
     headers = ["URL", "Title", "Description", "Tier", "Details", "Source","Languages", "Good Keywords", "Bad Keywords" , "Timestamp"]
-    # Check if the sheet has any data (excluding the header row)
-    if len(sheet.get_all_values()) <= 1:  # Only the header exists
-        sheet.insert_row(headers, 1)
+    # Check only the first row for an existing header
+    ensure_headers(sheet, headers)
 
 # Fetch sheets and extract keywords
 def fetch_and_get_keywords(client, sheet_id):
@@ -634,116 +604,364 @@ def fetch_and_get_keywords(client, sheet_id):
     except Exception as e:
         error_handler("fetch and get keywords", sheet_id, e)
 
-# Process a single URL and evaluate it
-def process_single_url(url, source, good_keywords, bad_keywords):
-    """Process a single URL and return a row of data and its score."""
-    timestamp = datetime.now(pytz.timezone('Asia/Jerusalem')).strftime("%Y-%m-%d %H:%M:%S")
+# Helper function to start the record of a URL going through the classification stages
+def new_url_item(url, source):
+    return {
+        "url": url,
+        "source": source,
+        "timestamp": datetime.now(pytz.timezone('Asia/Jerusalem')).strftime("%Y-%m-%d %H:%M:%S"),
+        "title": "",
+        "record": None,
+        "error": None
+    }
+
+
+# Stage: fetch the page metadata (or take it from the result store)
+def fetch_stage(item):
+    if item["error"] is not None:
+        return item
     try:
-        title = get_title(url)
-        description = get_description(url)
-        languages = detect_language(title, description)
+        store = get_result_store()
+        item["record"] = store.get(item["url"]) if store else None
+        if store:
+            metrics.count("result_store.hits" if item["record"] else "result_store.misses")
+        if item["record"]:
+            item["title"] = item["record"]["title"]
+            item["description"] = item["record"]["description"]
+        else:
+            metadata = fetch_page_metadata(item["url"])
+            item["title"] = metadata["title"]
+            item["description"] = metadata["description"]
+    except Exception as e:
+        item["error"] = e
+    return item
+
+
+# Stage: detect the languages of the title and description
+def language_stage(item):
+    if item["error"] is None:
+        try:
+            item["languages"] = item["record"]["languages"] if item["record"] else detect_language(item["title"], item["description"])
+        except Exception as e:
+            item["error"] = e
+    return item
+
+
+# Stage: score the URL and build its sheet row
+def score_stage(item, good_keywords, bad_keywords):
+    """Returns (row_data, score)."""
+    url, source, timestamp, title = item["url"], item["source"], item["timestamp"], item["title"]
+    try:
+        if item["error"] is not None:
+            raise item["error"]
+        description, languages, record = item["description"], item["languages"], item["record"]
         lang_text = ", ".join(languages) if languages else "unknown"
         score, details, good_count, bad_count = calculate_score(url, title, description, languages, good_keywords, bad_keywords)
+        store = get_result_store()
+        if store and not record and "Error" not in (title, description):
+            store.put(url, title, description, languages, score, details, good_count, bad_count)
         row_data = [url, title, description, score, details, source, lang_text, good_count, bad_count, timestamp]
     except Exception as e:
-        st.error(f"Error processing URL '{url}': {e}")
+        error_handler("URL", url, e)
         score = "C"
         row_data = [url, title if title else "Error", "Error", score, "Error", source if source else "Error", "Error", "Error", "Error", timestamp if timestamp else "Error"]    
     return row_data, score
 
 
+# Stage: start the URL's record and resolve its host ahead of its fetch (the answer is cached); URLs on
+# domains that do not exist get their error here and are never fetched
+def resolve_stage(url_source):
+    item = new_url_item(*url_source)
+    resolver = get_resolver()
+    if resolver is not None:
+        host = parse_url(item["url"]).hostname
+        if not resolver.is_resolvable(host):
+            metrics.count("dns.skipped_fetches")
+            item["error"] = requests.exceptions.ConnectionError(f"Host does not exist: {host}")
+    return item
+
+
+# Helper function to get the host an item is fetched from (None for items that are not fetched)
+def fetch_host_of(item):
+    return host_of_url(item["url"]) if item["error"] is None else None
+
+
+# Stage: label the URL with all the sources it was found from by the time it is scored
+def merge_sources(item, url_index):
+    item["source"] = "; ".join(url_index.sources(item["url"])) or item["source"]
+    return item
+
+
+# Function to add the fetch -> detect language -> score stages to a pipeline of (url, source) pairs
+def add_classification_stages(pipeline, good_keywords, bad_keywords, max_workers=None, per_host=None, url_index=None):
+    """With a `url_index` (see add_search_stages), each row's source lists every source its URL was found from."""
+    workers = max_workers or config.MAX_WORKERS
+
+    # Optionally skip URLs that were already classified recently
+    store = get_result_store()
+    if store and config.RESULT_STORE_MODE == "skip":
+        pipeline.filter("skip known", lambda url_source: not store.is_fresh(url_source[0]))
+
+    # Resolve the hosts many at a time ahead of the fetches, so URLs on dead domains go straight to their
+    # Error row without a fetch slot or timeout
+    (pipeline
+     .map("resolve", resolve_stage, workers=config.DNS_PREFLIGHT_WORKERS if get_resolver() is not None else 1)
+     .map("fetch", fetch_stage, workers=workers, per_host=per_host or config.PER_HOST_LIMIT, host_of=fetch_host_of,
+          scheduler=get_scheduler())
+     .map("detect language", language_stage))
+    if url_index is not None:
+        pipeline.map("merge sources", lambda item: merge_sources(item, url_index))
+    return pipeline.map("score", lambda item: score_stage(item, good_keywords, bad_keywords), workers=workers)
+
+
+# Classify many URLs concurrently
+def classify_urls(url_sources, good_keywords, bad_keywords, max_workers=None, per_host=None, block_list=None):
+    """
+    Process (url, source) pairs through the fetch, language and score stages and yield (row_data, score)
+    in order of completion.
+
+    :param url_sources: An iterable of (url, source) tuples.
+    :param max_workers: Number of URLs processed at the same time (defaults to config.MAX_WORKERS).
+    :param per_host: Max concurrent fetches to a single host (defaults to config.PER_HOST_LIMIT).
+    :param block_list: Block sheet entries; blocked URLs are dropped before they are fetched (and get no row).
+    """
+    pipeline = Pipeline(url_sources)
+    if block_list:
+        blocked = compile_block_list(block_list)
+        pipeline.filter("block list", lambda url_source: not is_blocked_url(blocked, url_source[0]))
+    return iter(add_classification_stages(pipeline, good_keywords, bad_keywords, max_workers, per_host))
+
+
+# Helper function to check a URL against a compiled block list, reporting the blocked ones as done
+def is_blocked_url(blocked, url):
+    if blocked.is_blocked(url):
+        events.count("blocked")
+        events.advance(item=url)
+        return True
+    return False
+
+
+# Function to build the search stages of the keyword pipeline
+def add_search_stages(pipeline, block_list, lang="en", limit=100, homepage=False, search_workers=None, job=None, skip_urls=(), url_index=None):
+    """
+    Adds the stages turning (keyword, query, engine) searches into (url, source) pairs:
+    search (pages stream out while several searches run), normalize/dedupe, and block-list filter
+    (see blocklist.py). Dedupe is by canonical URL (see canonical_urls.py) in `url_index`, which also
+    collects every source of each URL; URLs in `skip_urls` are dropped there, in any spelling.
+    With a `job`, the result pages of every search are saved, and searches an interrupted run already
+    made are replayed from the job instead of being sent again.
+    """
+    searched = job.searched_pages() if job else {}
+
+    def run_search(search, emit):
+        keyword, query, engine = search
+        key = f"{engine}|{query}"
+        if key in searched:
+            for page in searched[key]:
+                emit((query, page))
+            return
+        pages = []
+
+        def on_page(page):
+            pages.append(page)
+            emit((query, page))
+
+        run_search_engine(query, limit, lang, engine, on_page=on_page)
+        if job and pages:
+            job.mark_searched(key, pages)
+
+    url_index = url_index if url_index is not None else UrlIndex()
+    for url in skip_urls:
+        url_index.add(url)
+    blocked = compile_block_list(block_list)
+    return (pipeline
+            .stage("search", lambda searches: stream_concurrently(run_search, searches, max_workers=search_workers or config.SEARCH_WORKERS))
+            .flat_map("normalize", lambda query_page: filter(None, (classify_search_result(result, query_page[0], homepage) for result in query_page[1])))
+            .filter("dedupe", lambda url_source: url_index.add(*url_source))
+            .filter("block list", lambda url_source: not blocked.is_blocked(url_source[0])))
+
+
 # Process keywords to fetch and evaluate URLs
-def process_keywords(client, sheet_id, keywords, lang="en", inurl=False, limit=100, homepage=False, engine="API"):
-    """Process a list of keywords to fetch and evaluate URLs."""
+def process_keywords(client, sheet_id, keywords, lang="en", inurl=False, limit=100, homepage=False, engine="API", max_workers=None, skip_urls=()):
+    """
+    Process a list of keywords to fetch and evaluate URLs.
+
+    Runs as one streaming pipeline: search -> normalize/dedupe -> block list -> fetch -> detect language
+    -> score -> sheet, so rows reach the sheets while later keywords are still being searched.
+    Searches are paced by each engine's rate limiter (see rate_limit.py); `engine` may be a list of engines.
+    URLs in `skip_urls` (e.g., already written by an earlier run) are left out like block-listed ones.
+    An interrupted run of the same keywords and settings resumes from its job checkpoint (see jobs.py).
+    """
     keywords_sheet, sure_sheet, not_sure_sheet, good_keywords, bad_keywords, block_list = fetch_and_get_keywords(client, sheet_id)
 
     check_and_add_headers(sure_sheet)
     check_and_add_headers(not_sure_sheet)
-    for keyword in keywords:
-        st.info(f"Processing '{keyword}'...")
-        rows_to_sure, rows_to_not_sure = [], []
-        delay = random.uniform(10, 60)
-        time.sleep(delay)
-        
+    engines = engine if isinstance(engine, (list, tuple)) else [engine]
+    searches = [
+        (keyword, query, search_engine)
+        for keyword in keywords
+        for query in ([keyword, f"inurl:{keyword}"] if inurl else [keyword])
+        for search_engine in engines
+    ]
+    with events.reporting(f"Searching {len(keywords)} keywords") as reporter, metrics.collecting("keywords"):
         try:
-            homepage_urls = search_and_filter_urls(keyword, block_list, num_results=limit, language=lang, homepage_only=homepage, engine=engine)
-            inurl_urls = []
-            if inurl:
-                inurl_urls = search_and_filter_urls(f"inurl:{keyword}", block_list, num_results=limit, language=lang, homepage_only=homepage, engine=engine)
-
-            all_urls = list({url: source for url, source in homepage_urls + inurl_urls}.items())
-            for url, source in all_urls:
-                row_data, score = process_single_url(url, source, good_keywords, bad_keywords)
-                if score in ["A", "B"]:
-                    rows_to_sure.append(row_data)
-                else:
-                    rows_to_not_sure.append(row_data)
-                                    
-                # Update Google Sheets when there are 20 rows in either list
-                if len(rows_to_not_sure) >= 10 or len(rows_to_sure) >= 10:
-                    update_google_sheets(rows_to_sure, rows_to_not_sure, sure_sheet, not_sure_sheet)
-                    st.info("Updated google sheets")
-                    rows_to_sure, rows_to_not_sure = [], []  # Clear the list after updating
-
-            # Final update for any remaining rows
-            if rows_to_sure or rows_to_not_sure:
-                update_google_sheets(rows_to_sure, rows_to_not_sure, sure_sheet, not_sure_sheet)
-            st.success(f"Finished processing '{keyword}'")
+            job = start_job("keywords", sheet_id, f"{lang}|{limit}|{homepage}", searches)
+            # Rows are buffered and flushed to Sure / Not Sure in the background
+            with SheetSink(on_flush=job.mark_flushed if job else None) as sink:
+                skip_urls = set(skip_urls)
+                if job and job.resumed:
+                    skip_urls |= requeue_unflushed(job, sink, {sheet.title: sheet for sheet in (sure_sheet, not_sure_sheet)})
+                    events.info(f"Resuming job {job.job_id}")
+                # A URL found by several searches is fetched once, and its row lists all their sources
+                url_index = UrlIndex()
+                pipeline = add_search_stages(Pipeline(searches), block_list, lang=lang, limit=limit, homepage=homepage, job=job,
+                                             skip_urls=skip_urls, url_index=url_index)
+                pipeline = add_classification_stages(pipeline, good_keywords, bad_keywords, max_workers=max_workers, url_index=url_index)
+                for row_data, score in pipeline:
+                    write_row(sink, job, sure_sheet if score in ["A", "B"] else not_sure_sheet, row_data)
+                    # The number of URLs to classify grows as the searches return
+                    reporter.set_total(pipeline.counts["block list"])
+                    reporter.advance(item=row_data[0])
+            if job:
+                job.finish()
+            reporter.finish(f"Finished processing {len(keywords)} keywords ({pipeline.counts['score']} URLs)")
         except Exception as e:
-            st.error(f"Error processing '{keyword}': {e}")
+            reporter.finish(f"Error processing keywords: {e}", ok=False)
+
+# Helper function to queue a result row, checkpointing it in the job first
+def write_row(sink, job, worksheet, row_data):
+    if job:
+        job.mark_done(row_data[0], worksheet.title, row_data)
+    sink.add(worksheet, [row_data])
+
+# Function to start the checkpoint of a URL list run and re-queue what an interrupted run left unwritten
+def resume_url_job(kind, sheet_id, source_name, urls, sink, worksheets):
+    """Returns (job, keys of the URLs already processed). The job is None when checkpoints are disabled."""
+    job = start_job(kind, sheet_id, source_name, urls)
+    if not job:
+        return None, set()
+    sink.on_flush = job.mark_flushed
+    done = requeue_unflushed(job, sink, {sheet.title: sheet for sheet in worksheets}) if job.resumed else set()
+    if done:
+        events.info(f"Resuming job {job.job_id}: {len(done)} URLs were already processed")
+        events.advance(len(done))
+    return job, done
 
 # Process URLs and classify them
-def process_urls(client, sheet_id, urls, source_name):
-    """Process a list of URLs and classify them."""
-    try:
-        with st.status("Working..."):
+def process_urls(client, sheet_id, urls, source_name, max_workers=None):
+    """
+    Process a list of URLs and classify them (streaming: fetch -> detect language -> score -> sheet).
+
+    Progress is checkpointed (see jobs.py): submitting the same list again after an interruption
+    resumes the run without fetching the processed URLs again or appending their rows twice.
+    """
+    lines = [str(url).strip() for url in urls if str(url).strip()]
+    # Repeated lines (in any spelling of the URL, see canonical_urls.py) are fetched and written once
+    urls = unique_urls(lines)
+    with events.reporting(f"Filtering '{source_name}'", total=len(urls)) as reporter, metrics.collecting("filter"):
+        try:
+            if len(urls) < len(lines):
+                events.info(f"Skipping {len(lines) - len(urls)} duplicate URLs")
             keywords_sheet, sure_sheet, not_sure_sheet, good_keywords, bad_keywords, block_list = fetch_and_get_keywords(client, sheet_id)
             check_and_add_headers(sure_sheet)
             check_and_add_headers(not_sure_sheet)
-            rows_to_sure, rows_to_not_sure = [], []
-        
-            for url in urls:
-                st.write(f"Working on '{url}'")
-                row_data, score = process_single_url(url, source_name, good_keywords, bad_keywords)
-                if score in ["A", "B"]:
-                    rows_to_sure.append(row_data)
-                else:
-                    rows_to_not_sure.append(row_data)
-                    
-                # Update Google Sheets when there are 20 rows in either list
-                if len(rows_to_not_sure) >= 20 or len(rows_to_sure) >= 20:
-                    update_google_sheets(rows_to_sure, rows_to_not_sure, sure_sheet, not_sure_sheet)
-                    st.write("Updated google sheets")
-                    rows_to_sure, rows_to_not_sure = [], []  # Clear the list after updating
-
-            # Final update for any remaining rows
-            if rows_to_sure or rows_to_not_sure:
-                update_google_sheets(rows_to_sure, rows_to_not_sure, sure_sheet, not_sure_sheet)
-        st.success(f"Finished processing '{source_name}'")
-    except Exception as e:
-        st.error(f"Error processing '{source_name}': {e}")
+
+            # Rows are buffered and flushed to Sure / Not Sure in the background
+            with SheetSink() as sink:
+                job, done = resume_url_job("filter", sheet_id, source_name, urls, sink, [sure_sheet, not_sure_sheet])
+                url_sources = ((url, source_name) for url in urls if url not in done)
+                for row_data, score in classify_urls(url_sources, good_keywords, bad_keywords, max_workers=max_workers, block_list=block_list):
+                    write_row(sink, job, sure_sheet if score in ["A", "B"] else not_sure_sheet, row_data)
+                    reporter.advance(item=row_data[0])
+            if job:
+                job.finish()
+            reporter.finish(f"Finished processing '{source_name}'")
+        except Exception as e:
+            reporter.finish(f"Error processing '{source_name}': {e}", ok=False)
+
+# Function to split a URL's domain into words and build its sheet row
+def split_single_url(url, source_name, good_keywords):
+    timestamp = datetime.now(pytz.timezone('Asia/Jerusalem')).strftime("%Y-%m-%d %H:%M:%S")
+    words = guess_words(extract_domain_from_url(url))
+    matching_count, matching_keywords = calculate_url_score(words, good_keywords)
+    j_count = count_j_in_domain(url)
+    return [url, matching_count, ", ".join(matching_keywords), j_count, ", ".join(words), source_name, timestamp]
 
 # Process URLs and classify them
-def domain_split(client, sheet_id, urls, source_name):
+def domain_split(client, sheet_id, urls, source_name, max_workers=None):
     keywords_sheet = client.open_by_key(st.secrets["keywords_id"]).worksheet("Keywords")  
     good_keywords = [kw.lower() for kw in keywords_sheet.col_values(1)[1:]]  # Lowercase good keywords
     bad_keywords = [kw.lower() for kw in keywords_sheet.col_values(3)[1:]]  # Lowercase bad keywords
     headers = ["URL", "Matching Count", "Matching Words", "J Count", "Words", "Source", "Timestamp"]
     results_sheet = client.open_by_key(sheet_id).worksheet("Results")
-    if len(results_sheet.get_all_values()) <= 1:  # Only the header exists
-        results_sheet.insert_row(headers, 1)
-    try:
-        with st.status("Working..."):
-            rows = []
-            for url in urls:
-                st.write(f"Working on '{url}'")
-                timestamp = datetime.now(pytz.timezone('Asia/Jerusalem')).strftime("%Y-%m-%d %H:%M:%S")
-                words = guess_words(extract_domain_from_url(url))
-                matching_count, matching_keywords = calculate_url_score(words, good_keywords)
-                j_count = count_j_in_domain(url)
-                row_data = [url, matching_count, ", ".join(matching_keywords), j_count, ", ".join(words), source_name, timestamp]
-                rows.append(row_data)    
-            results_sheet.append_rows(rows, value_input_option='RAW')
-        st.success(f"Finished processing '{source_name}'")
-    except Exception as e:
-        st.error(f"Error processing '{source_name}': {e}")
+    ensure_headers(results_sheet, headers)
+    lines = list(urls)
+    urls = unique_urls(lines)
+    with events.reporting(f"Splitting '{source_name}'", total=len(urls)) as reporter, metrics.collecting("split"):
+        try:
+            if len(urls) < len(lines):
+                events.info(f"Skipping {len(lines) - len(urls)} duplicate URLs")
+            with SheetSink() as sink:
+                job, done = resume_url_job("split", sheet_id, source_name, urls, sink, [results_sheet])
+                # Domains are split in parallel (translation is network-bound); no per-host limit is needed
+                workers = max_workers or config.MAX_WORKERS
+                for url, row_data in map_concurrently(lambda url: split_single_url(url, source_name, good_keywords),
+                                                      (url for url in urls if str(url) not in done),
+                                                      max_workers=workers, per_host=workers, host_of=lambda url: None):
+                    write_row(sink, job, results_sheet, row_data)
+                    reporter.advance(item=url)
+            if job:
+                job.finish()
+            reporter.finish(f"Finished processing '{source_name}'")
+        except Exception as e:
+            reporter.finish(f"Error processing '{source_name}': {e}", ok=False)
+
+# Columns re-computed by the re-score mode
+RESCORED_COLUMNS = ["Tier", "Details", "Good Keywords", "Bad Keywords"]
+
+# Function to re-score the rows of a worksheet and list the cells that changed
+def rescore_worksheet(sheet, good_keywords, bad_keywords):
+    """
+    Reads all the rows of a Sure / Not Sure worksheet in one request and scores them again from their
+    stored Title, Description and Languages. Rows whose fetch failed (Details "Error") are left alone.
+
+    :return: A list of (worksheet, row, col, value) for the cells whose value changed.
+    """
+    values = with_backoff(sheet.get_all_values)
+    if len(values) < 2:
+        return []
+    header, rows = values[0], values[1:]
+    df = pd.DataFrame([row[:len(header)] + [""] * (len(header) - len(row)) for row in rows], columns=header)
+    scorable = df[df["Details"] != "Error"]
+    if scorable.empty:
+        return []
+    scored = score_dataframe(scorable, good_keywords, bad_keywords)
+
+    changes = []
+    for column in RESCORED_COLUMNS:
+        col = header.index(column) + 1
+        changed = scorable[column].astype(str) != scored[column].astype(str)
+        for index, value in scored.loc[changed, column].items():
+            changes.append((sheet, index + 2, col, value.item() if hasattr(value, "item") else value))
+    return changes
+
+# Re-score the Sure / Not Sure sheets after the keywords changed, without fetching any page
+def rescore_sheets(client, sheet_id):
+    """
+    Applies the current Keywords lists to the rows already in the Sure and Not Sure sheets. Titles,
+    descriptions and languages are read back from the sheets and translations come from the cache, so
+    no page is fetched. Only the Tier, Details and keyword count cells that changed are written back,
+    in one batch update; rows stay in the sheet they are in.
+    """
+    with events.reporting("Re-scoring") as reporter, metrics.collecting("rescore"):
+        try:
+            keywords_sheet, sure_sheet, not_sure_sheet, good_keywords, bad_keywords, block_list = fetch_and_get_keywords(client, sheet_id)
+            changes = []
+            for sheet in (sure_sheet, not_sure_sheet):
+                changes.extend(rescore_worksheet(sheet, good_keywords, bad_keywords))
+            if changes:
+                update_cells(changes)
+            changed_rows = len({(getattr(sheet, "title", ""), row) for sheet, row, _, _ in changes})
+            reporter.finish(f"Finished re-scoring: {changed_rows} rows changed ({len(changes)} cells)")
+        except Exception as e:
+            reporter.finish(f"Error re-scoring: {e}", ok=False)
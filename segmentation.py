@@ -0,0 +1,88 @@
+from vocabulary import MIN_WORD_LENGTH
+
+
+# Function to find every valid word inside a string
+def find_valid_words(text, lexicon, max_word_length=None):
+    """
+    Finds all substrings of `text` that are words of the lexicon.
+
+    Only substrings between MIN_WORD_LENGTH and `max_word_length` characters are looked up, so this
+    takes O(n * maxWordLen) lookups instead of enumerating every possible split of the string.
+
+    :param text: A string with no spaces (e.g., 'colegiohebreounion').
+    :param lexicon: Any container of words (e.g., vocabulary.Lexicon or a set).
+    :param max_word_length: Longest word to look for (defaults to the lexicon's longest word).
+    :return: A list of (start, end) spans, sorted by start then end.
+    """
+    if max_word_length is None:
+        max_word_length = getattr(lexicon, "max_word_length", len(text)) or len(text)
+    spans = []
+    for start in range(len(text)):
+        for end in range(start + MIN_WORD_LENGTH, min(len(text), start + max_word_length) + 1):
+            if text[start:end] in lexicon:
+                spans.append((start, end))
+    return spans
+
+
+# Function to split a string into its best word segmentations
+def segment(text, lexicon, top_n=5, max_word_length=None):
+    """
+    Splits a concatenated string into words with dynamic programming.
+
+    A segmentation covers the whole string with lexicon words and runs of unknown characters.
+    Segmentations are ranked by the number of unknown characters first and the number of words second,
+    so 'colegiohebreounion' prefers ['colegio', 'hebreo', 'union'] over splits with leftovers.
+    The `top_n` best segmentations are kept for every prefix, which keeps the work linear in the
+    number of valid word spans.
+
+    :param text: A string with no spaces.
+    :param lexicon: Any container of words (e.g., vocabulary.Lexicon or a set).
+    :param top_n: How many segmentations to return.
+    :param max_word_length: Longest word to look for (defaults to the lexicon's longest word).
+    :return: A tuple (segmentations, valid_words): a ranked list of segmentations (each a list of strings)
+             and the set of all valid words found anywhere in the string.
+    """
+    if not text:
+        return [], set()
+
+    spans = find_valid_words(text, lexicon, max_word_length)
+    valid_words = {text[start:end] for start, end in spans}
+    words_from = {}
+    for start, end in spans:
+        words_from.setdefault(start, []).append(end)
+
+    # best[i] holds up to top_n entries for text[:i]: ((unknown_chars, word_count), pieces)
+    # where pieces is a tuple of (piece, is_word) pairs
+    best = [[] for _ in range(len(text) + 1)]
+    best[0] = [((0, 0), ())]
+
+    def offer(position, cost, pieces):
+        # Candidates are the same segmentation when their strings match, even if one of them spells
+        # a lexicon word as an unknown run: keep only the cheaper one
+        candidates = best[position]
+        strings = [piece for piece, _ in pieces]
+        for index, (existing_cost, existing) in enumerate(candidates):
+            if [piece for piece, _ in existing] == strings:
+                if cost >= existing_cost:
+                    return
+                del candidates[index]
+                break
+        candidates.append((cost, pieces))
+        candidates.sort(key=lambda candidate: candidate[0])
+        del candidates[top_n:]
+
+    for position in range(len(text)):
+        for (unknown, word_count), pieces in best[position]:
+            # Extend with a known word
+            for end in words_from.get(position, ()):
+                offer(end, (unknown, word_count + 1), pieces + ((text[position:end], True),))
+            # Or treat the next character as unknown, merging it into a preceding unknown run
+            char = text[position]
+            if pieces and not pieces[-1][1]:
+                extended = pieces[:-1] + ((pieces[-1][0] + char, False),)
+            else:
+                extended = pieces + ((char, False),)
+            offer(position + 1, (unknown + 1, word_count), extended)
+
+    segmentations = [[piece for piece, _ in pieces] for _, pieces in best[len(text)]]
+    return segmentations, valid_words
@@ -0,0 +1,324 @@
+import csv
+import os
+import random
+import threading
+import time
+from gspread.exceptions import APIError
+from gspread.utils import a1_to_rowcol, absolute_range_name, rowcol_to_a1
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import config
+import events
+import metrics
+
+# HTTP statuses worth retrying: quota exceeded and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503}
+
+
+# Error handler function to streamline error handling
+def error_handler(function, item, error_message):
+    events.error(function, item, error_message)
+    return "Error", "Error"
+
+
+# Function to call the Sheets API, retrying with exponential backoff on quota and server errors
+def with_backoff(function, *args, retries=None, base_delay=1, **kwargs):
+    retries = config.SHEET_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            with metrics.timer("sheets"):
+                return function(*args, **kwargs)
+        except APIError as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status not in RETRY_STATUSES or attempt == retries:
+                raise
+            metrics.sleep(base_delay * 2 ** attempt + random.uniform(0, 1), "sheets_backoff")
+
+
+# Function to add a header row to a sheet if it has none
+def ensure_headers(sheet, headers):
+    """Reads only the first row of the sheet (not the whole sheet) to check for a header."""
+    if not any(with_backoff(sheet.row_values, 1)):
+        with_backoff(sheet.insert_row, headers, 1)
+
+
+# Helper function to convert a value to a Sheets API cell (stored as-is, like value_input_option='RAW')
+def to_cell(value):
+    if value is None:
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+# Helper function to get a stable key for a worksheet
+def worksheet_key(worksheet):
+    spreadsheet = getattr(worksheet, "spreadsheet", None)
+    if spreadsheet is not None and hasattr(worksheet, "id"):
+        return (spreadsheet.id, worksheet.id)
+    return id(worksheet)
+
+
+# Function to write many single-cell updates, with one request per spreadsheet
+def update_cells(updates):
+    """
+    :param updates: A list of (worksheet, row, col, value) tuples (1-based row and column).
+    Cells of worksheets of the same spreadsheet are written with a single values_batch_update; other
+    worksheets (e.g., LocalWorksheet) get one batch_update each.
+    """
+    by_spreadsheet, by_worksheet = {}, {}
+    for worksheet, row, col, value in updates:
+        spreadsheet = getattr(worksheet, "spreadsheet", None)
+        if spreadsheet is not None and hasattr(spreadsheet, "values_batch_update"):
+            by_spreadsheet.setdefault(spreadsheet.id, (spreadsheet, []))[1].append(
+                {"range": absolute_range_name(worksheet.title, rowcol_to_a1(row, col)), "values": [[value]]})
+        else:
+            by_worksheet.setdefault(worksheet_key(worksheet), (worksheet, []))[1].append(
+                {"range": rowcol_to_a1(row, col), "values": [[value]]})
+
+    for spreadsheet, data in by_spreadsheet.values():
+        with_backoff(spreadsheet.values_batch_update, {"valueInputOption": "RAW", "data": data})
+    for worksheet, data in by_worksheet.values():
+        with_backoff(worksheet.batch_update, data, value_input_option="RAW")
+
+
+# Function to append rows to several worksheets now
+def append_batches(batches, coalesce=True):
+    """
+    Appends every (worksheet, rows) batch, with a single batch_update of appendCells requests per
+    spreadsheet when `coalesce` is set (append_rows otherwise, or for fake worksheets without a
+    spreadsheet). Every write is retried with backoff on 429 quota errors.
+    """
+    by_spreadsheet = {}
+    for worksheet, rows in batches:
+        if not rows:
+            continue
+        spreadsheet = getattr(worksheet, "spreadsheet", None)
+        if coalesce and spreadsheet is not None and hasattr(spreadsheet, "batch_update"):
+            by_spreadsheet.setdefault(spreadsheet.id, (spreadsheet, []))[1].append((worksheet, rows))
+        else:
+            with_backoff(worksheet.append_rows, rows, value_input_option='RAW')
+
+    for spreadsheet, spreadsheet_batches in by_spreadsheet.values():
+        requests = [{
+            "appendCells": {
+                "sheetId": worksheet.id,
+                "rows": [{"values": [to_cell(value) for value in row]} for row in rows],
+                "fields": "userEnteredValue"
+            }
+        } for worksheet, rows in spreadsheet_batches]
+        with_backoff(spreadsheet.batch_update, {"requests": requests})
+
+
+class SheetSink:
+    """
+    Buffers rows per worksheet and appends them in bulk.
+
+    Rows are flushed from a background thread once a worksheet has `flush_rows` pending rows or the
+    oldest pending row is `flush_interval` seconds old. Pending rows for worksheets of the same
+    spreadsheet (e.g., Sure and Not Sure) are written with a single batch_update of appendCells
+    requests; anything else (including fake worksheets without a spreadsheet) falls back to
+    append_rows. Every write is retried with backoff on 429 quota errors.
+
+    `on_flush` is called with the list of (worksheet, rows) batches after each successful write
+    (e.g., to checkpoint a job, see jobs.py).
+
+    Use it as a context manager, or call close() to flush the remaining rows and stop the thread.
+    """
+
+    def __init__(self, flush_rows=None, flush_interval=None, coalesce=True, background=True, on_flush=None):
+        self.flush_rows = flush_rows or config.SHEET_FLUSH_ROWS
+        self.flush_interval = flush_interval or config.SHEET_FLUSH_SECONDS
+        self.coalesce = coalesce
+        self.on_flush = on_flush
+        self.rows_written = 0
+        self._pending = {}  # worksheet key -> (worksheet, rows)
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            ctx = get_script_run_ctx()
+            if ctx is not None:
+                add_script_run_ctx(self._thread, ctx)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, worksheet, rows):
+        """Queues rows to be appended to a worksheet."""
+        if not rows:
+            return
+        with self._lock:
+            key = worksheet_key(worksheet)
+            _, pending_rows = self._pending.setdefault(key, (worksheet, []))
+            pending_rows.extend(rows)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(pending_rows) >= self.flush_rows
+        if full:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def pending_count(self):
+        with self._lock:
+            return sum(len(rows) for _, rows in self._pending.values())
+
+    def flush(self):
+        """Writes all pending rows now."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._oldest = self._pending, {}, None
+            if not pending:
+                return
+            try:
+                self._write(list(pending.values()))
+                written = sum(len(rows) for _, rows in pending.values())
+                self.rows_written += written
+                metrics.count("sheets.rows_appended", written)
+            except Exception as e:
+                error_handler("writing to google sheets", ", ".join(getattr(ws, "title", "?") for ws, _ in pending.values()), e)
+                # Put the rows back in front of anything queued meanwhile, to retry on the next flush
+                with self._lock:
+                    for key, (worksheet, rows) in pending.items():
+                        _, newer_rows = self._pending.get(key, (worksheet, []))
+                        self._pending[key] = (worksheet, rows + newer_rows)
+                    self._oldest = self._oldest or time.monotonic()
+                raise
+            # Outside the try: rows that were written must never be re-queued
+            if self.on_flush is not None:
+                self.on_flush(list(pending.values()))
+
+    def _write(self, batches):
+        append_batches(batches, coalesce=self.coalesce)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(timeout=1)
+            self._wake.clear()
+            if self._closed:
+                break
+            with self._lock:
+                due = self._pending and (
+                    any(len(rows) >= self.flush_rows for _, rows in self._pending.values())
+                    or time.monotonic() - self._oldest >= self.flush_interval
+                )
+            if due:
+                try:
+                    self.flush()
+                except Exception:
+                    time.sleep(self.flush_interval)  # Already reported, wait before retrying
+
+    def close(self):
+        """Flushes the remaining rows and stops the background thread."""
+        self._closed = True
+        if self._thread is not None:
+            self._wake.set()
+            self._thread.join()
+        self.flush()
+
+
+class LocalWorksheet:
+    """
+    A worksheet stored as a local CSV file, with the parts of the gspread Worksheet interface we use
+    (row_values, col_values, insert_row, append_rows), so the pipelines can write to disk instead of Sheets.
+    """
+
+    def __init__(self, path, title=None):
+        self.path = path
+        self.title = title or os.path.splitext(os.path.basename(path))[0]
+        self._lock = threading.Lock()
+
+    def _read_rows(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline="", encoding="utf-8") as file:
+            return list(csv.reader(file))
+
+    def get_all_values(self):
+        return self._read_rows()
+
+    def row_values(self, row):
+        rows = self._read_rows()
+        return rows[row - 1] if len(rows) >= row else []
+
+    def col_values(self, col):
+        """Reads one column without keeping the whole file in memory."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, newline="", encoding="utf-8") as file:
+            return [row[col - 1] if len(row) >= col else "" for row in csv.reader(file)]
+
+    def insert_row(self, values, index=1, **kwargs):
+        with self._lock:
+            rows = self._read_rows()
+            rows.insert(index - 1, values)
+            with open(self.path, "w", newline="", encoding="utf-8") as file:
+                csv.writer(file).writerows(rows)
+
+    def append_rows(self, rows, **kwargs):
+        with self._lock:
+            with open(self.path, "a", newline="", encoding="utf-8") as file:
+                csv.writer(file).writerows(rows)
+
+    def batch_update(self, data, **kwargs):
+        """Writes single-cell ranges ({"range": "D5", "values": [[value]]}), like gspread's batch_update."""
+        with self._lock:
+            rows = self._read_rows()
+            for update in data:
+                row, col = a1_to_rowcol(update["range"])
+                while len(rows) < row:
+                    rows.append([])
+                rows[row - 1].extend([""] * (col - len(rows[row - 1])))
+                rows[row - 1][col - 1] = update["values"][0][0]
+            with open(self.path, "w", newline="", encoding="utf-8") as file:
+                csv.writer(file).writerows(rows)
+
+
+class LocalSpreadsheet:
+    """A directory of LocalWorksheet CSV files, one per worksheet title."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._worksheets = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def worksheet(self, title):
+        if title not in self._worksheets:
+            self._worksheets[title] = LocalWorksheet(os.path.join(self.directory, f"{title}.csv"), title)
+        return self._worksheets[title]
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+
+class LocalClient:
+    """
+    A gspread-like client that opens the spreadsheets in `local_keys` as LocalSpreadsheet directories
+    under `directory` and everything else (e.g., the keywords sheet) through the `remote` gspread client.
+    """
+
+    def __init__(self, remote, local_keys, directory):
+        self.remote = remote
+        self.local_keys = set(local_keys)
+        self.directory = directory
+        self._spreadsheets = {}
+
+    def open_by_key(self, key):
+        if key in self.local_keys:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = LocalSpreadsheet(self.directory)
+            return self._spreadsheets[key]
+        if self.remote is None:
+            raise ValueError(f"Spreadsheet '{key}' is not local and no Google credentials were given")
+        return self.remote.open_by_key(key)
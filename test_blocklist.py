@@ -0,0 +1,88 @@
+import re
+from urllib.parse import urlsplit
+import pytest
+from blocklist import BlockList, compile_block_list
+
+ENTRIES = [
+    "facebook.com",
+    "https://www.instagram.com",
+    "=example.org",
+    "*.blogspot.com",
+    "casino.*",
+    "ads.*.example.net",
+    "https://www.news.co.il/some/page/",
+    "Bücher.de",
+]
+
+URLS = [
+    "facebook.com", "https://facebook.com", "https://www.facebook.com/groups/x", "http://m.facebook.com",
+    "https://facebook.com.evil.net", "https://notfacebook.com",
+    "https://www.instagram.com", "https://instagram.com/p/1", "https://cdn.instagram.com",
+    "https://example.org", "https://www.example.org/about", "https://shop.example.org",
+    "https://blogspot.com", "https://someone.blogspot.com", "https://a.b.blogspot.com",
+    "https://casino.com", "https://casino.co.il", "https://www.casino.org/games", "https://casinos.com",
+    "https://ads.tracker.example.net", "https://ads.example.net", "https://ads.a.b.example.net",
+    "https://news.co.il/some/page", "https://www.news.co.il/some/page/?ref=1", "https://news.co.il/other",
+    "https://xn--bcher-kva.de", "https://shop.bücher.de", "https://unrelated.com", "",
+]
+
+
+# A slow reference that matches a URL against every entry with a regular expression
+def reference_is_blocked(entries, url):
+    if not url:
+        return False
+    parts = urlsplit(url if "://" in url else "https://" + url)
+    host = parts.hostname.encode("idna").decode("ascii") if not parts.hostname.isascii() else parts.hostname
+    host = re.sub(r'^(www|m)\.', "", host.lower())
+    for entry in entries:
+        host_only = entry.startswith("=")
+        entry_parts = urlsplit(entry.lstrip("=") if "://" in entry else "https://" + entry.lstrip("="))
+        entry_host = entry_parts.hostname
+        entry_host = entry_host.encode("idna").decode("ascii") if not entry_host.isascii() else entry_host
+        entry_host = re.sub(r'^www\.', "", entry_host.lower())
+        if entry_parts.path.strip("/"):
+            if host == entry_host and parts.path.rstrip("/") == entry_parts.path.rstrip("/"):
+                return True
+            continue
+        labels = entry_host.split(".")
+        prefix = r'(.+\.)?'
+        if labels[0] == "*":
+            labels, prefix = labels[1:], r'.+\.'
+        elif host_only:
+            prefix = ""
+        pattern = r'\.'.join(r'[^.]+' if label == "*" else re.escape(label) for label in labels[:-1])
+        last = r'[^.]+(\.[^.]+)*' if labels[-1] == "*" else re.escape(labels[-1])
+        pattern = f"{pattern}\\.{last}" if pattern else last
+        if re.fullmatch(prefix + pattern, host):
+            return True
+    return False
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_block_list_matches_the_reference(url):
+    assert BlockList(ENTRIES).is_blocked(url) == reference_is_blocked(ENTRIES, url)
+
+
+def test_every_url_the_exact_string_set_blocked_is_still_blocked():
+    # The block list used to be a set of the entries, matched against the URL string
+    entries = ["https://www.facebook.com", "https://example.org", "https://news.co.il/page", "twitter.com"]
+    blocked = compile_block_list(entries)
+    for url in entries:
+        assert url in set(entries) and blocked.is_blocked(url)
+    for url in ["https://unrelated.com", "https://news.co.il/other", "https://facebook.co"]:
+        assert url not in set(entries) and not blocked.is_blocked(url)
+
+
+def test_trailing_slash_and_www_spellings_are_the_same_entry():
+    blocked = BlockList(["https://www.site.com/page/", "www.other.com/"])
+    assert blocked.is_blocked("https://site.com/page")
+    assert blocked.is_blocked("http://www.site.com/page/")
+    assert not blocked.is_blocked("https://site.com/page/2")
+    assert blocked.is_blocked("https://other.com")
+    assert blocked.is_blocked("https://sub.other.com/x")
+
+
+def test_compiled_lists_are_shared_and_keep_their_entries():
+    assert compile_block_list(ENTRIES) is compile_block_list(list(ENTRIES))
+    assert len(compile_block_list(ENTRIES)) == len(ENTRIES)
+    assert "https://www.facebook.com/x" in compile_block_list(ENTRIES)
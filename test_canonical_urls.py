@@ -0,0 +1,104 @@
+import re
+from itertools import permutations
+from urllib.parse import urlparse
+import pytest
+from canonical_urls import UrlIndex, canonical_url, host_of_url, parse_url, unique_urls
+
+SPELLINGS = [
+    "https://example.com", "https://example.com/", "http://www.example.com", "HTTPS://WWW.Example.COM/",
+    "example.com", "https://m.example.com", "https://example.com:443/", "https://example.com/#top",
+    "https://example.com/about", "https://www.example.com/about/", "https://example.com/about?lang=en",
+    "https://example.com:8443", "https://shop.example.com", "https://other.org/", "https://www.other.org",
+]
+
+
+# The search-result dedupe that UrlIndex replaced: exact URLs, and www.x.com once x.com was seen
+def baseline_is_new_search_url(url, seen_domains, seen_urls):
+    if url in seen_urls:
+        return False
+    netloc = urlparse(url).netloc
+    root_domain = netloc[4:] if netloc.startswith("www.") else netloc
+    if netloc.startswith("www.") and root_domain in seen_domains:
+        return False
+    seen_domains.add(root_domain)
+    seen_urls.add(url)
+    return True
+
+
+# The result store key that canonical_url replaced: domain without www. and path without trailing slashes
+def baseline_normalize_url_key(url):
+    url = str(url).strip()
+    if not re.match(r'^https?://', url, re.IGNORECASE):
+        url = 'https://' + url
+    parsed = urlparse(url)
+    domain = parsed.netloc.lower()
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain + parsed.path.rstrip("/")
+
+
+# The concurrency key that host_of_url replaced
+def baseline_host_of_url(url):
+    if not re.match(r'^https?://', url):
+        url = 'https://' + url
+    return urlparse(url).netloc.lower()
+
+
+@pytest.mark.parametrize("order", list(permutations(range(4))))
+def test_every_duplicate_the_baseline_dropped_is_still_dropped(order):
+    urls = [SPELLINGS[index] for index in order] + SPELLINGS
+    seen_domains, seen_urls = set(), set()
+    baseline_kept = [url for url in urls if baseline_is_new_search_url(url, seen_domains, seen_urls)]
+    index = UrlIndex()
+    kept = [url for url in urls if index.add(url)]
+    assert set(kept) <= set(baseline_kept)
+    assert kept == unique_urls(urls)
+
+
+def test_spellings_of_one_page_are_one_entry_whatever_their_order():
+    same = ["https://www.example.com/", "https://example.com", "example.com", "HTTPS://WWW.Example.COM/",
+            "https://m.example.com", "https://example.com:443/", "https://example.com/#top"]
+    for urls in (same, same[::-1]):
+        assert unique_urls(urls) == urls[:1]
+    # The baseline kept "https://example.com" after "https://www.example.com/"
+    seen_domains, seen_urls = set(), set()
+    assert sum(baseline_is_new_search_url(url, seen_domains, seen_urls) for url in same) > 1
+
+
+def test_different_pages_stay_apart():
+    different = ["https://example.com", "https://example.com/about", "https://example.com/about?lang=en",
+                 "https://example.com:8443", "https://shop.example.com", "https://other.org"]
+    assert unique_urls(different) == different
+
+
+def test_sources_of_every_spelling_are_kept_together():
+    index = UrlIndex()
+    assert index.add("https://www.example.com/", "search for 'a' (d)")
+    assert not index.add("example.com", "search for 'b' (d)")
+    assert not index.add("https://example.com", "search for 'a' (d)")
+    assert index.sources("http://m.example.com/") == ["search for 'a' (d)", "search for 'b' (d)"]
+    assert "EXAMPLE.com" in index and len(index) == 1
+
+
+@pytest.mark.parametrize("url", ["https://example.com", "http://www.example.com/", "example.com/about/", "https://Other.org/a/b"])
+def test_result_store_keys_match_the_baseline_without_query_alias_or_port(url):
+    assert canonical_url(url) == baseline_normalize_url_key(url)
+
+
+def test_urls_that_shared_a_result_store_key_still_share_one():
+    # Except URLs with a query, which is now part of the key
+    urls = [url for url in SPELLINGS if not urlparse(url).query]
+    for url in urls:
+        for other in urls:
+            if baseline_normalize_url_key(other) == baseline_normalize_url_key(url):
+                assert canonical_url(other) == canonical_url(url)
+
+
+@pytest.mark.parametrize("url", ["https://example.com/a", "example.com", "http://Shop.Example.com/x", "https://example.com:8443/a"])
+def test_host_of_url_matches_the_baseline(url):
+    assert host_of_url(url) == baseline_host_of_url(url)
+
+
+def test_host_of_url_drops_default_ports_and_credentials():
+    assert host_of_url("https://example.com:443/a") == host_of_url("http://user@example.com:80") == "example.com"
+    assert parse_url("https://Bücher.de./x").hostname == "xn--bcher-kva.de"
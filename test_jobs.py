@@ -0,0 +1,89 @@
+import pytest
+import config
+import jobs
+from searching import resume_url_job, write_row
+from sheets import SheetSink
+
+URLS = [f"https://site{i}.example.com" for i in range(10)]
+
+
+# An in-memory worksheet keeping the rows appended to it
+class FakeWorksheet:
+    def __init__(self, title):
+        self.title = title
+        self.rows = []
+
+    def append_rows(self, rows, **kwargs):
+        self.rows.extend(list(row) for row in rows)
+
+
+@pytest.fixture(autouse=True)
+def job_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(jobs, "_store", None)
+
+
+# Helper function to start a URL list run the way process_urls does (a new process opens the store again)
+def start_run(sheet):
+    jobs._store = None
+    sink = SheetSink(flush_rows=3, background=False)
+    job, done = resume_url_job("filter", "sheet", "list", URLS, sink, [sheet])
+    return sink, job, done
+
+
+def test_an_interrupted_run_resumes_after_its_last_row_without_duplicates():
+    sheet = FakeWorksheet("Sure")
+    sink, job, done = start_run(sheet)
+    assert not job.resumed and done == set()
+    for url in URLS[:7]:
+        write_row(sink, job, sheet, [url, "first run"])
+    # Interrupted: rows 1-6 were flushed, the 7th was computed but never written
+    assert [row[0] for row in sheet.rows] == URLS[:6]
+
+    sink, job, done = start_run(sheet)
+    assert job.resumed
+    assert done == set(URLS[:7])
+    assert sink.pending_count() == 1
+    for url in URLS:
+        if url not in done:
+            write_row(sink, job, sheet, [url, "second run"])
+    sink.close()
+    job.finish()
+
+    assert [row[0] for row in sheet.rows] == URLS
+    assert sheet.rows[6] == [URLS[6], "first run"]
+    assert [row[1] for row in sheet.rows[7:]] == ["second run"] * 3
+
+
+def test_a_finished_run_is_started_over_when_submitted_again():
+    sheet = FakeWorksheet("Sure")
+    sink, job, _ = start_run(sheet)
+    for url in URLS[:4]:
+        write_row(sink, job, sheet, [url, "first run"])
+    sink.close()
+    job.finish()
+
+    sink, job, done = start_run(sheet)
+    assert not job.resumed and done == set()
+    assert sink.pending_count() == 0
+
+
+def test_paged_queries_resume_from_their_last_written_page():
+    store = jobs.get_job_store()
+    job = store.start_job("wikidata", "sheet", "en", ["P31|Q1", "P31|Q2"])
+    job.mark_page("P31|Q1", "Q4")
+    job.mark_page("P31|Q1", "Q10")
+    job.mark_page("P31|Q2", "Q7", complete=True)
+
+    resumed = jobs.JobStore(config.JOB_STORE_PATH).start_job("wikidata", "sheet", "en", ["P31|Q1", "P31|Q2"])
+    assert resumed.resumed
+    assert resumed.page_cursors() == {"P31|Q1": ("Q10", False), "P31|Q2": ("Q7", True)}
+
+
+def test_other_inputs_are_a_different_job():
+    store = jobs.get_job_store()
+    first = store.start_job("filter", "sheet", "list", URLS)
+    first.mark_done(URLS[0], "Sure", [URLS[0]])
+    other = store.start_job("filter", "sheet", "list", URLS[:5])
+    assert other.job_id != first.job_id and not other.resumed
+    assert other.keys(jobs.DONE) == set()
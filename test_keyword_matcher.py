@@ -0,0 +1,84 @@
+import random
+import re
+import string
+import unicodedata
+from collections import Counter
+import pytest
+from keyword_matcher import KeywordMatcher, normalize_for_matching
+
+
+# The single-word keyword counting that KeywordMatcher replaced (searching.count_keywords before the matcher)
+def baseline_count_keywords(title, description, good_keywords, bad_keywords):
+    combined_text = f"{(title or '').strip().lower()} {(description or '').strip().lower()}".strip()
+    for dash in ["-", "–", "—", "−"]:
+        combined_text = combined_text.replace(dash, " ")
+    combined_text = unicodedata.normalize("NFKD", combined_text).encode("ascii", "ignore").decode()
+    combined_text = combined_text.lower()
+    combined_text = combined_text.translate(str.maketrans("", "", string.punctuation))
+    combined_text = re.sub(r'\s+', ' ', combined_text).strip()
+    good_keywords = [word.lower() for word in good_keywords]
+    bad_keywords = [word.lower() for word in bad_keywords]
+    word_counts = Counter(combined_text.split())
+    good_count = sum(word_counts[word] for word in good_keywords if word in word_counts)
+    bad_count = sum(word_counts[word] for word in bad_keywords if word in word_counts)
+    return good_count, bad_count
+
+
+# Helper function to count every occurrence of every keyword phrase by trying each word position
+def brute_force_count(text, keywords):
+    words = normalize_for_matching(text).split()
+    phrases = {tuple(normalize_for_matching(keyword).split()) for keyword in keywords} - {()}
+    return sum(tuple(words[start:start + len(phrase)]) == phrase for phrase in phrases for start in range(len(words)))
+
+
+PAGES = [
+    ("Colegio Hebreo - Montevideo", "Escuela judía en Montevideo, Uruguay. Colegio bilingüe."),
+    ("Jewish Day School", "A Jewish school — K-12 — in Toronto; school of the year!"),
+    ("Synagogue & Community Center", "Shabbat services, kosher kitchen, community events"),
+    ("Casino Online", "Best casino bonuses, casino games and betting"),
+    ("", None),
+    ("École Juive", "L'école juive de Paris: éducation, Torah et culture."),
+]
+GOOD = ["jewish", "school", "colegio", "hebreo", "synagogue", "kosher", "torah", "ecole", "juive", "shabbat"]
+BAD = ["casino", "betting", "bonuses", "games"]
+
+
+@pytest.mark.parametrize("title, description", PAGES)
+def test_single_word_keywords_count_like_the_baseline(title, description):
+    matcher = KeywordMatcher(GOOD, BAD)
+    assert matcher.count(title, description) == baseline_count_keywords(title, description, GOOD, BAD)
+
+
+def test_keywords_are_normalized_like_the_text():
+    matcher = KeywordMatcher(["École", "K-12", "Montevideo,"], [])
+    # "k-12" is split into "k" and "12" like the text, so it matches as a two-word phrase
+    assert matcher.count("Ecole juive, K 12", "école - montevideo") == (4, 0)
+
+
+def test_overlapping_and_nested_phrases_are_all_counted():
+    good = ["new york", "york new", "new", "hebrew school", "school", "jewish hebrew school"]
+    text = "New York New York: the Jewish Hebrew School, a school in New York"
+    matcher = KeywordMatcher(good, [])
+    assert matcher.count_text(normalize_for_matching(text))[0] == brute_force_count(text, good)
+    assert matcher.count_text(normalize_for_matching("new york new york"))[0] == 2 + 1 + 2
+
+
+def test_a_keyword_in_both_lists_counts_on_both_sides():
+    matcher = KeywordMatcher(["school", "night school"], ["night", "night school"])
+    assert matcher.count("Night school", "school at night") == (3, 3)
+
+
+def test_duplicate_and_empty_keywords_count_once():
+    matcher = KeywordMatcher(["school", "School", " school ", "", "---"], [])
+    assert matcher.count("school school", "") == (2, 0)
+
+
+def test_random_texts_match_the_brute_force_count():
+    rng = random.Random(1234)
+    vocabulary = ["a", "b", "c", "ab", "d"]
+    for _ in range(200):
+        good = {" ".join(rng.choices(vocabulary, k=rng.randint(1, 3))) for _ in range(rng.randint(1, 5))}
+        bad = {" ".join(rng.choices(vocabulary, k=rng.randint(1, 3))) for _ in range(rng.randint(1, 5))}
+        text = " ".join(rng.choices(vocabulary, k=rng.randint(0, 30)))
+        matcher = KeywordMatcher(good, bad)
+        assert matcher.count_text(text) == (brute_force_count(text, good), brute_force_count(text, bad))
@@ -0,0 +1,11 @@
+from segmentation import segment
+
+
+# A lexicon word absorbed into an unknown run must not come back as a copy of the same segmentation
+def test_segment_returns_each_segmentation_once():
+    lexicon = {"colegio", "hebreo", "union", "montevideo", "monte", "video"}
+    segmentations, valid_words = segment("colegiohebreounionmontevideo", lexicon)
+    assert segmentations[0] == ["colegio", "hebreo", "union", "montevideo"]
+    assert ["colegio", "hebreo", "union", "monte", "video"] in segmentations
+    assert len(segmentations) == len({tuple(segmentation) for segmentation in segmentations})
+    assert valid_words == lexicon
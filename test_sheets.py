@@ -0,0 +1,122 @@
+import json
+import pytest
+import requests
+from gspread.exceptions import APIError
+import metrics
+from sheets import SheetSink, append_batches
+
+
+# An in-memory spreadsheet with the parts of the gspread Spreadsheet interface the sink uses
+class FakeSpreadsheet:
+    def __init__(self, id="spreadsheet"):
+        self.id = id
+        self.requests = []  # One list of appendCells requests per batch_update call
+
+    def batch_update(self, body):
+        self.requests.append(body["requests"])
+
+
+# An in-memory worksheet; `spreadsheet=None` makes the sink fall back to append_rows
+class FakeWorksheet:
+    def __init__(self, title, id=0, spreadsheet=None):
+        self.title = title
+        self.id = id
+        self.spreadsheet = spreadsheet
+        self.appends = []  # One list of rows per append_rows call
+        self.failures = []  # Exceptions raised by the next append_rows calls
+
+    def append_rows(self, rows, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.appends.append([list(row) for row in rows])
+
+
+# Helper function to build the gspread error of an API response with the given status
+def api_error(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"error": {"code": status, "message": "error", "status": "ERROR"}}).encode()
+    return APIError(response)
+
+
+# Helper function to read back the rows of appendCells requests
+def appended_rows(request):
+    return [[next(iter(cell["userEnteredValue"].values())) for cell in row["values"]] for row in request["appendCells"]["rows"]]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(metrics, "sleep", lambda seconds, reason: None)
+
+
+def test_rows_are_buffered_until_a_worksheet_has_flush_rows():
+    worksheet = FakeWorksheet("Sure")
+    sink = SheetSink(flush_rows=3, background=False)
+    sink.add(worksheet, [["a", 1], ["b", 2]])
+    assert worksheet.appends == []
+    assert sink.pending_count() == 2
+    sink.add(worksheet, [["c", 3]])
+    assert worksheet.appends == [[["a", 1], ["b", 2], ["c", 3]]]
+    assert sink.pending_count() == 0
+    assert sink.rows_written == 3
+
+
+def test_worksheets_of_one_spreadsheet_are_written_with_one_request():
+    spreadsheet = FakeSpreadsheet()
+    sure, not_sure = FakeWorksheet("Sure", 1, spreadsheet), FakeWorksheet("Not Sure", 2, spreadsheet)
+    flushed = []
+    sink = SheetSink(flush_rows=10, background=False, on_flush=flushed.append)
+    sink.add(sure, [["a", 1, True]])
+    sink.add(not_sure, [["b", 2.5, None]])
+    sink.flush()
+    assert len(spreadsheet.requests) == 1
+    sheet_ids = [request["appendCells"]["sheetId"] for request in spreadsheet.requests[0]]
+    assert sheet_ids == [1, 2]
+    assert appended_rows(spreadsheet.requests[0][0]) == [["a", 1, True]]
+    assert spreadsheet.requests[0][1]["appendCells"]["rows"][0]["values"][2] == {}
+    assert [(worksheet.title, rows) for worksheet, rows in flushed[0]] == [("Sure", [["a", 1, True]]), ("Not Sure", [["b", 2.5, None]])]
+
+
+def test_close_flushes_the_pending_rows_and_stops_the_thread():
+    worksheet = FakeWorksheet("Sure")
+    with SheetSink(flush_rows=100, flush_interval=60) as sink:
+        sink.add(worksheet, [["a"]])
+        sink.add(worksheet, [["b"]])
+        assert worksheet.appends == []
+    assert worksheet.appends == [[["a"], ["b"]]]
+    assert not sink._thread.is_alive()
+
+
+def test_quota_errors_are_retried():
+    worksheet = FakeWorksheet("Sure")
+    worksheet.failures = [api_error(429), api_error(503)]
+    sink = SheetSink(flush_rows=1, background=False)
+    sink.add(worksheet, [["a"]])
+    assert worksheet.appends == [[["a"]]]
+
+
+def test_failed_rows_are_kept_and_written_first_on_the_next_flush():
+    worksheet = FakeWorksheet("Sure")
+    worksheet.failures = [api_error(400)]
+    flushed = []
+    sink = SheetSink(flush_rows=10, background=False, on_flush=flushed.append)
+    sink.add(worksheet, [["a"]])
+    with pytest.raises(APIError):
+        sink.flush()
+    assert sink.pending_count() == 1
+    assert flushed == [] and sink.rows_written == 0
+    sink.add(worksheet, [["b"]])
+    sink.close()
+    assert worksheet.appends == [[["a"], ["b"]]]
+    assert sink.rows_written == 2 and len(flushed) == 1
+
+
+def test_append_batches_skips_empty_batches():
+    spreadsheet = FakeSpreadsheet()
+    sure, not_sure = FakeWorksheet("Sure", 1, spreadsheet), FakeWorksheet("Not Sure", 2, spreadsheet)
+    append_batches([(sure, []), (not_sure, [])])
+    assert spreadsheet.requests == []
+    append_batches([(sure, [["a"]]), (not_sure, [])])
+    assert [[request["appendCells"]["sheetId"] for request in requests] for requests in spreadsheet.requests] == [[1]]
+    append_batches([(sure, [["b"]])], coalesce=False)
+    assert sure.appends == [[["b"]]]
@@ -0,0 +1,63 @@
+import pytest
+import config
+import translation
+from translation import DictionaryTranslator, IdentityTranslator, translate, translate_many
+
+
+# A DictionaryTranslator that records the texts of every batch it is asked to translate
+class RecordingTranslator(DictionaryTranslator):
+    def __init__(self, translations, fail=False):
+        super().__init__(translations)
+        self.fail = fail
+        self.batches = []
+
+    def translate_batch(self, texts, src="auto", dest="en"):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise ConnectionError("Translator unavailable")
+        return super().translate_batch(texts, src=src, dest=dest)
+
+
+@pytest.fixture(autouse=True)
+def translation_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TRANSLATION_CACHE_PATH", str(tmp_path / "translations.sqlite"))
+    monkeypatch.setattr(translation, "_cache", None)
+    monkeypatch.setattr(translation, "_translator", None)
+
+
+def test_identity_translator_returns_the_texts_unchanged():
+    translation.set_translator(IdentityTranslator())
+    assert translate_many(["Shalom", None, "", "Colegio  Hebreo"]) == ["Shalom", "", "", "Colegio  Hebreo"]
+
+
+def test_repeated_texts_are_translated_once_and_then_served_from_the_cache():
+    translator = RecordingTranslator({"Bet Sefer": "School", "Shalom": "Hello"})
+    translation.set_translator(translator)
+    assert translate_many(["Bet Sefer", " bet  SEFER ", "Shalom", "Unknown"]) == ["School", "School", "Hello", "Unknown"]
+    # Spellings with the same normalized form share one translation of the first original text
+    assert translator.batches == [["Bet Sefer", "Shalom", "Unknown"]]
+
+    assert translate_many(["BET SEFER", "Todah", "Shalom"]) == ["School", "Todah", "Hello"]
+    assert translator.batches[1:] == [["Todah"]]
+    assert translate("shalom") == "Hello"
+    assert len(translator.batches) == 2
+
+
+def test_the_cache_is_keyed_by_language_pair():
+    translator = RecordingTranslator({"Shalom": "Hello"})
+    translation.set_translator(translator)
+    translate("Shalom", src="he")
+    translate("Shalom", src="auto")
+    assert translator.batches == [["Shalom"], ["Shalom"]]
+
+
+def test_a_failed_backend_keeps_the_cached_translations():
+    translation.set_translator(RecordingTranslator({"Shalom": "Hello"}))
+    translate("Shalom")
+    failing = RecordingTranslator({"Todah": "Thanks"}, fail=True)
+    translation.set_translator(failing)
+    assert translate_many(["Shalom", "Todah", "", "todah"]) == ["Hello", "Todah", "", "todah"]
+    assert failing.batches == [["Todah"]]
+    # Nothing was cached for the failed texts, so they are tried again
+    translation.set_translator(RecordingTranslator({"Todah": "Thanks"}))
+    assert translate("Todah") == "Thanks"
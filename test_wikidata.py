@@ -0,0 +1,153 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import config
+from wikidata import WikidataClient, WikidataError, WikidataTimeout
+
+ENTITY = "http://www.wikidata.org/entity/"
+
+# The subclass closure of Q1 and the P31 values of every item (Q13 has two classes of the closure)
+CLASSES = ["Q1", "Q2", "Q3", "Q4", "Q10"]
+ITEMS = {
+    "Q11": ["Q1"],
+    "Q12": ["Q2"],
+    "Q13": ["Q2", "Q10"],
+    "Q14": ["Q3", "Q99"],
+    "Q15": ["Q4"],
+    "Q16": ["Q10"],
+}
+LABELS = {"P31": "instance of", "Q1": "school", "Q2": "university"}
+
+
+class StubEndpoint:
+    """
+    A local SPARQL endpoint answering the queries of WikidataClient from the tables above.
+
+    Page queries for more than `max_classes` classes time out, as the public endpoint does; `fail_with`
+    makes every page query answer with that status.
+    """
+
+    def __init__(self, max_classes=None, fail_with=None):
+        self.max_classes = max_classes
+        self.fail_with = fail_with
+        self.queries = []
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)["query"][0]
+                endpoint.queries.append(query)
+                status, body = endpoint.answer(query)
+                data = body.encode() if isinstance(body, str) else json.dumps({"results": {"bindings": body}}).encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/sparql"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, query):
+        if "wdt:P279*" in query:
+            return 200, [{"class": {"value": ENTITY + class_id}} for class_id in CLASSES]
+        if "VALUES ?class" in query:
+            if self.fail_with:
+                return self.fail_with, "Bad request"
+            page = re.findall(r"wd:(Q\d+)", re.search(r"VALUES \?class \{([^}]*)\}", query).group(1))
+            if self.max_classes and len(page) > self.max_classes:
+                return 500, "java.util.concurrent.TimeoutException"
+            return 200, [{
+                "item": {"value": ENTITY + item},
+                "itemLabel": {"value": f"Item {item}"},
+                "classes": {"value": " ".join(ENTITY + class_id for class_id in classes)},
+            } for item, classes in ITEMS.items() if set(classes) & set(page)]
+        if "VALUES ?entity" in query:
+            ids = re.findall(r"wd:([PQ]\d+)", query)
+            return 200, [{"entity": {"value": ENTITY + wikidata_id}, "label": {"value": LABELS[wikidata_id]}}
+                         for wikidata_id in ids if wikidata_id in LABELS]
+        return 400, "Unknown query"
+
+    def page_sizes(self):
+        return [len(re.findall(r"wd:Q\d+", re.search(r"VALUES \?class \{([^}]*)\}", query).group(1)))
+                for query in self.queries if "VALUES ?class" in query]
+
+
+@pytest.fixture
+def endpoint():
+    stub = StubEndpoint()
+    yield stub
+    stub.server.shutdown()
+
+
+# Helper function to get the item IDs of every page
+def page_items(pages):
+    return [[binding["item"]["value"].rsplit("/", 1)[-1] for binding in bindings] for bindings, _ in pages]
+
+
+def test_pages_cover_every_item_once_in_class_order(endpoint):
+    client = WikidataClient(endpoint=endpoint.url, cache_path="")
+    pages = list(client.iter_item_pages("P31", "Q1", page_size=2))
+    assert [cursor for _, cursor in pages] == ["Q2", "Q4", "Q10"]
+    # Q13 is on the page of Q2, its first class, and not again on the page of Q10
+    assert page_items(pages) == [["Q11", "Q12", "Q13"], ["Q14", "Q15"], ["Q16"]]
+    assert sum("wdt:P279*" in query for query in endpoint.queries) == 1
+
+
+def test_resuming_after_a_cursor_skips_the_pages_already_done(endpoint):
+    client = WikidataClient(endpoint=endpoint.url, cache_path="")
+    _, cursor = next(client.iter_item_pages("P31", "Q1", page_size=2))
+    resumed = list(client.iter_item_pages("P31", "Q1", page_size=2, after=cursor))
+    assert [cursor for _, cursor in resumed] == ["Q4", "Q10"]
+    assert page_items(resumed) == [["Q14", "Q15"], ["Q16"]]
+
+
+def test_a_page_that_times_out_is_retried_with_fewer_classes(monkeypatch):
+    monkeypatch.setattr(config, "WIKIDATA_MIN_PAGE_SIZE", 1)
+    stub = StubEndpoint(max_classes=1)
+    try:
+        client = WikidataClient(endpoint=stub.url, cache_path="")
+        pages = list(client.iter_item_pages("P31", "Q1", page_size=4))
+        assert stub.page_sizes() == [4, 2, 1, 1, 1, 1, 1]
+        assert sorted(item for items in page_items(pages) for item in items) == sorted(ITEMS)
+    finally:
+        stub.server.shutdown()
+
+
+def test_a_page_that_still_times_out_at_the_minimum_size_is_an_error(monkeypatch):
+    monkeypatch.setattr(config, "WIKIDATA_MIN_PAGE_SIZE", 2)
+    stub = StubEndpoint(max_classes=1)
+    try:
+        client = WikidataClient(endpoint=stub.url, cache_path="")
+        with pytest.raises(WikidataTimeout):
+            list(client.iter_item_pages("P31", "Q1", page_size=4))
+        assert stub.page_sizes() == [4, 2]
+    finally:
+        stub.server.shutdown()
+
+
+def test_other_errors_are_raised_without_halving_the_page():
+    stub = StubEndpoint(fail_with=400)
+    try:
+        client = WikidataClient(endpoint=stub.url, cache_path="")
+        with pytest.raises(WikidataError) as error:
+            list(client.iter_item_pages("P31", "Q1", page_size=4))
+        assert not isinstance(error.value, WikidataTimeout)
+        assert stub.page_sizes() == [4]
+    finally:
+        stub.server.shutdown()
+
+
+def test_labels_are_resolved_in_batches_and_cached(endpoint, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "WIKIDATA_BATCH_SIZE", 2)
+    client = WikidataClient(endpoint=endpoint.url, cache_path=str(tmp_path / "labels.sqlite"))
+    assert client.labels(["P31", "Q1", "Q2", "Q404"]) == {"P31": "instance of", "Q1": "school", "Q2": "university", "Q404": "Q404"}
+    assert len(endpoint.queries) == 2
+    assert client.labels(["Q1", "Q404"]) == {"Q1": "school", "Q404": "Q404"}
+    assert len(endpoint.queries) == 2
@@ -0,0 +1,162 @@
+import re
+import threading
+import unicodedata
+from googletrans import Translator
+import config
+import events
+import metrics
+from disk_cache import DiskCache
+
+# Google rejects requests over ~5000 characters, keep batches well below that
+MAX_BATCH_CHARACTERS = 4500
+
+_translator = None
+_cache = None
+_lock = threading.Lock()
+
+
+# Error handler function to streamline error handling
+def error_handler(function, item, error_message):
+    events.error(function, item, error_message)
+    return "Error", "Error"
+
+
+class GoogleTranslator:
+    """Translates with googletrans, reusing one client per thread and sending many strings per request."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = Translator()
+        return self._local.client
+
+    def translate_batch(self, texts, src="auto", dest="en"):
+        """
+        Translates a list of single-line strings. They are joined with newlines into as few requests
+        as possible; if a response does not split back into the same number of lines, the strings of
+        that request are translated one by one instead.
+        """
+        translations = []
+        for batch in batch_by_length(texts, MAX_BATCH_CHARACTERS):
+            result = self.client.translate("\n".join(text.replace("\n", " ") for text in batch), src=src, dest=dest).text.split("\n")
+            if len(result) != len(batch):
+                result = [self.client.translate(text, src=src, dest=dest).text for text in batch]
+            translations.extend(result)
+        return translations
+
+
+class IdentityTranslator:
+    """A local stand-in that returns every text unchanged, so the pipeline can run offline."""
+
+    def translate_batch(self, texts, src="auto", dest="en"):
+        return list(texts)
+
+
+class DictionaryTranslator:
+    """A local stand-in that translates known texts from a dict and returns the others unchanged."""
+
+    def __init__(self, translations):
+        self.translations = {normalize_text(text): translated for text, translated in translations.items()}
+
+    def translate_batch(self, texts, src="auto", dest="en"):
+        return [self.translations.get(normalize_text(text), text) for text in texts]
+
+
+# Translator backends that can be chosen by name in config.TRANSLATOR
+TRANSLATORS = {
+    "google": GoogleTranslator,
+    "identity": IdentityTranslator,
+}
+
+
+# Helper function to split texts into batches whose joined length stays under a limit
+def batch_by_length(texts, max_characters):
+    batch, length = [], 0
+    for text in texts:
+        if batch and length + len(text) + 1 > max_characters:
+            yield batch
+            batch, length = [], 0
+        batch.append(text)
+        length += len(text) + 1
+    if batch:
+        yield batch
+
+
+# Helper function to normalize a text into its translation cache key
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", str(text))
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+# Function to replace the translator backend (e.g., with a local stand-in for offline runs)
+def set_translator(translator):
+    global _translator
+    _translator = translator
+
+
+def get_translator():
+    global _translator
+    if _translator is None:
+        with _lock:
+            if _translator is None:
+                _translator = TRANSLATORS[config.TRANSLATOR]()
+    return _translator
+
+
+# Function to get the persistent translation cache (None when disabled)
+def get_cache():
+    global _cache
+    if _cache is None and config.TRANSLATION_CACHE_PATH:
+        with _lock:
+            if _cache is None:
+                _cache = DiskCache(config.TRANSLATION_CACHE_PATH, table="translations",
+                                   ttl=config.TRANSLATION_CACHE_TTL, max_entries=config.TRANSLATION_CACHE_MAX_ENTRIES)
+    return _cache
+
+
+# Function to translate many texts at once, serving repeated texts from the cache
+def translate_many(texts, src="auto", dest="en"):
+    """
+    Translates a list of texts, returning the translations in the same order.
+
+    Texts are looked up in the on-disk cache by (source language, target language, normalized text),
+    where the normalized form (whitespace, Unicode form and case, see normalize_text) is only the key:
+    the original texts are sent to the translator, in batches, once per key. If translation fails,
+    the cached translations are still returned, and the other texts are returned untranslated.
+    """
+    texts = ["" if text is None else str(text) for text in texts]
+    normalized = [normalize_text(text) for text in texts]
+    originals = {}  # normalized text -> the first original text with that form
+    for text, key in zip(texts, normalized):
+        if key:
+            originals.setdefault(key, text)
+    keys = {text: f"{src}|{dest}|{text}" for text in originals}
+    cache = get_cache()
+    cached = cache.get_many(keys.values()) if cache is not None else {}
+
+    translations = {text: cached[key] for text, key in keys.items() if key in cached}
+    missing = [text for text in keys if text not in translations]
+    if cache is not None:
+        metrics.count("translation.cache_hits", len(translations))
+    if missing:
+        try:
+            metrics.count("translation.calls")
+            metrics.count("translation.texts", len(missing))
+            with metrics.timer("translate"):
+                translated = get_translator().translate_batch([originals[text] for text in missing], src=src, dest=dest)
+            translations.update(zip(missing, translated))
+            if cache is not None:
+                cache.set_many({keys[text]: translations[text] for text in missing})
+        except Exception as e:
+            error_handler("translating", ", ".join(originals[text] for text in missing)[:200], e)
+            return [translations.get(key, text) if key else "" for text, key in zip(texts, normalized)]
+
+    return [translations.get(key, "") for key in normalized]
+
+
+# Function to translate one text
+def translate(text, src="auto", dest="en"):
+    return translate_many([text], src=src, dest=dest)[0]
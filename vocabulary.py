@@ -0,0 +1,148 @@
+import os
+import pickle
+import threading
+import spacy
+import config
+import events
+
+# spaCy models used to recognise words in domains, by language
+MODEL_NAMES = {
+    "English": "en_core_web_md",
+    "Spanish": "es_core_news_md",
+    "French": "fr_core_news_md",
+    "Portuguese": "pt_core_news_md",
+    "Italian": "it_core_news_md"
+}
+
+# Pipeline components we never use - only the vocab (lexemes and vectors) is needed
+UNUSED_COMPONENTS = ["tok2vec", "tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"]
+
+# Shortest word we accept as a valid word
+MIN_WORD_LENGTH = 4
+
+_vocabs = {}
+_lexicon = None
+_lock = threading.RLock()
+
+
+# Error handler function to streamline error handling
+def error_handler(function, item, error_message):
+    events.error(function, item, error_message)
+    return "Error", "Error"
+
+
+# Function to get the vocab of a language, loading its model only the first time
+def get_vocab(language):
+    """
+    Returns the spaCy vocab for a language. Each model is loaded at most once per process,
+    without its pipeline components, and shared by every caller.
+
+    :param language: A key of MODEL_NAMES (e.g., "English").
+    """
+    vocab = _vocabs.get(language)
+    if vocab is None:
+        with _lock:
+            vocab = _vocabs.get(language)
+            if vocab is None:
+                vocab = spacy.load(MODEL_NAMES[language], exclude=UNUSED_COMPONENTS).vocab
+                _vocabs[language] = vocab
+    return vocab
+
+
+class Lexicon:
+    """
+    A precompiled set of all valid words of the loaded languages.
+
+    Membership is a single set lookup, which replaces querying every spaCy vocab for every candidate.
+    """
+
+    def __init__(self, words_by_language):
+        self.words_by_language = {language: frozenset(words) for language, words in words_by_language.items()}
+        self.words = frozenset().union(*self.words_by_language.values())
+        self.max_word_length = max((len(word) for word in self.words), default=0)
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def __len__(self):
+        return len(self.words)
+
+    def is_word_in(self, word, language):
+        return word in self.words_by_language.get(language, ())
+
+
+# Function to collect the valid words of a vocab
+def vocab_words(vocab):
+    """
+    Returns all valid words of a vocab: alphabetic, long enough, and either in the vectors
+    table (not OOV) or with a known probability above -20.
+    """
+    words = set()
+    for key in vocab.vectors.keys():
+        word = vocab.strings[key] if key in vocab.strings else None
+        if word and word.isalpha() and len(word) >= MIN_WORD_LENGTH:
+            words.add(word)
+    if vocab.lookups.has_table("lexeme_prob"):
+        for word, prob in vocab.lookups.get_table("lexeme_prob").items():
+            if isinstance(word, str) and word.isalpha() and len(word) >= MIN_WORD_LENGTH and prob > -20:
+                words.add(word)
+    return words
+
+
+# Function to build the combined lexicon of all the languages
+def build_lexicon(languages=None):
+    languages = languages or list(MODEL_NAMES)
+    return Lexicon({language: vocab_words(get_vocab(language)) for language in languages})
+
+
+# Function to get the process-wide lexicon, compiling (or loading) it on first use
+def get_lexicon():
+    """
+    Returns the combined lexicon of all the languages in MODEL_NAMES.
+
+    It is compiled once per process; when config.LEXICON_PATH is set it is also saved there and
+    loaded on the next start, so the models themselves do not need to be loaded at all.
+    """
+    global _lexicon
+    if _lexicon is None:
+        with _lock:
+            if _lexicon is None:
+                lexicon = load_lexicon(config.LEXICON_PATH)
+                if lexicon is None:
+                    lexicon = build_lexicon()
+                    save_lexicon(lexicon, config.LEXICON_PATH)
+                _lexicon = lexicon
+    return _lexicon
+
+
+# Function to replace the process-wide lexicon (e.g., with a small word list for offline runs and benchmarks)
+def set_lexicon(lexicon):
+    global _lexicon
+    _lexicon = lexicon
+
+
+# Function to load a precompiled lexicon from disk
+def load_lexicon(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as file:
+            data = pickle.load(file)
+        # Ignore lexicons compiled from a different set of models
+        if data.get("models") != MODEL_NAMES:
+            return None
+        return Lexicon(data["words_by_language"])
+    except Exception as e:
+        error_handler("load lexicon", path, e)
+        return None
+
+
+# Function to save a precompiled lexicon to disk
+def save_lexicon(lexicon, path):
+    if not path:
+        return
+    try:
+        with open(path, "wb") as file:
+            pickle.dump({"models": MODEL_NAMES, "words_by_language": {k: set(v) for k, v in lexicon.words_by_language.items()}}, file)
+    except Exception as e:
+        error_handler("save lexicon", path, e)
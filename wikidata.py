@@ -0,0 +1,220 @@
+import threading
+import requests
+import config
+import events
+import metrics
+from disk_cache import DiskCache
+from http_client import get_client
+
+_client = None
+_lock = threading.Lock()
+
+
+# Error handler function to streamline error handling
+def error_handler(function, item, error_message):
+    events.error(function, item, error_message)
+    return "Error", "Error"
+
+
+class WikidataError(Exception):
+    """A SPARQL query failed (HTTP error, timeout or an invalid response)."""
+
+
+class WikidataTimeout(WikidataError):
+    """A SPARQL query took longer than the endpoint (or our read timeout) allows."""
+
+
+# Helper function to write a string as a SPARQL literal
+def sparql_literal(text, language=None):
+    escaped = str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"@{language}' if language else f'"{escaped}"'
+
+
+# Helper function to get the ID at the end of an entity URI
+def entity_id(uri):
+    return str(uri).rsplit("/", 1)[-1]
+
+
+# Helper function to sort entity IDs by number (Q5 before Q42), with anything else last
+def entity_order(wikidata_id):
+    number = wikidata_id[1:]
+    return (0, int(number), wikidata_id) if number.isdigit() else (1, 0, wikidata_id)
+
+
+class WikidataClient:
+    """
+    A client for a Wikidata SPARQL endpoint (query.wikidata.org by default, or a local stub).
+
+    Labels and IDs are resolved for many items in one query with a VALUES clause, and kept in an
+    on-disk label <-> ID cache for `cache_ttl` seconds. Queries go through the shared pooled HTTP
+    client; at most `max_concurrent` run at the same time, as the public endpoint asks.
+    """
+
+    def __init__(self, endpoint=None, cache_path=None, cache_ttl=None, max_concurrent=None, timeout=None):
+        self.endpoint = endpoint or config.WIKIDATA_ENDPOINT
+        self.max_concurrent = max_concurrent or config.WIKIDATA_MAX_CONCURRENT
+        self.timeout = timeout or config.WIKIDATA_TIMEOUT
+        cache_path = config.WIKIDATA_CACHE_PATH if cache_path is None else cache_path
+        self.cache = DiskCache(cache_path, table="labels", ttl=cache_ttl or config.WIKIDATA_CACHE_TTL) if cache_path else None
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+
+    def query(self, sparql):
+        """Runs a SELECT query and returns its bindings. Raises WikidataError."""
+        headers = {"Accept": "application/sparql-results+json", "User-Agent": config.WIKIDATA_USER_AGENT}
+        with self._slots:
+            for attempt in range(config.HTTP_RETRIES + 1):
+                try:
+                    with metrics.timer("wikidata.query"):
+                        response = get_client("wikidata").get(self.endpoint, params={"query": sparql, "format": "json"},
+                                                              headers=headers, timeout=(config.HTTP_CONNECT_TIMEOUT, self.timeout))
+                except requests.exceptions.Timeout as e:
+                    raise WikidataTimeout(f"Request timed out: {e}") from e
+                except Exception as e:
+                    raise WikidataError(f"Request failed: {e}") from e
+                # Too many requests: wait as long as the endpoint asks before trying again
+                if response.status_code == 429 and attempt < config.HTTP_RETRIES:
+                    retry_after = response.headers.get("Retry-After", "")
+                    response.close()
+                    metrics.sleep(float(retry_after) if retry_after.isdigit() else config.HTTP_RETRY_BACKOFF * 2 ** attempt, "wikidata_retry")
+                    continue
+                # The public endpoint reports a query that ran out of time as a 500 with a Java TimeoutException
+                if response.status_code == 504 or (response.status_code == 500 and "TimeoutException" in response.text):
+                    raise WikidataTimeout(f"HTTP {response.status_code}: query timed out")
+                if response.status_code != 200:
+                    raise WikidataError(f"HTTP {response.status_code}: {response.text[:200]}")
+                try:
+                    return response.json()["results"]["bindings"]
+                except (ValueError, KeyError) as e:
+                    raise WikidataError(f"Invalid response: {e}") from e
+
+    def _cached(self, keys):
+        return self.cache.get_many(keys) if self.cache is not None else {}
+
+    def _store(self, values):
+        if self.cache is not None and values:
+            self.cache.set_many(values)
+
+    def labels(self, ids, language="en"):
+        """Returns a dict of ID -> label. IDs without a label in `language` map to themselves."""
+        ids = list(dict.fromkeys(filter(None, ids)))
+        keys = {wikidata_id: f"label|{language}|{wikidata_id}" for wikidata_id in ids}
+        cached = self._cached(keys.values())
+        labels = {wikidata_id: cached[key] for wikidata_id, key in keys.items() if key in cached}
+        metrics.count("wikidata.cache_hits", len(labels))
+        missing = [wikidata_id for wikidata_id in ids if wikidata_id not in labels]
+
+        for start in range(0, len(missing), config.WIKIDATA_BATCH_SIZE):
+            chunk = missing[start:start + config.WIKIDATA_BATCH_SIZE]
+            bindings = self.query(f"""
+            SELECT ?entity ?label WHERE {{
+                VALUES ?entity {{ {" ".join(f"wd:{wikidata_id}" for wikidata_id in chunk)} }}
+                ?entity rdfs:label ?label.
+                FILTER(LANG(?label) = {sparql_literal(language)})
+            }}
+            """)
+            found = {entity_id(binding["entity"]["value"]): binding["label"]["value"] for binding in bindings}
+            found = {wikidata_id: found.get(wikidata_id, wikidata_id) for wikidata_id in chunk}
+            self._store({keys[wikidata_id]: label for wikidata_id, label in found.items()})
+            labels.update(found)
+        return {wikidata_id: labels[wikidata_id] for wikidata_id in ids}
+
+    def ids_for_labels(self, labels, language="en"):
+        """Returns a dict of label -> list of the IDs of every entity (or property) with that exact label."""
+        labels = list(dict.fromkeys(filter(None, labels)))
+        keys = {label: f"ids|{language}|{label}" for label in labels}
+        cached = self._cached(keys.values())
+        ids = {label: cached[key] for label, key in keys.items() if key in cached}
+        metrics.count("wikidata.cache_hits", len(ids))
+        missing = [label for label in labels if label not in ids]
+
+        for start in range(0, len(missing), config.WIKIDATA_BATCH_SIZE):
+            chunk = missing[start:start + config.WIKIDATA_BATCH_SIZE]
+            bindings = self.query(f"""
+            SELECT ?entity ?label WHERE {{
+                VALUES ?label {{ {" ".join(sparql_literal(label, language) for label in chunk)} }}
+                ?entity rdfs:label ?label.
+                FILTER(STRSTARTS(STR(?entity), "http://www.wikidata.org/entity/"))
+            }}
+            """)
+            found = {label: [] for label in chunk}
+            for binding in bindings:
+                found.setdefault(binding["label"]["value"], []).append(entity_id(binding["entity"]["value"]))
+            found = {label: list(dict.fromkeys(found[label])) for label in chunk}
+            self._store({keys[label]: found_ids for label, found_ids in found.items()})
+            # An ID's label is its lookup label, so later labels() calls are free
+            self._store({f"label|{language}|{wikidata_id}": label for label, found_ids in found.items() for wikidata_id in found_ids})
+            ids.update(found)
+        return {label: ids[label] for label in labels}
+
+    def subclasses(self, value_id):
+        """Returns the IDs of `value_id` and all its subclasses (its wdt:P279* closure), sorted by number."""
+        bindings = self.query(f"SELECT ?class WHERE {{ ?class wdt:P279* wd:{value_id}. }}")
+        return sorted({entity_id(binding["class"]["value"]) for binding in bindings}, key=entity_order)
+
+    def iter_item_pages(self, property_id, value_id, language="en", page_size=None, after=None):
+        """
+        Yields (bindings, cursor) for the items whose `property_id` is `value_id` (or a subclass of it),
+        one page at a time, so memory stays bounded by the page.
+
+        The subclass closure of `value_id` is fetched once (see subclasses); each page then asks for
+        the items of the next `page_size` classes by VALUES, so no page makes the endpoint walk the
+        closure again. An item of several classes is only yielded on the page of the first of them.
+        `cursor` is the ID of the page's last class: pass it as `after` to resume after that page.
+        A page that times out is retried with half as many classes (down to config.WIKIDATA_MIN_PAGE_SIZE)
+        before WikidataTimeout is raised; other errors are raised at once.
+        """
+        page_size = page_size or config.WIKIDATA_PAGE_SIZE
+        classes = self.subclasses(value_id)
+        rank = {class_id: index for index, class_id in enumerate(classes)}
+        start = 0
+        if after:
+            start = sum(entity_order(class_id) <= entity_order(after) for class_id in classes)
+
+        while start < len(classes):
+            page = classes[start:start + page_size]
+            try:
+                bindings = self.query(f"""
+                SELECT ?item ?itemLabel ?itemLabel_he ?website ?classes WHERE {{
+                  SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{language}". }}
+                  {{
+                    SELECT ?item (GROUP_CONCAT(DISTINCT STR(?value); separator=" ") AS ?classes) WHERE {{
+                      {{
+                        SELECT DISTINCT ?item WHERE {{
+                          VALUES ?class {{ {" ".join(f"wd:{class_id}" for class_id in page)} }}
+                          ?item p:{property_id}/ps:{property_id} ?class.
+                        }}
+                      }}
+                      ?item p:{property_id}/ps:{property_id} ?value.
+                    }}
+                    GROUP BY ?item
+                  }}
+                  OPTIONAL {{ ?item wdt:P856 ?website }}  # Personal website
+                  OPTIONAL {{ ?item rdfs:label ?itemLabel_he. FILTER(LANG(?itemLabel_he) = "he") }}  # Hebrew label
+                }}
+                """)
+            except WikidataTimeout:
+                if page_size <= config.WIKIDATA_MIN_PAGE_SIZE:
+                    raise
+                page_size = max(page_size // 2, config.WIKIDATA_MIN_PAGE_SIZE)
+                metrics.count("wikidata.page_halvings")
+                continue
+
+            # Keep the items with no class on an earlier page
+            page_bindings = []
+            for binding in bindings:
+                item_classes = map(entity_id, binding.get("classes", {}).get("value", "").split())
+                if min((rank[class_id] for class_id in item_classes if class_id in rank), default=start) >= start:
+                    page_bindings.append(binding)
+            bindings = page_bindings
+            start += len(page)
+            yield bindings, page[-1]
+
+
+# Function to get the process-wide Wikidata client
+def get_wikidata_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = WikidataClient()
+    return _client
@@ -1,94 +1,106 @@
 import streamlit as st
-from SPARQLWrapper import SPARQLWrapper, JSON
 from datetime import datetime
 import pytz
+import events
+import metrics
+from jobs import start_job
+from sheets import append_batches, ensure_headers
+from wikidata import get_wikidata_client
+from workers import map_concurrently
 
 # Error handler function to streamline error handling
 def error_handler(function, item, error_message):
-    st.error(f"Error processing {function} for '{item}': {error_message}")
+    events.error(function, item, error_message)
     return "Error", "Error"
 
-# Function to convert ID (e.g., "P27") to Label (e.g., "country of citizenship")
-def id_to_label(wikidata_id):
-    try:
-        sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        sparql.setQuery(f"""
-        SELECT ?label WHERE {{
-            wd:{wikidata_id} rdfs:label ?label.
-            FILTER(LANG(?label) = "en")
-        }}
-        """)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-
-        if results["results"]["bindings"]:
-            return results["results"]["bindings"][0]["label"]["value"]
-        else:
-            return wikidata_id
-    except Exception as e:
-        error_handler("id to label", wikidata_id, e)
-        return wikidata_id
-
-# Function to convert Label (e.g., "country of citizenship") to ID (e.g., "P27")
-def label_to_id(label):
-    try:
-        sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        sparql.setQuery(f"""
-        SELECT ?entity ?label WHERE {{
-            ?entity rdfs:label "{label}"@en.
-            FILTER(STRSTARTS(STR(?entity), "http://www.wikidata.org/entity/"))
-        }}
-        """)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-    
-        entities = []
-        if results["results"]["bindings"]:
-            for binding in results["results"]["bindings"]:
-                entities.append(binding["entity"]["value"].split("/")[-1])  # Extract ID from the URL
-            return entities
-        else:
-            return []
-    except Exception as e:
-        error_handler("label to id", label, str(e))
-        return []
-
-
-# Query Wikidata dynamically, including Hebrew label and instance of
-def query_wikidata(property_id, value_id, language="en"):
-    if not property_id or not value_id:
-        return {"error": "Property ID and Value ID must be provided."}  
-    try:
-        query = f"""
-        SELECT DISTINCT ?item ?itemLabel ?itemLabel_he ?website ?instance_of_label WHERE {{
-          SERVICE wikibase:label {{ bd:serviceParam wikibase:language "{language}". }}
-          {{
-            SELECT DISTINCT ?item WHERE {{
-              ?item p:{property_id} ?statement0.
-              ?statement0 (ps:{property_id}/(wdt:P279*)) wd:{value_id}.
-            }}
-          }}
-          OPTIONAL {{ ?item wdt:P856 ?website }}  # Personal website
-          OPTIONAL {{ ?item rdfs:label ?itemLabel_he. FILTER(LANG(?itemLabel_he) = "he") }}  # Hebrew label
-        }}
-        """
-        sparql = SPARQLWrapper("https://query.wikidata.org/sparql")
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-        
-        # Check if results are empty
-        if results.get("results", {}).get("bindings"):
-            return results
+# Function to build the Websites and Names rows of a page of query results
+@metrics.timed("wikidata.build_rows")
+def build_rows(bindings, p_id, v_id, property_label, value_label, timestamp):
+    websites_rows = []
+    names_rows = []
+    for result in bindings:
+        # Get the English and Hebrew labels for the item
+        name_en = result.get("itemLabel", {}).get("value", "")
+        name_he = result.get("itemLabel_he", {}).get("value", "")
+
+        # If no English label, fallback to the item's value or any available label
+        if not name_en and "item" in result:
+            name_en = result["item"].get("value", "").split("/")[-1]  # Fallback to item ID as label
+
+        website = result.get("website", {}).get("value", "")
+        wikidata_id = result["item"].get("value", "").split("/")[-1]
+
+        # Write to appropriate sheet
+        if website:
+            websites_rows.append([
+                name_en,
+                name_he,
+                website,
+                wikidata_id,
+                f"{property_label} ({p_id})",
+                f"{value_label} ({v_id})",
+                timestamp
+            ])
         else:
-            return {"error": "No results found for the given property and value."}
-    
-    except ValueError as ve:
-        return {"error": f"Value error: {ve}"}
-    except Exception as e:
-        return {"error": f"Unexpected error: {str(e)}"}
+            # Exclude website column for Names sheet
+            names_rows.append([
+                name_en,
+                name_he,
+                wikidata_id,
+                f"{property_label} ({p_id})",
+                f"{value_label} ({v_id})",
+                timestamp
+            ])
+    return websites_rows, names_rows
 
 
+# Function to stream the results of every (property, value) combination into the sheets, page by page
+def stream_results(websites_sheet, names_sheet, property_ids, value_ids, labels, timestamp, job=None, language="en"):
+    """
+    Every combination is paged through with WikidataClient.iter_item_pages (a few combinations at a
+    time), and each page is written to the sheets before the next one is fetched, so memory stays
+    bounded by the page size however many items match.
+
+    Each combination appends its own pages (see sheets.append_batches) rather than sharing a buffer,
+    so a page's cursor is only saved once that page's own rows are written: with a job, searching the
+    same values again after a timeout resumes each combination after its last written page.
+
+    :return: The (property ID, value ID) combinations that failed.
+    """
+    wikidata = get_wikidata_client()
+    cursors = job.page_cursors() if job is not None else {}
+
+    def run_combination(pair):
+        p_id, v_id = pair
+        key = f"{p_id}|{v_id}"
+        cursor, complete = cursors.get(key, (None, False))
+        if complete:
+            return None
+        try:
+            for bindings, cursor in wikidata.iter_item_pages(p_id, v_id, language, after=cursor):
+                websites_rows, names_rows = build_rows(bindings, p_id, v_id, labels.get(p_id, p_id), labels.get(v_id, v_id), timestamp)
+                with metrics.timer("wikidata.write_page"):
+                    append_batches([(websites_sheet, websites_rows), (names_sheet, names_rows)])
+                metrics.count("sheets.rows_appended", len(websites_rows) + len(names_rows))
+                # Only a written page moves the cursor
+                if job is not None:
+                    job.mark_page(key, cursor)
+                events.count("pages")
+                events.count("websites", len(websites_rows))
+                events.count("names", len(names_rows))
+                events.advance(len({binding["item"]["value"] for binding in bindings}), item=f"{p_id} / {v_id}")
+            if job is not None:
+                job.mark_page(key, cursor, complete=True)
+            return None
+        except Exception as e:
+            error_handler("query wikidata", f"{p_id} / {v_id}", e)
+            return e
+
+    pairs = [(p_id, v_id) for p_id in property_ids for v_id in value_ids]
+    results = map_concurrently(run_combination, pairs, max_workers=wikidata.max_concurrent,
+                               per_host=wikidata.max_concurrent, host_of=lambda pair: None)
+    return [pair for pair, error in results if error is not None]
+
 
 def run(client):
     st.write("This tool searches Wikidata for entries. The results are saved [here](https://docs.google.com/spreadsheets/d/1s1J1QRMnJukdvVhNU5EM_O625VGg198XwC6MTobb0SM/).")
@@ -121,16 +133,16 @@ def run(client):
         timestamp = datetime.now(pytz.timezone('Asia/Jerusalem')).strftime("%Y-%m-%d %H:%M:%S")
         
         # Add headers if the sheets are empty
-        if len(websites_sheet.get_all_values()) <= 1:  # Only the header exists
-            websites_sheet.append_row(["Name", "Wikidata ID", "Website", "Property Label", "Value Label", "Property ID", "Value ID", "Hebrew Label", "Instance Of", "Timestamp"])
-        if len(names_sheet.get_all_values()) <= 1:  # Only the header exists
-            names_sheet.append_row(["Name", "Wikidata ID", "Property Label", "Value Label", "Property ID", "Value ID", "Hebrew Label", "Instance Of", "Timestamp"])
+        ensure_headers(websites_sheet, ["Name", "Wikidata ID", "Website", "Property Label", "Value Label", "Property ID", "Value ID", "Hebrew Label", "Instance Of", "Timestamp"])
+        ensure_headers(names_sheet, ["Name", "Wikidata ID", "Property Label", "Value Label", "Property ID", "Value ID", "Hebrew Label", "Instance Of", "Timestamp"])
     
         if property_label and value_label:
             try:
-                # Convert labels to IDs
-                property_id = label_to_id(property_label)
-                value_id = label_to_id(value_label)
+                # Convert labels to IDs (one query for both labels, or none when they are cached)
+                wikidata = get_wikidata_client()
+                ids = wikidata.ids_for_labels([property_label, value_label])
+                property_id = ids[property_label]
+                value_id = ids[value_label]
                                                 
                 # Query Wikidata for all possible IDs
                 if isinstance(property_id, list) and property_id:
@@ -143,77 +155,25 @@ def run(client):
                 else:
                     st.info(f"Found 1 Value ID: {value_id}")
 
-                # Query Wikidata for all possible combinations
-                results = []
-                for p_id in (property_id if isinstance(property_id, list) else [property_id]):
-                    for v_id in (value_id if isinstance(value_id, list) else [value_id]):
-                        query_results = query_wikidata(p_id, v_id)
-                        if query_results and "results" in query_results and "bindings" in query_results["results"]:
-                            results.append({
-                                "p_id": p_id,
-                                "v_id": v_id,
-                                "property_label": id_to_label(p_id),
-                                "value_label": id_to_label(v_id),
-                                "results": query_results["results"]["bindings"]
-                            })
-
-                # Process results
-                if results:
-                    st.success("Query completed!")
-                    websites_batch = []
-                    names_batch = []
-                    
-                    for result_data in results:
-                        p_id = result_data["p_id"]
-                        v_id = result_data["v_id"]
-                        property_label = result_data["property_label"]
-                        value_label = result_data["value_label"]
-                        
-                        for result in result_data["results"]:
-                            # Get the English and Hebrew labels for the item
-                            name_en = result["itemLabel"].get("value", "")
-                            name_he = result.get("itemLabel_he", {}).get("value", "")
-                            
-                            # If no English label, fallback to the item's value or any available label
-                            if not name_en and "item" in result:
-                                name_en = result["item"].get("value", "").split("/")[-1]  # Fallback to item ID as label
-                            
-                            website = result.get("website", {}).get("value", "")
-                            wikidata_id = result["item"].get("value", "").split("/")[-1]
-                                                        
-                            # Prepare the row data
-                            row_data = [
-                                name_en,
-                                name_he,
-                                website,
-                                wikidata_id,
-                                f"{property_label} ({p_id})",
-                                f"{value_label} ({v_id})",
-                                timestamp
-                            ]
-                            
-                            # Write to appropriate sheet
-                            if website:
-                                websites_batch.append(row_data)
-                            else:
-                                # Exclude website column for Names sheet
-                                names_batch.append([
-                                    name_en,
-                                    name_he,
-                                    wikidata_id,
-                                    f"{property_label} ({p_id})",
-                                    f"{value_label} ({v_id})",
-                                    timestamp
-                                ])
-                    
-                    # Write results to Google Sheets
-                    if websites_batch:
-                        websites_sheet.append_rows(websites_batch)
-                    if names_batch:
-                        names_sheet.append_rows(names_batch)
-    
-                    st.success("Results written to Google Sheets!")
-                else:
+                # Query Wikidata for all possible combinations, a few at a time, writing each page as it arrives
+                property_ids = property_id if isinstance(property_id, list) else [property_id]
+                value_ids = value_id if isinstance(value_id, list) else [value_id]
+                labels = wikidata.labels(property_ids + value_ids)
+                job = start_job("wikidata", st.secrets["wikidata_id"], "en",
+                                [f"{p_id}|{v_id}" for p_id in property_ids for v_id in value_ids])
+                if job is not None and job.resumed:
+                    st.info("Resuming the previous search of these values after its last written page.")
+
+                with events.reporting("Querying Wikidata") as reporter, metrics.collecting("wikidata"):
+                    failed = stream_results(websites_sheet, names_sheet, property_ids, value_ids, labels, timestamp, job)
+                    written = reporter.counts.get("websites", 0) + reporter.counts.get("names", 0)
+                    if failed:
+                        reporter.finish(f"{len(failed)} queries failed. Search again to resume them from their last written page.", ok=False)
+                    else:
+                        if job is not None:
+                            job.finish()
+                        reporter.finish("Results written to Google Sheets!" if written else None)
+                if not failed and not written:
                     st.warning("No results found!")
             except Exception as e:
                 st.error(f"Error: {e}")
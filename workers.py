@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import config
+from canonical_urls import host_of_url
+
+
+# Function to run a function over many items with bounded concurrency
+def map_concurrently(function, items, max_workers=None, per_host=None, host_of=None, scheduler=None):
+    """
+    Runs `function` on every item in a thread pool and yields (item, result) in order of completion.
+
+    At most `max_workers` calls run at the same time, and at most `per_host` of them share the
+    same host, so a list full of one site's pages never hammers that site. Items are pulled from
+    `items` lazily, so very long lists (or generators) are never fully materialised as futures.
+
+    :param function: A function taking one item.
+    :param items: An iterable of items.
+    :param max_workers: Number of worker threads (defaults to config.MAX_WORKERS).
+    :param per_host: Max concurrent calls per host (defaults to config.PER_HOST_LIMIT).
+    :param host_of: A function mapping an item to its host key (defaults to host_of_url); items whose
+                    key is None are not limited per host (nor scheduled).
+    :param scheduler: A politeness.HostScheduler: each host's limit and delay then come from it instead
+                      of `per_host`, and the items of a host that has to wait stay queued here, so
+                      they hold no worker thread while the other hosts go ahead.
+    :return: A generator of (item, result) tuples.
+    """
+    max_workers = max_workers or config.MAX_WORKERS
+    per_host = per_host or config.PER_HOST_LIMIT
+    host_of = host_of or host_of_url
+    max_waiting = max_workers * 50  # How many items may wait behind busy hosts before we stop reading ahead
+
+    items = iter(items)
+    exhausted = False
+    waiting = defaultdict(deque)  # host -> items waiting for a free slot on that host
+    waiting_count = 0
+    in_flight = defaultdict(int)  # host -> number of running calls
+    futures = {}  # future -> (item, host)
+
+    # Streamlit calls made by the workers need the context of the calling script
+    ctx = get_script_run_ctx()
+
+    def attach_context():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=attach_context) as executor:
+
+        def submit(item, host):
+            in_flight[host] += 1
+            if scheduler is not None and host is not None:
+                futures[executor.submit(scheduler.run_reserved, host, function, item)] = (item, host)
+            else:
+                futures[executor.submit(function, item)] = (item, host)
+
+        def can_start(host):
+            # With a scheduler this takes one of the host's slots, which the call then uses
+            if host is None:
+                return True
+            if scheduler is not None:
+                return scheduler.acquire(host, blocking=False)
+            return in_flight[host] < per_host
+
+        def fill():
+            nonlocal exhausted, waiting_count
+            # First serve items that were waiting for their host to free up
+            for host in list(waiting):
+                while waiting[host] and len(futures) < max_workers and can_start(host):
+                    submit(waiting[host].popleft(), host)
+                    waiting_count -= 1
+                if not waiting[host]:
+                    del waiting[host]
+            # Then read new items
+            while not exhausted and len(futures) < max_workers and waiting_count < max_waiting:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                host = host_of(item)
+                if host not in waiting and can_start(host):
+                    submit(item, host)
+                else:
+                    waiting[host].append(item)
+                    waiting_count += 1
+
+        fill()
+        while futures or waiting:
+            # Wake up when the first host that is only waiting for its delay may start again
+            timeout = None
+            if scheduler is not None:
+                delayed = [ready for ready in map(scheduler.ready_at, filter(None, waiting)) if ready is not None]
+                if delayed:
+                    timeout = max(min(delayed) - time.monotonic(), 0.01)
+            if not futures:
+                time.sleep(timeout or 0.01)
+                fill()
+                continue
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, host = futures.pop(future)
+                in_flight[host] -= 1
+                yield item, future.result()
+            fill()
+
+
+# Function to run producers concurrently and merge what they emit into one stream
+def stream_concurrently(function, items, max_workers=None, queue_size=None):
+    """
+    Runs `function(item, emit)` for every item in a pool of threads and yields every value passed
+    to `emit`, as soon as it is emitted (e.g., search results page by page while several searches run).
+
+    `emit` blocks while `queue_size` values are waiting to be consumed, so producers never run far
+    ahead of the consumer. An exception raised by a producer is re-raised in the consumer.
+    """
+    max_workers = max_workers or config.MAX_WORKERS
+    output = queue.Queue(maxsize=queue_size or config.PIPELINE_QUEUE_SIZE)
+    tasks = queue.Queue()
+    for item in items:
+        tasks.put(item)
+    stopped = threading.Event()
+
+    def send(kind, value):
+        while not stopped.is_set():
+            try:
+                output.put((kind, value), timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def emit(value):
+        send("value", value)
+
+    def work():
+        while not stopped.is_set():
+            try:
+                item = tasks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                function(item, emit)
+            except Exception as e:
+                send("error", e)
+        send("done", None)
+
+    ctx = get_script_run_ctx()
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(min(max_workers, tasks.qsize()))]
+    for thread in threads:
+        if ctx is not None:
+            add_script_run_ctx(thread, ctx)
+        thread.start()
+
+    finished = 0
+    try:
+        while finished < len(threads):
+            kind, value = output.get()
+            if kind == "done":
+                finished += 1
+            elif kind == "error":
+                raise value
+            else:
+                yield value
+    finally:
+        stopped.set()